@@ -0,0 +1,557 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Benchmark of the lazor solver on generated boards of growing size.
+Every level is a seeded random puzzle, solvable by construction, run
+through the Input, Lazor, Solution and Visualisation stages. The time,
+peak memory and candidates per second are saved as JSON so that two
+runs can be compared:
+
+    python3 benchmark.py -o before.json
+    python3 benchmark.py -o after.json --compare before.json
+
+With --trace N the test of one candidate is also timed alone, in
+microseconds, over N random layouts of every level, for the bytearray
+layouts of class Solution and the bitmasks of class BitSolution, and
+over the first N candidates of the brute force, traced in full or by
+class IncrementalSolution.
+With --render-size PX the image of every solution is drawn at PX pixels
+per block, and the block fill of class Visualisation, one rectangle per
+block, is timed against the putpixel loop it replaced.
+'''
+# Import packages
+from lazer_final import (Input, Board, Lazor, Placements, Solution,
+                         BitSolution, IncrementalSolution, Visualisation,
+                         PuzzleFormatError, BLOCK_A, BLOCK_B, BLOCK_C)
+from itertools import islice
+from PIL import Image, ImageDraw
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Share of the grid cells marked 'x' by the generator
+BLOCKED_SHARE = 0.1
+# Attempts of the generator to place the lazors, blocks and POIs
+ATTEMPTS = 100
+
+
+def level(k):
+    '''
+    This function gives the puzzle size of a benchmark level, the grid,
+    block, lazor and POI counts growing with k
+
+    **Input Parameters**
+        k: *int*
+            The level, from 0
+    **Returns**
+        size: *dict*
+            width, height, A, B, C, lazers and points of the puzzle
+    '''
+    blocks = 3 + k
+    n_b = blocks // 5
+    n_c = (blocks + 2) // 5
+    return {'width': 3 + k, 'height': 3 + k, 'A': blocks - n_b - n_c,
+            'B': n_b, 'C': n_c, 'lazers': 1 + k // 2, 'points': 2 + k}
+
+
+def generate(seed, width, height, A, B, C, lazers, points):
+    '''
+    This function writes the text of a random .bff puzzle.
+    The blocks are first placed at random, the lazors are traced
+    through them, and the POIs are drawn from the positions the beams
+    cross, so the puzzle always has a solution.
+
+    **Input Parameters**
+        seed: *int*
+            The seed of the random generator
+        width, height: *int*
+            The size of the grid in blocks
+        A, B, C: *int*
+            The number of blocks to place
+        lazers, points: *int*
+            The number of lazors and POIs
+    **Returns**
+        text: *str*
+            The content of the .bff file
+    '''
+    rng = random.Random(seed)
+    for _ in range(ATTEMPTS):
+        grid = [['x' if rng.random() < BLOCKED_SHARE else 'o'
+                 for i in range(width)] for j in range(height)]
+        lines = ["# Generated by benchmark.py, seed %d" % seed,
+                 "GRID START"]
+        lines += ["   ".join(row) for row in grid]
+        lines += ["GRID STOP"]
+        lines += ["%s %d" % (name, n) for name, n in
+                  (('A', A), ('B', B), ('C', C)) if n]
+        lines += ["L %d %d %d %d" % lazer
+                  for lazer in _random_lazers(rng, width, height, lazers)]
+        try:
+            dataset1, dataset2 = Input('generated.bff').parse(lines)
+        except PuzzleFormatError:
+            # No 'o' position left in the grid
+            continue
+        board = Board(dataset1, dataset2)
+        if len(board.open_cells) < A + B + C:
+            continue
+        # The intended solution
+        layout = bytearray(board.blocks)
+        cells = rng.sample(board.open_cells, A + B + C)
+        for i, cell in enumerate(cells):
+            layout[cell] = (BLOCK_A if i < A else
+                            BLOCK_B if i < A + B else BLOCK_C)
+        solution = Solution(layout, board, early_stop=False)
+        solution()
+        # Positions crossed by the beams on the sides of the blocks
+        # (the position id is Y * span + X in .bff coordinates)
+        crossed = sorted({state >> 2 for state, seen in
+                          enumerate(solution.visited) if seen})
+        crossed = [divmod(pos, board.span)[::-1] for pos in crossed]
+        crossed = [(X, Y) for X, Y in crossed if (X + Y) % 2]
+        if len(crossed) < points:
+            continue
+        text = "\n".join(lines + ["P %d %d" % point for point in
+                                  rng.sample(crossed, points)]) + "\n"
+        # The POIs must not be walled in by the intended solution
+        board = Board(*Input('generated.bff').parse(text.splitlines()))
+        if Solution(layout, board)():
+            return text
+    raise ValueError("No puzzle generated for seed %d" % seed)
+
+
+def _random_lazers(rng, width, height, n):
+    '''
+    This function draws lazors on the sides of the blocks, pointing
+    into the grid when they start on its border
+
+    **Input Parameters**
+        rng: *random.Random*
+            The random generator
+        width, height: *int*
+            The size of the grid in blocks
+        n: *int*
+            The number of lazors
+    **Returns**
+        lazers: *list, tuple*
+            x, y, vx, vy of every lazor
+    '''
+    lazers = []
+    for _ in range(n):
+        # One coordinate even (between blocks), the other odd
+        if rng.random() < 0.5:
+            X = 2 * rng.randint(0, width)
+            Y = 2 * rng.randint(0, height - 1) + 1
+        else:
+            X = 2 * rng.randint(0, width - 1) + 1
+            Y = 2 * rng.randint(0, height)
+        vx = 1 if X == 0 else -1 if X == 2 * width else rng.choice((1, -1))
+        vy = 1 if Y == 0 else -1 if Y == 2 * height else rng.choice((1, -1))
+        lazers.append((X, Y, vx, vy))
+    return lazers
+
+
+def run_puzzle(filename, mode='brute', repeat=1, memory=True, **options):
+    '''
+    This function runs one puzzle through the stages of the solver
+
+    **Input Parameters**
+        filename: *str*
+            The .bff file
+        mode: *str, optional*
+            The search mode of class Lazor
+        repeat: *int, optional*
+            The number of runs, the fastest one is kept
+        memory: *bool, optional*
+            Measure the peak memory in one more run under tracemalloc
+        options: *dict*
+            The other keyword arguments of class Lazor
+    **Returns**
+        record: *dict*
+            The status, times of the parse, search, check and render
+            stages in seconds, candidates, candidates per second and
+            peak memory in bytes
+    '''
+    best = None
+    for _ in range(max(repeat, 1)):
+        record = _run_stages(filename, mode, options)
+        if best is None or record['total_time'] < best['total_time']:
+            best = record
+    if memory:
+        tracemalloc.start()
+        try:
+            _run_stages(filename, mode, options)
+            best['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best
+
+
+def _run_stages(filename, mode, options):
+    '''
+    This function times the stages of the solver once
+
+    **Input Parameters**
+        See run_puzzle
+    **Returns**
+        record: *dict*
+            See run_puzzle
+    '''
+    record = {}
+    t0 = time.perf_counter()
+    dataset1, dataset2 = Input(filename)()
+    t1 = time.perf_counter()
+    lazor = Lazor(dataset1, dataset2, mode, **options)
+    sel_comb = lazor()
+    t2 = time.perf_counter()
+    # Candidates traced by the brute force or nodes of the search
+    candidates = lazor.stats['candidates'] + lazor.stats['nodes']
+    record.update(parse_time=t1 - t0, search_time=t2 - t1,
+                  candidates=candidates,
+                  candidates_per_second=candidates / max(t2 - t1, 1e-9))
+    if sel_comb is None:
+        record.update(status='unsolvable', check_time=0.0, render_time=0.0,
+                      total_time=t2 - t0)
+        return record
+    board = lazor.board
+    solved = Solution(board.layout(sel_comb), board)()
+    t3 = time.perf_counter()
+    Visualisation(filename, dataset2, sel_comb)()
+    t4 = time.perf_counter()
+    record.update(status='solved' if solved else 'wrong', check_time=t3 - t2,
+                  render_time=t4 - t3, total_time=t4 - t0)
+    return record
+
+
+def trace_times(filename, count=2000, seed=0):
+    '''
+    This function times the test of one candidate by class Solution
+    and by class BitSolution, on the same random layouts of the blocks
+    over the 'o' positions, and by class Solution and class
+    IncrementalSolution on the first candidates of the brute force,
+    which differ in a few cells from one to the next
+
+    **Input Parameters**
+        filename: *str*
+            The .bff file
+        count: *int, optional*
+            The number of layouts
+        seed: *int, optional*
+            The seed of the layouts
+    **Returns**
+        times: *dict*
+            The microseconds per candidate of the bytearray layouts
+            (layout_us) and of the bitmasks (bits_us), and of the
+            brute-force candidates traced in full (consecutive_us) or
+            reusing the lazor segments (incremental_us)
+    '''
+    board = Board(*Input(filename)())
+    rng = random.Random(seed)
+    A, B, C = (board.counts[name] for name in ('A', 'B', 'C'))
+    layouts = []
+    for _ in range(count):
+        layout = bytearray(board.blocks)
+        cells = rng.sample(board.open_cells, A + B + C)
+        for i, cell in enumerate(cells):
+            layout[cell] = (BLOCK_A if i < A else
+                            BLOCK_B if i < A + B else BLOCK_C)
+        layouts.append(layout)
+    masks = [board.masks(layout) for layout in layouts]
+    # Candidates of the brute force in order, with the cells changed
+    consecutive, changes = [], []
+    previous = board.blocks
+    for combs in islice(Placements(board.open_cells, A, B, C), count):
+        layout = bytearray(board.blocks)
+        for cells, code in zip(combs, (BLOCK_A, BLOCK_B, BLOCK_C)):
+            for cell in cells:
+                layout[cell] = code
+        changes.append([i for i in board.open_cells
+                        if layout[i] != previous[i]])
+        consecutive.append(layout)
+        previous = layout
+    t0 = time.perf_counter()
+    for layout in layouts:
+        Solution(layout, board)()
+    t1 = time.perf_counter()
+    for mask in masks:
+        BitSolution(mask, board)()
+    t2 = time.perf_counter()
+    for layout in consecutive:
+        Solution(layout, board)()
+    t3 = time.perf_counter()
+    tracer = IncrementalSolution(board)
+    for layout, changed in zip(consecutive, changes):
+        tracer(layout, changed)
+    t4 = time.perf_counter()
+    n = max(len(consecutive), 1)
+    return {'layout_us': 1e6 * (t1 - t0) / max(count, 1),
+            'bits_us': 1e6 * (t2 - t1) / max(count, 1),
+            'consecutive_us': 1e6 * (t3 - t2) / n,
+            'incremental_us': 1e6 * (t4 - t3) / n}
+
+
+def render_times(filename, block_size=100, repeat=3):
+    '''
+    This function times the rendering of the solution of a puzzle, and
+    the fill of its blocks with one rectangle per block against one
+    putpixel call per pixel
+
+    **Input Parameters**
+        filename: *str*
+            The .bff file, solvable
+        block_size: *int, optional*
+            The size of a block in pixels
+        repeat: *int, optional*
+            The number of runs, the fastest one is kept
+    **Returns**
+        times: *dict*
+            The seconds of Visualisation (render), of the block fill
+            with rectangles and with putpixel, and whether both fills
+            give the same pixels (identical)
+    '''
+    dataset1, dataset2 = Input(filename)()
+    sel_comb = Lazor(dataset1, dataset2)()
+    visualisation = Visualisation(filename, dataset2, sel_comb, block_size)
+    figure = visualisation.grid()
+    colors = visualisation.get_colors()
+    times = {'block_size': block_size}
+    images = {}
+    for name, function in (('render', visualisation),
+                           ('rectangle', lambda: _fill_rectangles(
+                               figure, colors, block_size)),
+                           ('putpixel', lambda: _fill_putpixel(
+                               figure, colors, block_size))):
+        best = None
+        for _ in range(max(repeat, 1)):
+            t0 = time.perf_counter()
+            images[name] = function()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        times[name + '_time'] = best
+    times['identical'] = (images['rectangle'].tobytes() ==
+                          images['putpixel'].tobytes())
+    return times
+
+
+def _fill_rectangles(figure, colors, block_size):
+    '''
+    This function fills the blocks of an image as class Visualisation
+    does, one rectangle per block
+
+    **Input Parameters**
+        figure: *list, list, int*
+            The color key of every block (see Visualisation.grid)
+        colors: *dict*
+            The color of every key (see Visualisation.get_colors)
+        block_size: *int*
+            The size of a block in pixels
+    **Returns**
+        img: *Image*
+            The image of the blocks
+    '''
+    img = Image.new("RGBA", (len(figure[0]) * block_size,
+                             len(figure) * block_size), color=0)
+    draw = ImageDraw.Draw(img)
+    for jy, row in enumerate(figure):
+        for jx, key in enumerate(row):
+            x, y = jx * block_size, jy * block_size
+            draw.rectangle((x, y, x + block_size - 1, y + block_size - 1),
+                           fill=colors[key])
+    return img
+
+
+def _fill_putpixel(figure, colors, block_size):
+    '''
+    This function fills the blocks of an image as class Visualisation
+    did before, one putpixel call per pixel
+
+    **Input Parameters**
+        See _fill_rectangles
+    **Returns**
+        img: *Image*
+            The image of the blocks
+    '''
+    img = Image.new("RGBA", (len(figure[0]) * block_size,
+                             len(figure) * block_size), color=0)
+    for jy, row in enumerate(figure):
+        for jx, key in enumerate(row):
+            x, y = jx * block_size, jy * block_size
+            for i in range(block_size):
+                for j in range(block_size):
+                    img.putpixel((x + i, y + j), colors[key])
+    return img
+
+
+def run(levels=4, seed=0, mode='brute', repeat=1, memory=True,
+        directory=None, trace=0, render_size=0, **options):
+    '''
+    This function generates and runs the benchmark levels
+
+    **Input Parameters**
+        levels: *int, optional*
+            The number of levels
+        seed: *int, optional*
+            The seed of the first level, level k uses seed + k
+        mode, repeat, memory, options:
+            See run_puzzle
+        directory: *str, optional*
+            The directory of the .bff files and images, a temporary
+            directory by default
+        trace: *int, optional*
+            The number of random layouts timed alone per level (see
+            trace_times), 0 for none
+        render_size: *int, optional*
+            The pixels per block of the images timed per solved level
+            (see render_times), 0 for none
+    **Returns**
+        results: *dict*
+            The settings of the run and one record per level
+    '''
+    results = {'seed': seed, 'mode': mode, 'options': options,
+               'python': platform.python_version(),
+               'machine': platform.machine(),
+               'date': time.strftime("%Y-%m-%dT%H:%M:%S"), 'levels': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = directory or tmp
+        os.makedirs(directory, exist_ok=True)
+        for k in range(levels):
+            size = level(k)
+            filename = os.path.join(directory, "level_%d.bff" % k)
+            with open(filename, 'w') as file:
+                file.write(generate(seed + k, **size))
+            record = dict(level=k, **size)
+            record.update(run_puzzle(filename, mode, repeat, memory,
+                                     **options))
+            if trace:
+                record['trace'] = trace_times(filename, trace, seed + k)
+            results['levels'].append(record)
+            print("level %d: %dx%d, %d blocks, %s in %.4f s (%d candidates)"
+                  % (k, size['width'], size['height'],
+                     size['A'] + size['B'] + size['C'], record['status'],
+                     record['total_time'], record['candidates']),
+                  file=sys.stderr)
+            if render_size and record['status'] == 'solved':
+                record['render'] = render_times(filename, render_size)
+                print("level %d: render %.4f s, block fill %.4f s with "
+                      "rectangles, %.4f s with putpixel"
+                      % (k, record['render']['render_time'],
+                         record['render']['rectangle_time'],
+                         record['render']['putpixel_time']),
+                      file=sys.stderr)
+            if trace:
+                print("level %d: %s" % (k, ", ".join(
+                    "%s %.1f" % item for item in record['trace'].items())),
+                      file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    '''
+    This function compares the search times of two runs level by level
+
+    **Input Parameters**
+        results, baseline: *dict*
+            The new and old results of function run
+        threshold: *float, optional*
+            The relative slowdown reported as regression
+    **Returns**
+        regressions: *list, int*
+            The levels slower than the baseline by more than threshold
+    '''
+    if baseline.get('options') != results['options']:
+        print("options %s -> %s" % (baseline.get('options'),
+                                    results['options']), file=sys.stderr)
+    old = {record['level']: record for record in baseline['levels']}
+    regressions = []
+    for record in results['levels']:
+        if record['level'] not in old:
+            continue
+        before = old[record['level']]['search_time']
+        ratio = record['search_time'] / max(before, 1e-9)
+        slower = ratio > 1 + threshold
+        if slower:
+            regressions.append(record['level'])
+        print("level %d: search %.4f s -> %.4f s (x%.2f)%s"
+              % (record['level'], before, record['search_time'], ratio,
+                 "  REGRESSION" if slower else ""), file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    '''
+    This function is the command line interface of the benchmark
+
+    **Input Parameters**
+        argv: *list, str, optional*
+            The command line arguments, sys.argv by default
+    **Returns**
+        status: *int*
+            1 if a level is slower than the --compare baseline
+    '''
+    parser = argparse.ArgumentParser(
+        description="Benchmark the lazor solver on generated boards")
+    parser.add_argument('-n', '--levels', type=int, default=4,
+                        help="number of levels, from a 3x3 grid with "
+                             "3 blocks up")
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help="seed of the first level")
+    parser.add_argument('-m', '--mode',
+                        choices=('brute', 'prune', 'constraint'),
+                        default='brute', help="search mode")
+    parser.add_argument('-r', '--repeat', type=int, default=1,
+                        help="runs per level, the fastest one is kept")
+    parser.add_argument('--no-memory', action='store_false', dest='memory',
+                        help="skip the tracemalloc run of the peak memory")
+    parser.add_argument('--bits', action='store_true',
+                        help="test the candidates with class BitSolution")
+    parser.add_argument('--memo', type=int, default=0, metavar='N',
+                        help="remember N lazor paths (class TraceMemo)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="test the candidates with class "
+                             "IncrementalSolution")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="search processes (the peak memory is the "
+                             "one of the main process only)")
+    parser.add_argument('--trace', type=int, default=0, metavar='N',
+                        help="time the test of N random layouts per level "
+                             "with bytearrays and bitmasks, in microseconds "
+                             "per candidate")
+    parser.add_argument('--render-size', type=int, default=0, metavar='PX',
+                        help="time the images of the solutions at PX "
+                             "pixels per block, and their block fill with "
+                             "rectangles against putpixel")
+    parser.add_argument('-d', '--directory',
+                        help="keep the .bff files and images in DIRECTORY")
+    parser.add_argument('-o', '--output',
+                        help="JSON file of the results, stdout by default")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="JSON results of an earlier run to compare to")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.levels, args.seed, args.mode, args.repeat,
+                  args.memory, args.directory, args.trace, args.render_size,
+                  bits=args.bits, memo=args.memo,
+                  incremental=args.incremental, workers=args.workers)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,75 @@ Vamsi Reddy <vreddy17@jhu.edu>
 Emad Mohammed Naveed <enaveed1@jhu.edu>
 '''
 # Import packages
-from itertools import combinations
+from array import array
+from collections import OrderedDict
+from concurrent.futures import (ProcessPoolExecutor, as_completed, wait,
+                                FIRST_COMPLETED)
+from contextlib import contextmanager
+from itertools import combinations, compress, islice
+from functools import partial
+from math import comb
 from PIL import Image, ImageDraw
+import argparse
+import cProfile
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import struct
+import sys
 import time
 
+# Block codes of the lattice board (see class Board)
+BLOCK_O, BLOCK_A, BLOCK_B, BLOCK_C, BLOCK_X = range(5)
+CODES = {'A': BLOCK_A, 'B': BLOCK_B, 'C': BLOCK_C}
+NAMES = {BLOCK_A: 'A', BLOCK_B: 'B', BLOCK_C: 'C'}
+# Lookup tables of class Board by grid size (width, height); they only
+# depend on the size and are shared by all boards of a process
+LOOKUPS = OrderedDict()
+LOOKUP_SIZES = 64
+# Color keys of the blocks in class Visualisation (see get_colors)
+COLOR_KEYS = {'A': 1, 'B': 2, 'C': 3}
+# Outputs of the render stage (see function render_solution) and the
+# pixels per block of a thumbnail
+RENDER_KINDS = ('image', 'thumbnail', 'text')
+THUMBNAIL_SIZE = 12
+# First bytes of a gzip file, for level packs (see Input.puzzles)
+GZIP_MAGIC = b'\x1f\x8b'
+logger = logging.getLogger(__name__)
+# Profiler of the puzzle being solved, None when profiling is disabled
+# (see class Profiler)
+PROFILER = None
+
+
+class LazorError(Exception):
+    '''
+    This class is the base of the errors raised by the lazor solver
+    '''
+
+
+class PuzzleFormatError(LazorError, ValueError):
+    '''
+    This class is the error of a malformed .bff file or puzzle
+    '''
+
+
+class NoSolutionError(LazorError):
+    '''
+    This class is the error of drawing a puzzle without solution
+    '''
+
+
+class BudgetExhausted(LazorError):
+    '''
+    This class is raised by a search running out of its time or
+    candidate budget (see class Budget)
+    '''
+
 
 class Input:
     '''
@@ -57,22 +122,115 @@ class Input:
         '''
         # If the file extension is not .bff file
         if not self.filename.lower().endswith('.bff'):
-            raise SystemExit("Invalid File type, try with .bff files")
+            raise PuzzleFormatError("Invalid File type, try with .bff files")
+        # Open the file with .bff extensions
+        with open(self.filename, 'r') as file:
+            # Read the information line by line
+            lines = file.read().splitlines()
+        return self.parse(lines)
+
+    def puzzles(self):
+        '''
+        This function streams a level pack, several .bff puzzles one
+        after the other in a plain or gzip-compressed file, and parses
+        one puzzle at a time
+        - A puzzle starts at a GRID START line and ends before the next
+        - Only the lines of the current puzzle are kept in memory
+        - A malformed puzzle gives an error instead of stopping the pack
+
+        **Input Parameters**
+            None
+        **Returns**
+            puzzles: *generator, tuple*
+                The puzzle number (from 1), the datasets of class Input
+                (dataset1, dataset2), or None, and the error message,
+                or None
+        '''
+        with open(self.filename, 'rb') as file:
+            compressed = file.read(2) == GZIP_MAGIC
+        opener = gzip.open if compressed else open
+        index = 0
+        with opener(self.filename, 'rt') as file:
+            for index, (start, lines) in enumerate(self.split(file), 1):
+                yield self.parse_puzzle(index, start, lines)
+        if not index:
+            yield 1, None, "No grid start or stop indicated in test file"
+
+    @staticmethod
+    def split(lines):
+        '''
+        This function splits the lines of a level pack into puzzles,
+        each one starting at a GRID START line
+
+        **Input Parameters**
+            lines: *iterable, str*
+                The lines of the pack, read lazily
+        **Returns**
+            puzzles: *generator, tuple*
+                The line number of the GRID START of every puzzle and
+                its lines
+        '''
+        puzzle, start = None, 0
+        for number, line in enumerate(lines, 1):
+            line = line.rstrip('\r\n')
+            # Grid markers with trailing spaces in edited packs
+            if line.strip() in ("GRID START", "GRID STOP"):
+                line = line.strip()
+            if line == "GRID START":
+                if puzzle is not None:
+                    yield start, puzzle
+                puzzle, start = [], number
+            # Lines before the first grid are comments of the pack
+            if puzzle is not None:
+                puzzle.append(line)
+        if puzzle is not None:
+            yield start, puzzle
+
+    def parse_puzzle(self, index, start, lines):
+        '''
+        This function parses one puzzle of a level pack
+
+        **Input Parameters**
+            index: *int*
+                The puzzle number in the pack
+            start: *int*
+                The line number of its GRID START
+            lines: *list, str*
+                The lines of the puzzle
+        **Returns**
+            puzzle: *tuple*
+                See puzzles
+        '''
+        try:
+            # Fresh position variables for every puzzle
+            return index, Input(self.filename).parse(lines), None
+        except PuzzleFormatError as error:
+            return index, None, "line %d: %s" % (start, error)
+
+    def parse(self, lines):
+        '''
+        This function will extract the information of the lines
+        of a .bff file
+
+        **Input Parameters**
+            lines: *list, str*
+                The lines of the .bff file
+        **Returns**
+            dataset1, dataset2: *dict*
+                The dictionaries described in __call__
+        '''
         # Initializing position variables and block list
         A, B, C = 0, 0, 0
         o_l, x_l, A_l, B_l, C_l, lazers, points = (
             [] for i in range(7))
 
-        # Open the file with .bff extensions
-        file = open(self.filename, 'r')
-        # Read the information line by line
-        lines = file.read().splitlines()
         # Defining the start and stop for extracting positions
         try:
             start = lines.index("GRID START")
             stop = lines.index("GRID STOP")
         except BaseException:
-            raise SystemExit("No grid start or stop indicated in test file")
+            raise PuzzleFormatError(
+                "No grid start or stop indicated in test file")
 
         # Iterating through each line to extract grid
         for line in lines[start + 1: stop]:
@@ -95,11 +253,11 @@ class Input:
                 else:
                     continue
             self.y += 1
-        self.x = i + 1
 
         # If no positions 'o' in the grid
         if len(o_l) == 0:
-            raise SystemExit("No open positions to move the block")
+            raise PuzzleFormatError("No open positions to move the block")
+        self.x = i + 1
 
         # Initalizing the grid
         grid = [o_l, x_l, A_l, B_l, C_l]
@@ -115,12 +273,18 @@ class Input:
             else:
                 # split by tab/space
                 pos = inputs.split()
+                if inputs[0] in 'ABC':
+                    try:
+                        number = int(pos[-1])
+                    except ValueError:
+                        raise PuzzleFormatError(
+                            "Invalid number of %s blocks" % inputs[0])
                 if inputs[0] == 'A':
-                    A = int(pos[-1])
+                    A = number
                 elif inputs[0] == 'B':
-                    B = int(pos[-1])
+                    B = number
                 elif inputs[0] == 'C':
-                    C = int(pos[-1])
+                    C = number
                 # Lazor positions and directions
                 elif inputs[0] == 'L':
                     # Executes only if both the positions and
@@ -129,23 +293,47 @@ class Input:
                         lazers.append([int(pos[1]), int(pos[2]),
                                        int(pos[3]), int(pos[4])])
                     except BaseException:
-                        raise SystemExit(
+                        raise PuzzleFormatError(
                             "Position or direction not specified for lazors")
                 # Points for Intersection
                 elif inputs[0] == 'P':
                     try:
                         points.append([int(pos[1]), int(pos[2])])
                     except BaseException:
-                        raise SystemExit(
+                        raise PuzzleFormatError(
                             "Invalid coordinates for intersection points")
 
         # if there are no blocks to move
         if A == 0 and B == 0 and C == 0:
-            raise SystemExit("No blocks available to solve the lazor")
+            raise PuzzleFormatError("No blocks available to solve the lazor")
         # If no lazor info is provided
         elif len(lazers) == 0:
-            raise SystemExit("No lazors info is provided in test file")
+            raise PuzzleFormatError("No lazors info is provided in test file")
 
+        return self.build(grid_update, A, B, C, lazers, points)
+
+    def build(self, grid_update, A, B, C, lazers, points):
+        '''
+        This function creates the dictionaries with the extracted
+        information of a grid of size (self.x, self.y)
+
+        **Input Parameters**
+            grid_update: *list, int*
+                The transformed positions of 'o', 'x', A, B, C
+            A, B, C: *int*
+                The number of blocks to place
+            lazers: *lists*
+                The positions and directions of lazors in the file
+            points: *lists*
+                The positions of points of intersection in the file
+        **Returns**
+            dataset1: *dict*
+                size of the grid, lazors, points of intersection,
+                blocks (A, B, C)
+            dataset2: *dict*
+                size of the grid, and individual lists of blocks
+                and no-movement positions
+        '''
         # Transformation the positions of given lazors
         lazers, points = self.position_transformation(lazers, points)
         # Creating dictionaries with extracted information
@@ -165,9 +353,6 @@ class Input:
                      "C_l": grid_update[4],
                      'Lazers': lazers,
                      'Points': points})
-
-        # closing the  .bff file
-        file.close()
         return dataset1, dataset2
 
     def grid_transformation(self, lists):
@@ -216,513 +401,3575 @@ class Input:
         return lazers, points
 
 
-class Lazor:
+class BoardCache:
     '''
-        This class estimates all possible combinations to find the solution
-        Step 1: Sorting A blocks in possible 'o' positions to get all
-                combinations
-        Step 2: With leftover o positions, do similar combination search
-                for B, C
-        Step 3: Create possible combinations of A, B, C with available
-                'o' positions and locked blocks within the grid
+    This class keeps compiled boards on disk, so that solving the same
+    .bff files again skips parsing them
+    - An entry is a small struct-packed file named by the SHA-256 hash of
+      the .bff content, so a changed file never reuses a stale entry
+    - Entries carry a format version and the hash, checked on loading
+    - The lookup tables of class Board are kept once per grid size
+    - Beyond a size cap the least recently used entries are removed
     '''
+    MAGIC = b'LZB'
+    VERSION = 1
+    HEADER = struct.Struct('<3sB32s')
 
-    def __init__(self, dataset1, dataset2):
+    def __init__(self, directory, max_bytes=64 * 2 ** 20):
         '''
-        The __init__ method will utilize the dictionaries created from
-        class Input and initialize all the extracted information as variables
+        The __init__ method will initialize the cache directory
 
         **Input Parameters**
-            dataset1: *dict*
-                The dictionary with following attributes
-                size of the grid, lazors, points of intersection,
-                and number of blocks (A, B, C)
-            dataset2: *dict*
-                The dictionary with following attributes
-                size of the grid, individual lists of blocks
-                and no-movement positions
+            directory: *str*
+                The directory of the cache entries, created if missing
+            max_bytes: *int, optional*
+                The size cap of all entries
         **Returns**
             None
-
         '''
-        self.o_l = dataset1['o_l']
-        self.size = dataset1['Size']
-        self.lazers = dataset1['Lazers']
-        self.points = dataset1['Points']
-        self.A = dataset1['A']
-        self.B = dataset1['B']
-        self.C = dataset1['C']
-        self.dataset2 = dataset2
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0}
+        os.makedirs(directory, exist_ok=True)
+        # Size of all entries, updated on writes and evictions
+        self.size = 0
+        self.evict()
 
-    def __call__(self):
+    def load(self, filename):
         '''
-        The __call__ method will return the right combination
-        of coordinates of different blocks
+        This function returns the datasets of a .bff file, from the
+        cache if possible, parsing and caching the file otherwise
 
         **Input Parameters**
-            None
+            filename: *str*
+                The lazor test file
         **Returns**
-            sel_comb: *dict, list, int*
-                The right combination of coordinates of different blocks
+            dataset1, dataset2: *dict*
+                The dictionaries of class Input
         '''
-        # All possible combinations of A in 'o' positions
-        o_lA = list(combinations(self.o_l, self.A))
-        # For every A block
-        for i_a in o_lA:
-            # Sorting the available 'o' positions, A combinations
-            o_l, a_comb = self.new_sort("a_comb", self.o_l, list(i_a))
-            # Possible combinations of B with new o positions
-            # (after A block is fixed)
-            o_lB = list(combinations(self.o_l, self.B))
-            # For every B block
-            for i_b in o_lB:
-                # Sorting the available 'o' positions, B combinations
-                o_l, b_comb = self.new_sort("b_comb", self.o_l, list(i_b))
-                # Possible combinations of C with new 'o' positions
-                # (after A, B blocks fixed)
-                o_lC = list(combinations(self.o_l, self.C))
-                # For every C block
-                for i_c in o_lC:
-                    # Sorting the available 'o' positions, C combinations
-                    o_l, c_comb = self.new_sort("c_comb", self.o_l, list(i_c))
-
-                    # Selecting a set of different coordinates amongst
-                    # all possible combinations
-                    sel_comb = self.set_abc(
-                        [a_comb, b_comb, c_comb], ['A', 'B', 'C'])
+        if not filename.lower().endswith('.bff'):
+            return Input(filename)()
+        with open(filename, 'rb') as file:
+            content = file.read()
+        digest = hashlib.sha256(content).digest()
+        path = os.path.join(self.directory, digest.hex() + '.lzb')
+        datasets = self.read(path, digest)
+        if datasets is not None:
+            self.stats['hits'] += 1
+            # Most recently used
+            os.utime(path)
+        else:
+            self.stats['misses'] += 1
+            datasets = Input(filename).parse(content.decode().splitlines())
+            self.write(path, digest, *datasets)
+        self.load_tables(*datasets)
+        return datasets
+
+    def load_tables(self, dataset1, dataset2):
+        '''
+        This function makes the lookup tables of the grid size available
+        to class Board, from the cache if possible
 
-                    # Testing the selected combination under class Solution
-                    test_comb = Solution(
-                        sel_comb,
-                        self.lazers,
-                        self.points,
-                        self.dataset2,
-                        self.size)
-
-                    # If true, return the right combination
-                    # of coordinates of different blocks
-                    if test_comb():
-                        return sel_comb
-                    # Else test the next possible combination
-                    o_l, c_comb = self.rearrange(
-                        c_comb, o_l, self.C, list(i_c), "C")
-                o_l, b_comb = self.rearrange(
-                    b_comb, o_l, self.B, list(i_b), "B")
-            o_l, a_comb = self.rearrange(a_comb, o_l, self.A, list(i_a), "A")
+        **Input Parameters**
+            dataset1, dataset2: *dict*
+                The dictionaries of class Input
+        **Returns**
+            None
+        '''
+        key = tuple(dataset1['Size'])
+        if key in LOOKUPS:
+            return
+        path = os.path.join(self.directory, 'lookup-%dx%d.lzt' % key)
+        digest = hashlib.sha256(b'%d %d' % key).digest()
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            if self.HEADER.unpack_from(data) == (
+                    self.MAGIC, self.VERSION, digest):
+                tables = array('i')
+                tables.frombytes(data[self.HEADER.size:])
+                if sys.byteorder == 'big':
+                    tables.byteswap()
+                n = len(tables) // 3
+                LOOKUPS[key] = (tables[:n], tables[n:2 * n], tables[2 * n:])
+                os.utime(path)
+                return
+        except (OSError, struct.error, ValueError):
+            pass
+        # Computed by the board and saved for the next runs
+        board = Board(dataset1, dataset2)
+        tables = board.neighbours + board.moves + board.bounces
+        if sys.byteorder == 'big':
+            tables.byteswap()
+        self.save(path, self.HEADER.pack(self.MAGIC, self.VERSION, digest)
+                  + tables.tobytes())
 
-    def set_abc(self, block_positions, name):
+    def read(self, path, digest):
         '''
-        This function will create a new dictionary with A, B, C
-        combinations
+        This function loads an entry of the cache
 
         **Input Parameters**
-            block_positions: *list, int*
-                The list with positions of a specific block
-            name: *list, int*
-                The name of the specific block
+            path: *str*
+                The entry file
+            digest: *bytes*
+                The hash of the .bff content
         **Returns**
-            sel_comb: *dict, list, int*
-                An updated dictionary with A, B, C combinations
+            dataset1, dataset2: *dict*
+                The dictionaries of class Input, None if the entry is
+                missing, damaged or written for another content or version
         '''
-        sel_comb = {}
-        for j in range(len(block_positions)):
-            # Accessing each position
-            block_position = block_positions[j]
-            for i in block_position:
-                # Creating a key, value pair
-                sel_comb[(i[0], i[1])] = name[j]
-        return sel_comb
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            magic, version, stored = self.HEADER.unpack_from(data)
+            if (magic, version, stored) != (self.MAGIC, self.VERSION, digest):
+                return None
+            values = iter(struct.unpack_from(
+                '<%di' % ((len(data) - self.HEADER.size) // 4),
+                data, self.HEADER.size))
+            reader = Input(path)
+            reader.x, reader.y, A, B, C = islice(values, 5)
+            # Lists of 'o', 'x', A, B, C, lazors and points
+            lists = []
+            for width in (2, 2, 2, 2, 2, 4, 2):
+                lists.append([list(islice(values, width))
+                              for _ in range(next(values))])
+        except (OSError, struct.error, StopIteration):
+            return None
+        return reader.build(lists[:5], A, B, C, lists[5], lists[6])
 
-    def new_sort(self, list_name, o_l, list_elements):
+    def write(self, path, digest, dataset1, dataset2):
         '''
-        This function will update 'o' positions list
-        after every iteration in the combinations loop
+        This function saves an entry of the cache, with the lazors
+        and points in the integer coordinates of the .bff file
 
         **Input Parameters**
-            list_name: *str*
-                The name of the specific block
-            o_l: *list, int*
-                The 'o' positions list
-            list_elements: *list, int*
-                The specific block positions (A, B, or C)
+            path: *str*
+                The entry file
+            digest: *bytes*
+                The hash of the .bff content
+            dataset1, dataset2: *dict*
+                The dictionaries of class Input
+        **Returns**
+            None
+        '''
+        width, height = dataset1['Size']
+        values = [width, height, dataset1['A'], dataset1['B'], dataset1['C']]
+        lazers = [[round(2 * x), round(2 * (height - y)),
+                   round(2 * vx), round(-2 * vy)]
+                  for x, y, vx, vy in dataset1['Lazers']]
+        points = [[round(2 * x), round(2 * (height - y))]
+                  for x, y in dataset1['Points']]
+        for items in (dataset1['o_l'], dataset2['x_l'], dataset2['A_l'],
+                      dataset2['B_l'], dataset2['C_l'], lazers, points):
+            values.append(len(items))
+            for item in items:
+                values.extend(item)
+        data = (self.HEADER.pack(self.MAGIC, self.VERSION, digest)
+                + struct.pack('<%di' % len(values), *values))
+        self.save(path, data)
 
+    def save(self, path, data):
+        '''
+        This function writes a file of the cache atomically: it is
+        written aside and renamed, never read half-written
+
+        **Input Parameters**
+            path: *str*
+                The entry file
+            data: *bytes*
+                The content of the entry
         **Returns**
-            o_l: *list, int*
-                The 'o' positions list
-            vars()[list_name]: *variable name*
-                The name of the specific block
+            None
         '''
-        # Creating a list with the variable name
-        vars()[list_name] = []
-        # extending the list with specific block positions
-        (vars()[list_name]).extend(list_elements)
-        # For A, B blocks
-        if not list_name == 'c_comb':
-            for item in list_elements:
-                # Try and except for removing elements
-                try:
-                    o_l.remove(item)
-                except BaseException:
-                    pass
-        return o_l, vars()[list_name]
-
-    def rearrange(self, block_list, o_l, number, extend_list, alphabet):
-        '''
-        This function will rearrange the o_list and specific block list
-        by removing newly added positions. This new list will be used for
-        next iteration to find the right combination
-
-        **Input Parameters**
-            block_list: *list, int*
-                The list of specific block combinations with available
-                'o' positions
-            o_l: *list, int*
-                The 'o' positions list
-            number: *int*
-                The number of specific blocks for every iteration
-            extend_list: *list, int*
-                The positions of the block (A, B, C) from all combinations
-            alphabet: *str*
-                The name for the specific function
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        '''
+        This function removes the least recently used entries
+        until the cache fits its size cap
 
+        **Input Parameters**
+            None
         **Returns**
-            o_l: *list, int*
-                The updated o positions list
-            block_list: *list, int*
-                The updated list of specific block combinations
+            None
         '''
-        # When there are specific blocks
-        if number != 0:
-            del block_list[-number:]
-            # Updating o positions list
-            if alphabet != "C":
-                o_l.extend(extend_list)
-        return o_l, block_list
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(('.lzb', '.lzt')):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        self.size = sum(i[1] for i in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= size
 
 
-class Solution:
+class SolutionCache:
     '''
-        This class has functions to solve the lazor puzzle
-        - Criteria: Lazer intersection with given points
-        - Input: Possble combinations of blocks, lazors, points of intersection
-        - Handles the functions for refract, reflect, hitting the block,
-          moving lazor, position and lazor encounters
-        - List of points of intersection is empty
-
+    This class remembers the solutions of puzzles seen before
+    - Puzzles are keyed by a hash of the grid, the number of blocks,
+      the lazors and the POIs, whatever file or request they come from
+    - The value is the winning sel_comb, or the verdict that the puzzle
+      has no solution
+    - Entries live in memory, and optionally in an SQLite database;
+      both drop the least recently used entries beyond a size cap
+    - A stored sel_comb is traced once before it is returned
     '''
 
-    def __init__(self, sel_comb, lazers, points, dataset2, size):
+    def __init__(self, path=None, max_entries=10000):
         '''
-
-        The __init__ method will initialize the previously generated dictionaries,
-        lazors' information, size of the grid etc.
+        The __init__ method will initialize the empty cache
 
         **Input Parameters**
-            sel_comb: *dict*
-                The dictionary with following attributes
-                size of the grid, and blocks (A, B, C)
-            lazers: *list, int*
-                The list of lazor positions and directions
-            points: *list, int*
-                The list of positions of points of intersections
-            dataset2: *dict*
-                The dictionary with following attributes
-                size of the grid, and individual lists of blocks
-                (A,B.C) and no-movement positions
-            size:*list, int*
-                The size of the grid for the lazor
+            path: *str, optional*
+                The SQLite database file, memory only by default
+            max_entries: *int, optional*
+                The size cap of the memory and of the database
         **Returns**
             None
-
         '''
-        self.size = size
-        self.sel_comb = sel_comb
-        self.lazers = lazers
-        self.points = points
-        self.x = 0
-        self.y = 0
-        self.vx = 0
-        self.vy = 0
-        self.A_l = dataset2['A_l']
-        self.B_l = dataset2['B_l']
-        self.C_l = dataset2['C_l']
+        self.path = path
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.db = None
+        self.stats = {'hits': 0, 'misses': 0, 'rejected': 0}
 
-    def __call__(self):
+    def __getstate__(self):
         '''
-        The __call__ method will add fixed elements into the dictionary and
-        test if all POIs are intersected by the lazors
+        The __getstate__ method leaves the database connection out when
+        the cache is sent to another process, which opens its own
 
         **Input Parameters**
             None
         **Returns**
-            True/False *bool*
-                True if list of points of intersection (POI) is empty
+            state: *dict*
+                The attributes of the cache
         '''
-        # Incoporate coordinates of fixed A blocks
-        if self.A_l:
-            for i in self.A_l:
-                self.sel_comb[(i[0], i[1])] = 'A'
-        # Incoporate coordinates of fixed B blocks
-        if self.B_l:
-            for i in self.B_l:
-                self.sel_comb[(i[0], i[1])] = 'B'
-        # Incoporate coordinates of fixed C blocks
-        if self.C_l:
-            for i in self.C_l:
-                self.sel_comb[(i[0], i[1])] = 'C'
-        # Iterating over every lazer
-        for li in self.lazers:
-            # Run the function
-            self.move_lazor(li)
+        state = dict(self.__dict__)
+        state['db'] = None
+        return state
 
-        # if list of POI is empty
-        if self.points == []:
-            return True
-        return False
+    def connect(self):
+        '''
+        This function opens the SQLite database on first use
+
+        **Input Parameters**
+            None
+        **Returns**
+            db: *sqlite3.Connection*
+                The connection, None for a memory only cache
+        '''
+        if self.db is None and self.path is not None:
+            self.db = sqlite3.connect(self.path, timeout=30)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                            "(key TEXT PRIMARY KEY, value TEXT, used REAL)")
+        return self.db
 
-    def pos_chk(self, upd_pos):
+    def key(self, board):
         '''
-        This function will check if the position is
-        within the range of the grid
+        This function computes the canonical hash of a puzzle: the order
+        and repetitions of the lazors and POIs in the file do not matter
 
         **Input Parameters**
-            upd_pos: *list, int*
-                The list with x, y coordinates or positions
+            board: *Board*
+                The lattice model of the grid
         **Returns**
-            True/False: *bool*
-                True if coordinates is within the range
+            key: *str*
+                The hexadecimal SHA-256 hash
         '''
-        # Initializing x boundaries
-        x = upd_pos[0]
-        # Max x-position
-        xu = self.size[0]
-        # Initializing y boundaries
-        y = upd_pos[1]
-        # Max y-position
-        yu = self.size[1]
+        canonical = repr((board.width, board.height, bytes(board.blocks),
+                          sorted(board.open_cells),
+                          sorted(board.counts.items()),
+                          sorted(set(board.lazers)),
+                          sorted(set(board.points))))
+        return hashlib.sha256(canonical.encode()).hexdigest()
 
-        # True if within the range
-        return x >= 0 and x < xu and y >= 0 and y < yu
+    def get(self, key, board):
+        '''
+        This function looks up a puzzle
 
-    def move_lazor(self, lazer):
+        **Input Parameters**
+            key: *str*
+                The hash of the puzzle (see key)
+            board: *Board*
+                The lattice model of the grid, to check the solution
+        **Returns**
+            found: *bool*
+                True if the puzzle is in the cache
+            sel_comb: *dict, tuple, str*
+                The solution, None if the puzzle has no solution
         '''
-        This function represents the movement of lazor along its direction
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory.move_to_end(key)
+        elif self.connect() is not None:
+            row = self.db.execute("SELECT value FROM solutions WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is not None:
+                value = row[0]
+                self.db.execute("UPDATE solutions SET used = ? WHERE key = ?",
+                                (time.time(), key))
+                self.db.commit()
+                self.remember(key, value)
+        if value is None:
+            self.stats['misses'] += 1
+            return False, None
+        sel_comb = self.decode(value)
+        if sel_comb is not None and not self.check(board, sel_comb):
+            # Wrong entry: forget it and solve again
+            self.stats['rejected'] += 1
+            self.stats['misses'] += 1
+            self.forget(key)
+            return False, None
+        self.stats['hits'] += 1
+        return True, sel_comb
+
+    def put(self, key, sel_comb):
+        '''
+        This function stores the solution of a puzzle
 
         **Input Parameters**
-            lazer: *list, int*
-                The list with lazor position and direction
+            key: *str*
+                The hash of the puzzle (see key)
+            sel_comb: *dict, tuple, str*
+                The solution, None if the puzzle has no solution
         **Returns**
             None
         '''
-        self.x, self.y, self.vx, self.vy = lazer
-        pos = [self.x, self.y]
-        # If lazer position interesects one of POIs, remove the POI from list
-        self.points = list(filter(lambda x: x != pos, self.points))
-        # If direction of x-comp is negative and x-coordinate is a whole number
-        if self.x.is_integer() and self.vx < 0:
-            self.conditional((self.x - 1, (self.y * 2 - 1) / 2), lazer)
-        # If direction of x-comp is positive and x-coordinate is a whole number
-        elif self.x.is_integer() and self.vx > 0:
-            self.conditional((self.x, (self.y * 2 - 1) / 2), lazer)
-        # If direction of y-comp is negative and y-coordinate is a whole number
-        elif not self.x.is_integer() and self.vy < 0:
-            self.conditional(((self.x * 2 - 1) / 2, self.y - 1), lazer)
-        # If direction of y-comp is positive and y-coordinate is a whole number
-        else:
-            self.conditional(((self.x * 2 - 1) / 2, self.y), lazer)
+        value = self.encode(sel_comb)
+        self.remember(key, value)
+        if self.connect() is not None:
+            self.db.execute("INSERT OR REPLACE INTO solutions "
+                            "VALUES (?, ?, ?)", (key, value, time.time()))
+            # Least recently used entries beyond the size cap
+            self.db.execute("DELETE FROM solutions WHERE key IN (SELECT key "
+                            "FROM solutions ORDER BY used DESC LIMIT -1 "
+                            "OFFSET ?)", (self.max_entries,))
+            self.db.commit()
 
-    def reflect(self, lazer):
+    def remember(self, key, value):
         '''
-        This function is executed if it encounters the A block
-        To validate the lazor touching the blocks:
-        Step 1: Check lazor direction
-        Step 2: Verify the touch (Lazor - block)
-        Step 3: If touch is on sides or top or bottom
+        This function keeps an entry in memory
+
+        **Input Parameters**
+            key, value: *str*
+                The hash of the puzzle and the encoded solution
+        **Returns**
+            None
+        '''
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
 
+    def forget(self, key):
+        '''
+        This function removes an entry
 
         **Input Parameters**
-            lazer: *List, int*
-                The list with lazor positions and directions
+            key: *str*
+                The hash of the puzzle
         **Returns**
             None
         '''
-        x, y, vx, vy = lazer
-        # If x-coordinate is integer
-        if self.x.is_integer():
-            # Update position and run move_lazor() function
-            self.move_lazor((x - vx, y + vy, - vx, vy))
-        else:
-            self.move_lazor((x + vx, y - vy, vx, - vy))
+        self.memory.pop(key, None)
+        if self.connect() is not None:
+            self.db.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            self.db.commit()
 
-    def refract(self, lazer):
+    def encode(self, sel_comb):
         '''
-        This function is executed if it encounters the C block
-        This function will encrypt any string
-        Reflect section
-        Step 1: Check lazor direction
-        Step 2: Verify the touch (Lazor - block)
-        Step 3: If touch is on sides or top or bottom
+        This function converts a solution into text
 
-        Refract section
-        Step 4: Run the move_lazor() function
+        **Input Parameters**
+            sel_comb: *dict, tuple, str*
+                The solution, None if the puzzle has no solution
+        **Returns**
+            value: *str*
+                JSON list of [x, y, name], or "unsolvable"
+        '''
+        if sel_comb is None:
+            return "unsolvable"
+        return json.dumps(sorted([x, y, name]
+                                 for (x, y), name in sel_comb.items()))
+
+    def decode(self, value):
+        '''
+        This function converts text back into a solution
 
         **Input Parameters**
-            parameter: *int, float, optional*
-                The parameter that adds itself to the previous term
+            value: *str*
+                The text written by encode
         **Returns**
-            None
+            sel_comb: *dict, tuple, str*
+                The solution, None if the puzzle has no solution
         '''
-        x, y, vx, vy = lazer
-        up_x = x + vx
-        up_y = y + vy
-        mov_pos = (up_x, up_y, vx, vy)
-        self.move_lazor(mov_pos)
-        # If x-coordinate is a whole number
-        if self.x.is_integer():
-            mov_pos = (x - vx, y + vy, - vx, vy)
-            self.move_lazor(mov_pos)
-        else:
-            mov_pos = (x + vx, y - vy, vx, - vy)
-            self.move_lazor(mov_pos)
-
-    def conditional(self, upd_pos, lazer):
-        '''
-        This function test will block (A, B or C) the lazer encounters
-
-        **Input Parameters**
-            upd_pos: *tuple, float, optional*
-                The updated position in lazer direction
-        **Returns**
-            None: *None-type*
-                If lazor position is outside the grid
-                or if it encounters Block B
-        '''
-        # If lazor position is within the grid
-        if self.pos_chk(upd_pos):
-            #  If lazor position found amongst the selected combination
-            if upd_pos in self.sel_comb:
-                # Get the name of the blocl
-                name = self.sel_comb[upd_pos]
-                # Run reflect() function
-                if name == 'A':
-                    self.reflect(lazer)
-                # Run refract() function
-                elif name == 'C':
-                    self.refract(lazer)
-                # If Block B, return
-                else:
-                    return None
-            else:
-                l_upd = (self.x + self.vx, self.y + self.vy, self.vx, self.vy)
-                self.move_lazor(l_upd)
-        else:
+        if value == "unsolvable":
             return None
+        return {(x, y): name for x, y, name in json.loads(value)}
 
+    def check(self, board, sel_comb):
+        '''
+        This function traces a stored solution once: it must keep the
+        fixed blocks, place the available blocks on 'o' positions and
+        intersect every POI
 
-class Visualisation:
-    '''
-        This class defines various operations for plotting the final solution
-        for a given lazor test case
+        **Input Parameters**
+            board: *Board*
+                The lattice model of the grid
+            sel_comb: *dict, tuple, str*
+                The stored solution
+        **Returns**
+            True/False *bool*
+                True if the solution is right
+        '''
+        try:
+            blocks = board.layout(sel_comb)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return False
+        open_cells = set(board.open_cells)
+        for cell, code in enumerate(blocks):
+            if cell not in open_cells and code != board.blocks[cell]:
+                return False
+        placed = [blocks[i] for i in open_cells]
+        for name, number in board.counts.items():
+            if placed.count(CODES[name]) != number:
+                return False
+        return Solution(blocks, board)()
 
-        Step 1: Creating a grid with blocks
-        Step 2: Assigning the colors as per the above color scheme
-        Step 3: Retracing the lazor path
-        Step 4: Draw the grid lines, intersection points and lazer points
-        Step 5: Save the solution as .png file in the root file
+
+class Board:
+    '''
+    This class is the compact integer model of a lazor grid used by the solver
+    - Lazors and POIs keep the native .bff half-step coordinates (X, Y),
+      a position has the id Y * (2 * width + 1) + X
+    - Blocks are stored in a bytearray indexed by the cell id
+      row * width + column (rows counted from the top)
+    - A lazor state is the integer position * 4 + direction, where the
+      direction is (dx > 0) + 2 * (dy > 0)
+    - For every state the cell in front of the lazor, the state after
+      moving on and the state after a reflection are precomputed
     '''
 
-    def __init__(self, filename, info, sel_comb):
+    def __init__(self, dataset1, dataset2):
         '''
-        The __init__ method will initialize the filename, block info
-        and the dictionary with A, B, C combinations
+        The __init__ method will convert the dictionaries created from
+        class Input into the lattice representation
 
         **Input Parameters**
-            file: *str*
-                The filename to save the output
-            info: **
-
-            sel_comb: *dict, list, int*
-                An updated dictionary with A, B, C combinations
-
+            dataset1: *dict*
+                The dictionary with following attributes
+                size of the grid, lazors, points of intersection,
+                and number of blocks (A, B, C)
+            dataset2: *dict*
+                The dictionary with following attributes
+                size of the grid, individual lists of blocks
+                and no-movement positions
         **Returns**
             None
+        '''
+        self.width, self.height = dataset1['Size']
+        # Number of lattice positions along a row and a column
+        self.span = 2 * self.width + 1
+        self.rows = 2 * self.height + 1
+        # One extra cell that always stays empty, used for the lattice
+        # corners and centers a lazor can only cross straight
+        self.ghost = self.width * self.height
+        self.blocks = bytearray(self.ghost + 1)
+        for name, code in (('x_l', BLOCK_X), ('A_l', BLOCK_A),
+                           ('B_l', BLOCK_B), ('C_l', BLOCK_C)):
+            for i in dataset2[name]:
+                self.blocks[self.cell_id(i)] = code
+        self.open_cells = [self.cell_id(i) for i in dataset1['o_l']]
+        self.counts = {name: dataset1[name] for name in ('A', 'B', 'C')}
+        self.neighbours, self.moves, self.bounces = self.tables()
+        # Lazors outside the lattice never enter the grid
+        self.lazers = [self.state_id(i) for i in dataset1['Lazers']]
+        self.lazers = [i for i in self.lazers if i >= 0]
+        self.points = [self.position_id(i) for i in dataset1['Points']]
+        # Cells one of which a lazor crosses to reach every POI
+        self.walls = [i for i in map(self.point_sides, self.points)
+                      if i is not None]
+        # Bitmasks of the POI positions and of the cells of every wall,
+        # used by class BitSolution
+        # (POIs outside the lattice, id -1, are walled in already)
+        self.point_mask = sum(1 << i for i in set(self.points) if i >= 0)
+        self.wall_masks = [sum(1 << i for i in set(cells))
+                           for cells in self.walls]
 
+    def cell_id(self, key):
         '''
-        self.filename = filename
-        self.info = info
-        self.sel_comb = sel_comb
-        self.lazers = info["Lazers"]
-        self.points = info["Points"]
+        This function converts a block position [x, y] of the datasets
+        (y counted from the bottom) into a cell id
 
+        **Input Parameters**
+            key: *list or tuple, int*
+                The block position
+        **Returns**
+            cell: *int*
+                The cell id
+        '''
+        return (self.height - 1 - int(key[1])) * self.width + int(key[0])
 
-    def __call__(self):
+    def cell_key(self, cell):
         '''
-        The __call__ method will plot the lazor solution in a grid
-        and save it as .png file
+        This function converts a cell id back into the block position
+        used by sel_comb and class Visualisation
 
         **Input Parameters**
-            None
+            cell: *int*
+                The cell id
         **Returns**
-            None
+            key: *tuple, int*
+                The block position (x, y)
         '''
-        # Intializing the grid size
-        if not self.sel_comb:
-            print("No solution is found for the given file")
-        else:
-            size = self.info['Size']
-            x_l = self.info['x_l']
-            blockSize = 100
-            # Grid dimensions
-            nBlocks1 = size[0]
-            nBlocks2 = size[1]
-            # Creating the grid
-            figure = [[0 for i in range(nBlocks1)] for j in range(nBlocks2)]
-            dims1 = nBlocks1 * blockSize
-            dims2 = nBlocks2 * blockSize
-            # Storing the defined colors
-            colors = self.get_colors()
+        row, column = divmod(cell, self.width)
+        return (column, self.height - 1 - row)
 
-            # For a given solution, plotting specific color blocks
-            for i in self.sel_comb:
-                name = self.sel_comb[i]
-                # Transforming the coordinate system
-                x = int(i[0])
-                y = int(size[1] - i[1] - 1)
-                if name == 'A':
-                    figure[y][x] = 1
-                elif name == 'B':
-                    figure[y][x] = 2
-                elif name == 'C':
-                    figure[y][x] = 3
-                else:
-                    figure[y][x] = 0
+    def position_id(self, point):
+        '''
+        This function converts a point [x, y] of the datasets into
+        the lattice position id, -1 if it lies outside the lattice
 
-            # Highlighting 'x' positions
-            for i in x_l:
-                x = int(i[0])
-                y = int(size[1] - i[1] - 1)
-                figure[y][x] = 4
+        **Input Parameters**
+            point: *list, float*
+                The transformed position
+        **Returns**
+            pos: *int*
+                The lattice position id
+        '''
+        X = int(round(2 * point[0]))
+        Y = int(round(2 * (self.height - point[1])))
+        if 0 <= X < self.span and 0 <= Y < self.rows:
+            return Y * self.span + X
+        return -1
 
-            # Error if out of bounds
-            ERR_MSG = "Error, invalid grid value found!"
-            assert all([a in colors.keys()
+    def position(self, pos):
+        '''
+        This function converts a lattice position id back into the
+        coordinates used by class Visualisation
+
+        **Input Parameters**
+            pos: *int*
+                The lattice position id
+        **Returns**
+            point: *list, float*
+                The transformed position [x, y]
+        '''
+        Y, X = divmod(pos, self.span)
+        return [0.5 * X, self.height - 0.5 * Y]
+
+    def state_id(self, lazer):
+        '''
+        This function converts a lazor [x, y, vx, vy] of the datasets
+        into a lattice state, -1 if it lies outside the lattice
+
+        **Input Parameters**
+            lazer: *list, float*
+                The transformed lazor position and direction
+        **Returns**
+            state: *int*
+                The lattice state
+        '''
+        pos = self.position_id(lazer)
+        if pos < 0:
+            return -1
+        return pos * 4 + (lazer[2] > 0) + 2 * (lazer[3] < 0)
+
+    def point_sides(self, pos):
+        '''
+        This function finds the cells on both sides of the edge a POI
+        lies on. Lazors move diagonally through the cells, so a lazor
+        reaching the POI crosses one of them, unless it starts on the
+        POI or the cell behind the lazor is one of them: a lazor
+        reflected at its start runs into that cell without testing it.
+
+        **Input Parameters**
+            pos: *int*
+                The lattice position id of the POI
+        **Returns**
+            cells: *tuple, int*
+                The cell ids in the grid, empty if no lazor can reach the
+                POI, None if it cannot be decided from the cells
+        '''
+        starts = [i >> 2 for i in self.lazers]
+        if pos < 0:
+            return ()
+        if pos in starts:
+            return None
+        Y, X = divmod(pos, self.span)
+        # Moving diagonally keeps the parity of X + Y
+        parities = {sum(divmod(i, self.span)) % 2 for i in starts}
+        if (X + Y) % 2 not in parities:
+            return ()
+        # Corners and centers are only crossed through the ghost cell
+        if (X + Y) % 2 == 0:
+            return None
+        if X % 2 == 0:
+            sides = [(X // 2 - 1, (Y - 1) // 2), (X // 2, (Y - 1) // 2)]
+        else:
+            sides = [((X - 1) // 2, Y // 2 - 1), ((X - 1) // 2, Y // 2)]
+        # Cells behind the lazors, the reflected lazor may bounce on
+        # within them to any of their sides
+        behind = set()
+        for i in self.lazers:
+            if self.bounces[i] < 0:
+                continue
+            Y1, X1 = divmod(i >> 2, self.span)
+            Y2, X2 = divmod(self.bounces[i] >> 2, self.span)
+            # The cell center is the odd coordinate of each axis
+            behind.add(((X1 if X1 % 2 else X2) // 2,
+                        (Y1 if Y1 % 2 else Y2) // 2))
+        if behind.intersection(sides):
+            return None
+        return tuple(row * self.width + column for column, row in sides
+                     if 0 <= column < self.width and 0 <= row < self.height)
+
+    def blocked(self, blocks):
+        '''
+        This function tests if a POI is walled in, with A or B blocks on
+        both sides of its edge, so that no lazor can reach it
+
+        **Input Parameters**
+            blocks: *bytearray*
+                The block codes indexed by cell id
+        **Returns**
+            True/False *bool*
+                True if some POI cannot be intersected
+        '''
+        for cells in self.walls:
+            for i in cells:
+                if blocks[i] != BLOCK_A and blocks[i] != BLOCK_B:
+                    break
+            else:
+                return True
+        return False
+
+    def relevant(self):
+        '''
+        This function finds the 'o' positions a block may matter on.
+        The lazor states are flooded forward taking every move an 'o'
+        position could allow, then backward from the POIs. A cell only
+        matters if a beam may run into it from a state that can still
+        lead to a POI: blocks on the other cells never change the POIs
+        intersected, they are fillers.
+
+        **Input Parameters**
+            None
+        **Returns**
+            relevant: *set, int*
+                The cell ids of the 'o' positions that may matter
+        '''
+        variable = set(self.open_cells)
+        # Successors of every state under any placement
+        visited = bytearray(len(self.moves))
+        previous = {}
+        stack = list(self.lazers)
+        for state in stack:
+            visited[state] = 1
+        while stack:
+            state = stack.pop()
+            cell = self.neighbours[state]
+            if cell < 0:
+                continue
+            code = self.blocks[cell]
+            nexts = []
+            if cell in variable or (code != BLOCK_A and code != BLOCK_B):
+                nexts.append(self.moves[state])
+            if cell in variable or code == BLOCK_A or code == BLOCK_C:
+                nexts.append(self.bounces[state])
+            for i in nexts:
+                if i < 0:
+                    continue
+                previous.setdefault(i, []).append(state)
+                if not visited[i]:
+                    visited[i] = 1
+                    stack.append(i)
+        # States from which a POI may be intersected
+        targets = set(self.points)
+        stack = [i for i in compress(range(len(visited)), visited)
+                 if i >> 2 in targets]
+        useful = bytearray(len(self.moves))
+        for state in stack:
+            useful[state] = 1
+        relevant = set()
+        while stack:
+            for state in previous.get(stack.pop(), ()):
+                # The cell in front of the state leads to a POI
+                relevant.add(self.neighbours[state])
+                if not useful[state]:
+                    useful[state] = 1
+                    stack.append(state)
+        return relevant & variable
+
+    def tables(self):
+        '''
+        This function returns the lookup tables of the grid size,
+        computed once per size and shared by all boards (see LOOKUPS)
+
+        **Input Parameters**
+            None
+        **Returns**
+            neighbours, moves, bounces: *array, int*
+                The lookup tables described in lookup()
+        '''
+        key = (self.width, self.height)
+        if key in LOOKUPS:
+            LOOKUPS.move_to_end(key)
+        else:
+            LOOKUPS[key] = self.lookup()
+            # Keep the most recently used sizes
+            if len(LOOKUPS) > LOOKUP_SIZES:
+                LOOKUPS.popitem(last=False)
+        return LOOKUPS[key]
+
+    def lookup(self):
+        '''
+        This function precomputes the neighbour cell of every lazor state
+        as well as the state after moving on and after a reflection.
+        The cell in front of the lazor follows the half-block rules of
+        the .bff coordinates: on a vertical edge (even X) the lazor meets
+        the cell to its left or right, otherwise the cell above or below.
+
+        **Input Parameters**
+            None
+        **Returns**
+            neighbours: *array, int*
+                The cell in front of every state, -1 outside the grid
+            moves: *array, int*
+                The state after moving on, -1 outside the lattice
+            bounces: *array, int*
+                The state after a reflection, -1 outside the lattice
+        '''
+        n_states = self.span * self.rows * 4
+        neighbours = array('i', [-1]) * n_states
+        moves = array('i', [-1]) * n_states
+        bounces = array('i', [-1]) * n_states
+        for state in range(n_states):
+            Y, X = divmod(state >> 2, self.span)
+            dx = 1 if state & 1 else -1
+            dy = 1 if state & 2 else -1
+            # Cell in front of the lazor, in units of half blocks
+            if X % 2 == 0:
+                cx, cy = X + dx - 1 if dx < 0 else X, Y - 1
+                # Reflection on the side of a block flips dx
+                bounces[state] = self.state(X - dx, Y + dy, state ^ 1)
+            else:
+                cx, cy = X - 1, Y + dy - 1 if dy < 0 else Y
+                # Reflection on the top or bottom of a block flips dy
+                bounces[state] = self.state(X + dx, Y - dy, state ^ 2)
+            moves[state] = self.state(X + dx, Y + dy, state)
+            if 0 <= cx < 2 * self.width and 0 <= cy < 2 * self.height:
+                if cx % 2 == 0 and cy % 2 == 0:
+                    neighbours[state] = cy // 2 * self.width + cx // 2
+                else:
+                    neighbours[state] = self.ghost
+        return neighbours, moves, bounces
+
+    def state(self, X, Y, direction):
+        '''
+        This function builds the state at lattice position (X, Y)
+
+        **Input Parameters**
+            X, Y: *int*
+                The lattice position
+            direction: *int*
+                A state whose direction bits are kept
+        **Returns**
+            state: *int*
+                The lattice state, -1 outside the lattice
+        '''
+        if 0 <= X < self.span and 0 <= Y < self.rows:
+            return (Y * self.span + X) * 4 + (direction & 3)
+        return -1
+
+    def layout(self, sel_comb):
+        '''
+        This function places the blocks of a sel_comb dictionary
+        on a copy of the board
+
+        **Input Parameters**
+            sel_comb: *dict, tuple, str*
+                The block positions and their names (A, B, C)
+        **Returns**
+            blocks: *bytearray*
+                The block codes indexed by cell id
+        '''
+        blocks = bytearray(self.blocks)
+        for key, name in sel_comb.items():
+            blocks[self.cell_id(key)] = CODES[name]
+        return blocks
+
+    def masks(self, blocks):
+        '''
+        This function converts block codes into one bitmask of the cells
+        per block type, as used by class BitSolution
+
+        **Input Parameters**
+            blocks: *bytearray*
+                The block codes indexed by cell id
+        **Returns**
+            masks: *tuple, int*
+                The bitmasks of the A, B and C blocks
+        '''
+        masks = [0, 0, 0]
+        for cell, code in enumerate(blocks):
+            if BLOCK_A <= code <= BLOCK_C:
+                masks[code - BLOCK_A] |= 1 << cell
+        return tuple(masks)
+
+    def sel_comb(self, blocks):
+        '''
+        This function converts block codes back into the sel_comb
+        dictionary used by class Visualisation, fixed blocks included
+
+        **Input Parameters**
+            blocks: *bytearray*
+                The block codes indexed by cell id
+        **Returns**
+            sel_comb: *dict, tuple, str*
+                The block positions and their names (A, B, C)
+        '''
+        return {self.cell_key(cell): NAMES[code]
+                for cell, code in enumerate(blocks[:self.ghost])
+                if code in NAMES}
+
+
+def _combinations_from(pool, k, rank=0):
+    '''
+    This function gives the combinations of itertools.combinations from
+    a rank on, without generating the ones before it: on large boards
+    the ranks of a shard are far too many to skip one at a time
+
+    **Input Parameters**
+        pool: *list or tuple*
+            The items to combine
+        k: *int*
+            The number of items of a combination
+        rank: *int, optional*
+            The rank of the first combination
+    **Returns**
+        combinations: *generator, tuple*
+            The combinations in the order of itertools.combinations
+    '''
+    if not rank:
+        yield from combinations(pool, k)
+        return
+    n = len(pool)
+    for i in range(n - k + 1):
+        # Combinations starting with pool[i]
+        count = comb(n - i - 1, k - 1)
+        if rank < count:
+            head = (pool[i],)
+            for rest in _combinations_from(pool[i + 1:], k - 1, rank):
+                yield head + rest
+            yield from combinations(pool[i + 1:], k)
+            return
+        rank -= count
+
+
+class Placements:
+    '''
+    This class enumerates every distinct assignment of the A, B, C blocks
+    to the 'o' positions exactly once
+    - A blocks take every combination of the 'o' positions, B blocks every
+      combination of the positions left over, then C blocks likewise
+    - With spare positions, where a block never changes the lazors, some
+      blocks may be left out of the 'o' positions: every split of the
+      blocks is enumerated, fewest fillers first, and the fillers go to
+      the spare positions in order
+    - Candidates are generated lazily, one (a_comb, b_comb, c_comb)
+      tuple of cell ids at a time
+    - Every candidate has a flat rank; the enumeration can start at any
+      rank, so a search can be checkpointed and split into ranges
+    '''
+
+    def __init__(self, o_l, A, B, C, start=0, stop=None, spare=()):
+        '''
+        The __init__ method will initialize the 'o' positions, the number
+        of blocks and the range of ranks to enumerate
+
+        **Input Parameters**
+            o_l: *list, int*
+                The cell ids of the 'o' positions
+            A, B, C: *int*
+                The number of blocks of each kind
+            start: *int, optional*
+                The rank of the first candidate
+            stop: *int, optional*
+                The rank after the last candidate, all by default
+            spare: *list, int, optional*
+                The cell ids of the positions for the fillers, A and B
+                fillers take the first ones, C fillers the next ones
+        **Returns**
+            None
+        '''
+        self.o_l = tuple(o_l)
+        self.A, self.B, self.C = A, B, C
+        self.spare = tuple(spare)
+        n = len(self.o_l)
+        # Blocks placed on the 'o' positions, rank of the first candidate
+        # and number of B and C combinations of every split
+        self.splits = []
+        self.total = 0
+        for fillers in range(min(A + B + C, len(self.spare)) + 1):
+            for a in range(A, -1, -1):
+                for b in range(B, -1, -1):
+                    c = A + B + C - fillers - a - b
+                    if not 0 <= c <= C or a + b + c > n:
+                        continue
+                    n_b = comb(n - a, b)
+                    n_c = comb(n - a - b, c)
+                    self.splits.append((a, b, c, self.total, n_b, n_c))
+                    self.total += comb(n, a) * n_b * n_c
+        self.start = start
+        self.stop = self.total if stop is None else min(stop, self.total)
+        # Rank of the next candidate to be generated
+        self.index = start
+
+    def __len__(self):
+        '''
+        The __len__ method gives the number of candidates in the range,
+        the multinomial n! / (A! B! C! (n - A - B - C)!) for a full range
+        without spare positions. len() fails past sys.maxsize, total
+        is the number of candidates of the full range as a plain int.
+
+        **Input Parameters**
+            None
+        **Returns**
+            length: *int*
+                The number of candidates
+        '''
+        return max(self.stop - self.start, 0)
+
+    def ranks(self, index):
+        '''
+        This function splits a flat rank into the split of the blocks
+        and the combination ranks of the A, B and C blocks
+
+        **Input Parameters**
+            index: *int*
+                The flat rank of a candidate
+        **Returns**
+            ranks: *tuple, int*
+                The index of the split and the ranks of the A, B and C
+                combinations
+        '''
+        k = len(self.splits) - 1
+        while k and self.splits[k][3] > index:
+            k -= 1
+        a, b, c, offset, n_b, n_c = self.splits[k]
+        r_a, rest = divmod(index - offset, n_b * n_c)
+        r_b, r_c = divmod(rest, n_c)
+        return k, r_a, r_b, r_c
+
+    def __iter__(self):
+        '''
+        The __iter__ method will generate the candidates of the range
+        in rank order
+
+        **Input Parameters**
+            None
+        **Returns**
+            candidates: *generator, tuple*
+                The (a_comb, b_comb, c_comb) cell ids of every candidate,
+                fillers included
+        '''
+        if self.start >= self.stop:
+            return
+        s_k, s_a, s_b, s_c = self.ranks(self.start)
+        self.index = self.start
+        for a, b, c, _, _, _ in self.splits[s_k:]:
+            # Fillers of the split: A and B first, then C
+            fill_a = self.spare[:self.A - a]
+            fill_b = self.spare[self.A - a:self.A - a + self.B - b]
+            fill_c = self.spare[self.A - a + self.B - b:
+                                self.A + self.B + self.C - a - b - c]
+            for a_comb in _combinations_from(self.o_l, a, s_a):
+                # 'o' positions left over after the A blocks
+                o_lB = [i for i in self.o_l if i not in a_comb]
+                for b_comb in _combinations_from(o_lB, b, s_b):
+                    # 'o' positions left over after the A, B blocks
+                    o_lC = [i for i in o_lB if i not in b_comb]
+                    for c_comb in _combinations_from(o_lC, c, s_c):
+                        if self.index >= self.stop:
+                            return
+                        self.index += 1
+                        if fill_a or fill_b or fill_c:
+                            yield (a_comb + fill_a, b_comb + fill_b,
+                                   c_comb + fill_c)
+                        else:
+                            yield a_comb, b_comb, c_comb
+                    s_c = 0
+                s_b = 0
+            s_a = 0
+
+
+class Budget:
+    '''
+    This class bounds a search by a deadline and a number of candidates
+    - The searches of class Lazor call it once per candidate or node
+    - It raises BudgetExhausted once the time or the candidates are
+      used up, or once it is cancelled
+    '''
+
+    def __init__(self, timeout=None, max_candidates=None):
+        '''
+        The __init__ method will initialize the deadline and the number
+        of candidates
+
+        **Input Parameters**
+            timeout: *float, optional*
+                The time of the search in seconds, None for no limit
+            max_candidates: *int, optional*
+                The number of candidates or nodes, None for no limit
+        **Returns**
+            None
+        '''
+        # Wall-clock deadline, the same in the processes of a search
+        self.deadline = None if timeout is None else time.time() + timeout
+        self.max_candidates = max_candidates
+        self.spent = 0
+        # Set by cancel, from another thread
+        self.cancelled = False
+
+    def __call__(self, candidates=1):
+        '''
+        The __call__ method will count candidates against the budget
+
+        **Input Parameters**
+            candidates: *int, optional*
+                The number of candidates or nodes tested
+        **Returns**
+            None
+        '''
+        self.spent += candidates
+        if self.cancelled:
+            raise BudgetExhausted("Search cancelled")
+        if (self.max_candidates is not None and
+                self.spent > self.max_candidates):
+            raise BudgetExhausted(
+                "Candidate budget of %d used up" % self.max_candidates)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise BudgetExhausted("Time budget used up")
+
+    def cancel(self):
+        '''
+        This function stops the search at its next candidate, for
+        instance from another thread
+
+        **Input Parameters**
+            None
+        **Returns**
+            None
+        '''
+        self.cancelled = True
+
+    def deadline_only(self):
+        '''
+        This function gives a budget with the same deadline and no
+        candidate limit, for the processes of a parallel search
+
+        **Input Parameters**
+            None
+        **Returns**
+            budget: *Budget*
+                The budget of one process
+        '''
+        budget = Budget()
+        budget.deadline = self.deadline
+        return budget
+
+
+class Checkpoint:
+    '''
+    This class saves the progress of a long search to a small JSON file,
+    so that a stopped search resumes where it was
+    - brute: the ranges of ranks (see class Placements) left to test,
+      with the combination ranks of the A, B and C blocks where each
+      range starts
+    - prune: the frontier, placements left to expand, and the
+      placements expanded already
+    - constraint: the values tried down to the current node and the
+      nogoods learnt (see class ConstraintSearch)
+    - One file per search, named by a hash of the board, the mode and
+      the 'o' positions enumerated; the search statistics and best
+      candidate are saved too
+    - The file is written aside and renamed, never read half-written,
+      every interval seconds or less often when writing it takes more
+      than 1% of the search; it is removed once the search ends
+    '''
+    VERSION = 1
+    # Share of the search time the writes may take
+    SHARE = 0.01
+
+    def __init__(self, directory, interval=5.0, resume=True):
+        '''
+        The __init__ method will initialize the checkpoint directory
+
+        **Input Parameters**
+            directory: *str*
+                The directory of the checkpoint files, created if missing
+            interval: *float, optional*
+                The time between two writes in seconds
+            resume: *bool, optional*
+                Resume from the file of a search stopped before, False
+                to start over
+        **Returns**
+            None
+        '''
+        self.directory = directory
+        self.interval = interval
+        self.resume = resume
+        self.path = None
+        self.key = None
+        # Time of the last write and the time it took
+        self.last = time.monotonic()
+        self.cost = 0.0
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def open(self, lazor):
+        '''
+        This function names the file of a search and reads the progress
+        saved in it
+
+        **Input Parameters**
+            lazor: *Lazor*
+                The search
+        **Returns**
+            state: *dict*
+                The progress saved by the same search, None to start
+                from the beginning
+        '''
+        board = lazor.board
+        canonical = repr((board.width, board.height, bytes(board.blocks),
+                          sorted(board.counts.items()),
+                          sorted(set(board.lazers)),
+                          sorted(set(board.points)), lazor.mode,
+                          lazor.o_l, lazor.spare))
+        self.key = hashlib.sha256(canonical.encode()).hexdigest()
+        self.path = os.path.join(self.directory, self.key[:32] + '.json')
+        self.last = time.monotonic()
+        if not self.resume:
+            return None
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(state, dict) or
+                state.get('version') != self.VERSION or
+                state.get('key') != self.key):
+            logger.warning("Ignoring checkpoint %s of another search",
+                           self.path)
+            return None
+        logger.info("Resuming the search from checkpoint %s", self.path)
+        return state
+
+    def due(self):
+        '''
+        This function tells if the progress should be written now
+
+        **Input Parameters**
+            None
+        **Returns**
+            True/False *bool*
+                True once the interval is over
+        '''
+        return (time.monotonic() - self.last >=
+                max(self.interval, self.cost / self.SHARE))
+
+    def save(self, state):
+        '''
+        This function writes the progress of the search atomically
+
+        **Input Parameters**
+            state: *dict*
+                The progress, see Lazor.progress
+        **Returns**
+            None
+        '''
+        t0 = time.monotonic()
+        state = dict(state, version=self.VERSION, key=self.key)
+        temporary = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(temporary, 'w') as file:
+            json.dump(state, file, separators=(',', ':'))
+        os.replace(temporary, self.path)
+        self.last = time.monotonic()
+        self.cost = self.last - t0
+        self.writes += 1
+
+    def clear(self):
+        '''
+        This function removes the file of a finished search
+
+        **Input Parameters**
+            None
+        **Returns**
+            None
+        '''
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class Lazor:
+    '''
+        This class estimates all possible combinations to find the solution
+        Step 1: Sorting A blocks in possible 'o' positions to get all
+                combinations
+        Step 2: With leftover o positions, do similar combination search
+                for B, C
+        Step 3: Create possible combinations of A, B, C with available
+                'o' positions and locked blocks within the grid
+                (generated lazily by class Placements)
+        In the 'prune' mode blocks are placed one at a time, only on
+        cells the current lazors touch (see prune_search)
+        In the 'constraint' mode the cells are decided in the order the
+        lazors run into them, with propagation and conflict learning
+        (see class ConstraintSearch)
+    '''
+
+    def __init__(self, dataset1, dataset2, mode='brute', workers=1,
+                 incremental=False, cache=None, memo=0, bits=False,
+                 reachability=True, budget=None, checkpoint=None):
+        '''
+        The __init__ method will utilize the dictionaries created from
+        class Input and initialize all the extracted information as variables
+
+        **Input Parameters**
+            dataset1: *dict*
+                The dictionary with following attributes
+                size of the grid, lazors, points of intersection,
+                and number of blocks (A, B, C)
+            dataset2: *dict*
+                The dictionary with following attributes
+                size of the grid, individual lists of blocks
+                and no-movement positions
+            mode: *str, optional*
+                The search mode, 'brute' for every combination
+                'prune' for the beam-path relevance search
+                or 'constraint' for class ConstraintSearch
+            workers: *int, optional*
+                The number of processes sharing the brute-force search,
+                None for one per CPU core
+            incremental: *bool, optional*
+                Test the brute-force combinations with class
+                IncrementalSolution, about twice as fast per candidate
+                from 11x11 grids up, no faster on small ones
+            cache: *SolutionCache, optional*
+                The solutions of puzzles seen before
+            memo: *int, optional*
+                The number of lazor paths remembered by a TraceMemo for
+                the brute-force combinations, 0 for none
+            bits: *bool, optional*
+                Test the brute-force combinations with class BitSolution,
+                unless incremental is set
+            reachability: *bool, optional*
+                Only enumerate the 'o' positions where a block may change
+                the POIs intersected (see Board.relevant), the other ones
+                only hold fillers
+            budget: *Budget, optional*
+                The time and candidate limits of the search, which
+                raises BudgetExhausted past them
+            checkpoint: *Checkpoint, optional*
+                Save the progress of the search now and then, and
+                resume the search saved there
+        **Returns**
+            None
+
+        '''
+        if mode not in ('brute', 'prune', 'constraint'):
+            raise ValueError("Unknown search mode %r" % mode)
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.budget = budget
+        self.checkpoint = checkpoint
+        # Ranges of ranks left to the brute force, the frontier of the
+        # 'prune' mode and the expanded placements (see progress)
+        self.ranges = None
+        self.shard_state = None
+        self.frontier = None
+        self.expanded = set()
+        # Rank of the combination tested by iter_solutions
+        self.position = 0
+        # Search statistics, candidates traced or search nodes expanded
+        self.stats = {'candidates': 0, 'nodes': 0}
+        # Lattice model of the grid used for every candidate
+        self.board = Board(dataset1, dataset2)
+        # Cell ids of the 'o' positions, and of the spare ones where a
+        # block never changes the POIs intersected
+        self.o_l = list(self.board.open_cells)
+        self.spare = []
+        # Cells of the walls of the POIs (see Board.blocked)
+        self.walls = {i for cells in self.board.walls for i in cells}
+        if reachability:
+            relevant = self.board.relevant()
+            self.spare = [i for i in self.o_l if i not in relevant]
+            self.o_l = [i for i in self.o_l if i in relevant]
+            # Wall cells last, A and B fillers could wall a POI in there
+            self.spare.sort(key=lambda i: i in self.walls)
+            logger.info("%d of %d 'o' positions can never change the POIs "
+                        "intersected", len(self.spare),
+                        len(self.board.open_cells))
+        self.stats['spare'] = len(self.spare)
+        # Best candidate so far, by the number of POIs it intersects:
+        # the cell ids of its A, B, C blocks or its layout
+        self.targets = len(set(self.board.points))
+        self.best = None
+        self.best_hits = -1
+        self.constraint = None
+        # Lazor paths kept between combinations and the last placement
+        self.tracer = IncrementalSolution(self.board) if incremental else None
+        self.placed = []
+        # POIs intersected by the lazors of the previous combinations
+        self.memo = TraceMemo(self.board, memo) if memo else None
+        # Bitmasks of the fixed blocks and of every cell for BitSolution
+        self.bits = bits
+        self.fixed = self.board.masks(self.board.blocks)
+        self.cell_bits = [1 << i for i in range(len(self.board.blocks))]
+        self.A = dataset1['A']
+        self.B = dataset1['B']
+        self.C = dataset1['C']
+        # Size of the brute-force space, to compare with the search nodes
+        # (len() of Placements fails on large boards, past sys.maxsize)
+        self.stats['brute_force'] = Placements(
+            self.o_l, self.A, self.B, self.C, spare=self.spare).total
+
+    def __call__(self):
+        '''
+        The __call__ method will return the right combination
+        of coordinates of different blocks
+
+        **Input Parameters**
+            None
+        **Returns**
+            sel_comb: *dict, tuple, str*
+                The right combination of coordinates of different blocks
+                (see Board.sel_comb)
+        '''
+        if self.cache is not None:
+            key = self.cache.key(self.board)
+            found, sel_comb = self.cache.get(key, self.board)
+            if found:
+                return sel_comb
+        state = None
+        if self.checkpoint is not None:
+            state = self.checkpoint.open(self)
+            if state is not None:
+                self.restore(state)
+        try:
+            if self.mode == 'prune':
+                sel_comb = self.prune_search(state)
+            elif self.mode == 'constraint':
+                self.constraint = ConstraintSearch(self.board, self.stats,
+                                                   self.budget, self.tick)
+                if state is not None:
+                    self.constraint.restore(state['constraint'])
+                sel_comb = self.constraint()
+                if sel_comb is not None:
+                    sel_comb = self.board.sel_comb(sel_comb)
+            else:
+                sel_comb = self.brute_force(state)
+        except (BudgetExhausted, KeyboardInterrupt):
+            # Resumed later from here
+            if self.checkpoint is not None:
+                self.checkpoint.save(self.progress())
+            raise
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+        if self.cache is not None:
+            self.cache.put(key, sel_comb)
+        return sel_comb
+
+    def progress(self):
+        '''
+        This function gives the progress of the search for a checkpoint:
+        the search statistics, the best candidate and the work left in
+        the search mode (see class Checkpoint)
+
+        **Input Parameters**
+            None
+        **Returns**
+            state: *dict*
+                The progress, in JSON types
+        '''
+        best = self.best
+        if best is not None:
+            best = (list(best) if isinstance(best, bytearray)
+                    else [list(cells) for cells in best])
+        state = {'mode': self.mode, 'stats': self.stats,
+                 'best': best, 'best_hits': self.best_hits}
+        if self.mode == 'prune':
+            state['frontier'] = [[i for pair in placed for i in pair]
+                                 for placed in self.frontier]
+            state['expanded'] = [sorted(cell * 4 + code
+                                        for cell, code in key)
+                                 for key in self.expanded]
+        elif self.mode == 'constraint':
+            state['constraint'] = self.constraint.progress()
+        else:
+            ranges = self.ranges
+            if self.shard_state is not None:
+                # Shards not finished, from the rank reached in each
+                shards, progress, done = self.shard_state
+                ranges = [[start + progress[k], stop]
+                          for k, start, stop in shards
+                          if k not in done and start + progress[k] < stop]
+            placements = Placements(self.o_l, self.A, self.B, self.C,
+                                    spare=self.spare)
+            state['ranges'] = ranges
+            # Combination ranks of the blocks where every range starts
+            state['ranks'] = [dict(zip(('split', 'A', 'B', 'C'),
+                                       placements.ranks(start)))
+                              for start, stop in ranges]
+        return state
+
+    def restore(self, state):
+        '''
+        This function takes back the search statistics and the best
+        candidate of a checkpoint
+
+        **Input Parameters**
+            state: *dict*
+                The progress, see progress
+        **Returns**
+            None
+        '''
+        self.stats.update(state['stats'])
+        best = state['best']
+        if best is not None:
+            best = (bytearray(best) if self.mode == 'prune'
+                    else tuple(tuple(cells) for cells in best))
+        self.best, self.best_hits = best, state['best_hits']
+
+    def tick(self):
+        '''
+        This function writes a checkpoint when one is due, it is called
+        now and then by every search mode
+
+        **Input Parameters**
+            None
+        **Returns**
+            None
+        '''
+        if self.checkpoint is not None and self.checkpoint.due():
+            self.checkpoint.save(self.progress())
+
+    def brute_force(self, state=None):
+        '''
+        This function tests every combination of A, B, C blocks
+        in the 'o' positions until one solves the puzzle
+
+        **Input Parameters**
+            state: *dict, optional*
+                The progress of a checkpoint, see progress
+        **Returns**
+            sel_comb: *dict, tuple, str*
+                The right combination of coordinates of different blocks
+        '''
+        # Ranges of ranks left to test, all of them at first
+        if state is not None:
+            ranges = state['ranges']
+        else:
+            ranges = [[0, self.stats['brute_force']]]
+        if self.workers > 1:
+            sel_comb = self.parallel_search(ranges)
+        else:
+            sel_comb = self.serial_search(ranges)
+        if sel_comb is not None:
+            return self.board.sel_comb(sel_comb)
+
+    def serial_search(self, ranges):
+        '''
+        This function tests the ranges of ranks one after the other,
+        keeping the first one up to date for a checkpoint
+
+        **Input Parameters**
+            ranges: *list, list, int*
+                The [start, stop] ranks left to test, emptied as they
+                are tested
+        **Returns**
+            sel_comb: *bytearray*
+                The first layout solving the puzzle, None otherwise
+        '''
+        self.ranges = ranges
+        while ranges:
+            start, stop = ranges[0]
+            try:
+                sel_comb = self.search_range(start, stop, self.reached)
+            except (BudgetExhausted, KeyboardInterrupt):
+                # The combination being tested is left to the next run
+                ranges[0][0] = self.position
+                raise
+            if sel_comb is not None:
+                return sel_comb
+            ranges.pop(0)
+        return None
+
+    def reached(self, rank):
+        '''
+        This function follows the serial search for a checkpoint, every
+        1024 combinations (see search_range)
+
+        **Input Parameters**
+            rank: *int*
+                The rank of the next combination
+        **Returns**
+            False *bool*
+                The search goes on
+        '''
+        self.ranges[0][0] = rank
+        self.tick()
+        return False
+
+    def search_range(self, start, stop, cancel=None):
+        '''
+        This function tests the combinations of a range of ranks
+        (see class Placements) in order
+
+        **Input Parameters**
+            start: *int*
+                The rank of the first combination
+            stop: *int*
+                The rank after the last combination, None for all
+            cancel: *function, optional*
+                Called every 1024 combinations with the rank of the
+                next one, the search stops when it returns True
+        **Returns**
+            sel_comb: *bytearray*
+                The first layout solving the puzzle, None otherwise
+        '''
+        return next(self.iter_solutions(start, stop, cancel), None)
+
+    def iter_solutions(self, start, stop, cancel=None):
+        '''
+        This function tests the combinations of a range of ranks in
+        order and yields every one solving the puzzle
+
+        **Input Parameters**
+            start, stop, cancel:
+                See search_range
+        **Returns**
+            sel_comb: *generator, bytearray*
+                The layouts solving the puzzle
+        '''
+        budget = self.budget
+        index = 0
+        try:
+            # Every distinct combination of A, B, C in 'o' positions
+            for index, (a_comb, b_comb, c_comb) in enumerate(Placements(
+                    self.o_l, self.A, self.B, self.C, start, stop,
+                    self.spare)):
+                if (cancel is not None and not index % 1024 and
+                        cancel(start + index)):
+                    return
+                if budget is not None:
+                    budget()
+                # Selecting a set of different coordinates amongst
+                # all possible combinations, bitmasks need no layout
+                sel_comb = None
+                if not self.bits or self.tracer is not None:
+                    sel_comb = self.set_abc(
+                        [a_comb, b_comb, c_comb], ['A', 'B', 'C'])
+
+                self.stats['candidates'] += 1
+
+                # If true, yield the right combination
+                # of coordinates of different blocks
+                if self.evaluate(sel_comb, (a_comb, b_comb, c_comb)):
+                    if sel_comb is None:
+                        sel_comb = self.set_abc(
+                            [a_comb, b_comb, c_comb], ['A', 'B', 'C'])
+                    yield sel_comb
+        finally:
+            # Rank of the combination being tested when the search
+            # stopped, for a checkpoint
+            self.position = start + index
+
+    def all_solutions(self, limit=None):
+        '''
+        This function enumerates the placements solving the puzzle, in
+        the order of class Placements, whatever the search mode.
+        With reachability, placements differing only in 'o' positions
+        no lazor can reach are enumerated once.
+
+        **Input Parameters**
+            limit: *int, optional*
+                Stop after this number of solutions, None for all
+        **Returns**
+            sel_comb: *generator, dict, tuple, str*
+                The blocks of every solution (see Board.sel_comb)
+        '''
+        if self.workers > 1:
+            layouts = self.parallel_solutions(limit)
+        else:
+            layouts = self.iter_solutions(0, None)
+        try:
+            for count, sel_comb in enumerate(layouts, 1):
+                yield self.board.sel_comb(sel_comb)
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            # Stop the processes of a parallel enumeration at once
+            layouts.close()
+
+    def count_solutions(self, limit=None):
+        '''
+        This function counts the placements solving the puzzle
+
+        **Input Parameters**
+            limit: *int, optional*
+                Stop counting at this number, 2 tells if the solution
+                is unique, None for all
+        **Returns**
+            count: *int*
+                The number of solutions (see all_solutions)
+        '''
+        return sum(1 for _ in self.all_solutions(limit))
+
+    def evaluate(self, sel_comb, block_positions):
+        '''
+        This function tests one combination under class Solution,
+        under class BitSolution, or under class IncrementalSolution
+        with the cells changed since the previous combination
+
+        **Input Parameters**
+            sel_comb: *bytearray*
+                The block codes indexed by cell id, None for BitSolution
+            block_positions: *list, int*
+                The cell ids of the A, B and C blocks
+        **Returns**
+            True/False *bool*
+                True if the combination solves the puzzle
+        '''
+        if self.tracer is None and self.bits:
+            cell_bits = self.cell_bits
+            masks = list(self.fixed)
+            for k, cells in enumerate(block_positions):
+                for i in cells:
+                    masks[k] |= cell_bits[i]
+            test_comb = BitSolution(masks, self.board)
+            solved = test_comb()
+            hits = bin(test_comb.hits).count('1')
+        elif self.tracer is None:
+            test_comb = Solution(sel_comb, self.board, memo=self.memo)
+            solved = test_comb()
+            hits = self.targets - len(test_comb.points)
+        else:
+            # Only the cells of the blocks, now and before, may change
+            blocks = self.tracer.blocks
+            placed = [i for cells in block_positions for i in cells]
+            changed = [i for i in self.placed if sel_comb[i] != blocks[i]]
+            changed += [i for i in placed if sel_comb[i] != blocks[i]]
+            self.placed = placed
+            solved = self.tracer(sel_comb, changed)
+            hits = self.targets - len(set(self.tracer.points))
+        # Anytime answer of a search running out of budget
+        if hits > self.best_hits:
+            self.best_hits = hits
+            self.best = block_positions
+        return solved
+
+    def shards(self, ranges=None):
+        '''
+        This function splits the ranks of the combinations into
+        consecutive shards, a few per process to balance the load
+
+        **Input Parameters**
+            ranges: *list, list, int, optional*
+                The [start, stop] ranks to split, all by default
+        **Returns**
+            shards: *list, tuple*
+                The index, first rank and rank after the last one
+                of every shard
+        '''
+        if ranges is None:
+            ranges = [[0, self.stats['brute_force']]]
+        total = sum(stop - start for start, stop in ranges)
+        size = max(1, -(-total // (self.workers * 8)))
+        bounds = [(i, min(i + size, stop)) for start, stop in ranges
+                  for i in range(start, stop, size)]
+        return [(k, start, stop) for k, (start, stop) in enumerate(bounds)]
+
+    @contextmanager
+    def shard_pool(self, shards):
+        '''
+        This function opens the pool of processes of a parallel search.
+        The Lazor object (with the board) is sent once to every process.
+        The processes keep the deadline of the budget and share its
+        candidate count.
+
+        **Input Parameters**
+            shards: *list, tuple*
+                The shards of the search
+        **Returns**
+            pool: *ProcessPoolExecutor*
+                The pool running the shards
+            best: *multiprocessing.Value, int*
+                The lowest shard solved, shared by all the processes;
+                the shards above it stop
+        '''
+        context = multiprocessing.get_context()
+        best = context.Value('i', len(shards))
+        budget = self.budget
+        spent, limit = None, None
+        if budget is not None and budget.max_candidates is not None:
+            spent = context.Value('q', budget.spent)
+            limit = budget.max_candidates
+        # Rank reached in every shard, for a checkpoint, as the offset
+        # from the start of the shard (ranks may not fit in 64 bits)
+        progress = None
+        if self.checkpoint is not None:
+            progress = context.Array('q', len(shards), lock=False)
+            self.shard_state = (shards, progress, set())
+        try:
+            with ProcessPoolExecutor(self.workers, mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(self, best, spent, limit,
+                                               progress)) as pool:
+                yield pool, best
+        finally:
+            if self.shard_state is not None:
+                # Left for the progress of an interrupted search
+                self.ranges = self.progress()['ranges']
+            self.shard_state = None
+
+    def shard_results(self, futures, best):
+        '''
+        This function collects the results of the shards as they finish,
+        charging their candidates, and stops every shard once the budget
+        is cancelled
+
+        **Input Parameters**
+            futures: *list, Future*
+                The shards submitted to the pool
+            best: *multiprocessing.Value, int*
+                See shard_pool
+        **Returns**
+            results: *generator, tuple*
+                The results of _search_shard or _solutions_shard
+        '''
+        budget = self.budget
+        pending = set(futures)
+        while pending:
+            # Wake up now and then to see a cancelled budget
+            done, pending = wait(pending, timeout=0.1,
+                                 return_when=FIRST_COMPLETED)
+            if budget is not None and budget.cancelled:
+                for i in futures:
+                    i.cancel()
+                best.value = -1
+                raise BudgetExhausted("Search cancelled")
+            for future in done:
+                if future.cancelled():
+                    continue
+                result = future.result()
+                self.stats['candidates'] += result[2]
+                if budget is not None:
+                    budget.spent += result[2]
+                if self.shard_state is not None and result[3] is None:
+                    # Tested to the end, or solved
+                    self.shard_state[2].add(result[0])
+                yield result
+            self.tick()
+
+    def parallel_search(self, ranges=None):
+        '''
+        This function searches the shards of ranks with a pool of
+        processes. Once a shard is solved, the shards after it are
+        cancelled, and the first solved shard gives the same layout as
+        the serial search.
+
+        **Input Parameters**
+            ranges: *list, list, int, optional*
+                The [start, stop] ranks left to test, all by default
+        **Returns**
+            sel_comb: *bytearray*
+                The first layout solving the puzzle, None otherwise
+        '''
+        shards = self.shards(ranges)
+        solved = {}
+        exhausted = None
+        with self.shard_pool(shards) as (pool, best):
+            futures = [pool.submit(_search_shard, *i) for i in shards]
+            try:
+                for (shard, sel_comb, candidates, error,
+                     (hits, positions)) in self.shard_results(futures, best):
+                    if hits > self.best_hits:
+                        self.best_hits, self.best = hits, positions
+                    if sel_comb is not None:
+                        solved[shard] = sel_comb
+                        # Shards after a solved one are not needed
+                        for i in futures[shard + 1:]:
+                            i.cancel()
+                    elif error is not None and exhausted is None:
+                        # Stop every shard before leaving the pool
+                        exhausted = error
+                        for i in futures:
+                            i.cancel()
+                        best.value = -1
+            except BudgetExhausted as cancelled:
+                exhausted = str(cancelled)
+        # A layout solved in time is still an answer
+        if exhausted is not None and not solved:
+            raise BudgetExhausted(exhausted)
+        if solved:
+            return solved[min(solved)]
+        return None
+
+    def parallel_solutions(self, limit=None):
+        '''
+        This function enumerates the solutions of the shards of ranks
+        with a pool of processes, in the order of the serial search
+
+        **Input Parameters**
+            limit: *int, optional*
+                The number of solutions needed, every shard stops
+                after finding as many
+        **Returns**
+            sel_comb: *generator, bytearray*
+                The layouts solving the puzzle
+        '''
+        shards = self.shards()
+        with self.shard_pool(shards) as (pool, best):
+            futures = [pool.submit(_solutions_shard, *i, limit)
+                       for i in shards]
+            # Solutions of the finished shards, yielded in shard order
+            finished = {}
+            following = 0
+            exhausted = None
+            try:
+                for shard, layouts, candidates, error in self.shard_results(
+                        futures, best):
+                    finished[shard] = layouts
+                    while following in finished:
+                        yield from finished.pop(following)
+                        following += 1
+                    if error is not None:
+                        exhausted = error
+                        break
+            finally:
+                # Stop the other shards when leaving early
+                for i in futures:
+                    i.cancel()
+                best.value = -1
+        if exhausted is not None:
+            raise BudgetExhausted(exhausted)
+
+    def prune_search(self, state=None):
+        '''
+        This function searches the placements by adding one block at a
+        time, only on cells the current lazors touch.
+        A block on a cell no lazor reaches cannot change the lazor paths,
+        so every solution can be built this way: its blocks touched by the
+        lazors can be added in the order the lazors meet them, and the
+        remaining blocks are fillers on untouched 'o' positions.
+        The search is depth first, with an explicit frontier of the
+        placements left to expand, so that it can be checkpointed.
+
+        **Input Parameters**
+            state: *dict, optional*
+                The progress of a checkpoint, see progress
+        **Returns**
+            sel_comb: *dict, tuple, str*
+                The right combination of coordinates of different blocks
+        '''
+        # Placements left to expand, the next one last, and placements
+        # already expanded, as frozensets of (cell, code)
+        if state is not None:
+            self.frontier = [tuple(zip(flat[::2], flat[1::2]))
+                             for flat in state['frontier']]
+            self.expanded = {frozenset(divmod(i, 4) for i in key)
+                             for key in state['expanded']}
+        else:
+            self.frontier = [()]
+            self.expanded = set()
+        frontier = self.frontier
+        while frontier:
+            placed = frontier[-1]
+            key = frozenset(placed)
+            # The same placement reached in another order
+            if placed and key in self.expanded:
+                frontier.pop()
+                continue
+            self.tick()
+            if self.budget is not None:
+                self.budget()
+            sel_comb, children = self.expand(placed)
+            # Expanded only once traced, for a checkpoint
+            frontier.pop()
+            self.expanded.add(key)
+            if sel_comb is not None:
+                return self.board.sel_comb(sel_comb)
+            frontier.extend(reversed(children))
+        return None
+
+    def expand(self, placed):
+        '''
+        This function traces one node of the pruning search and finds
+        every block that fits on a touched 'o' position
+
+        **Input Parameters**
+            placed: *tuple, tuple*
+                The (cell, code) pairs placed so far
+        **Returns**
+            sel_comb: *bytearray*
+                The solved layout, None if the node is not solved
+            children: *list, tuple*
+                The placements with one more block, in the order to
+                expand them
+        '''
+        self.stats['nodes'] += 1
+        sel_comb = bytearray(self.board.blocks)
+        remaining = [self.A, self.B, self.C]
+        for cell, code in placed:
+            sel_comb[cell] = code
+            remaining[code - BLOCK_A] -= 1
+        test_comb = Solution(sel_comb, self.board, early_stop=False)
+        solved = test_comb()
+        touched = test_comb.touched()
+        hits = self.targets - len(test_comb.points)
+        if hits > self.best_hits:
+            self.best_hits = hits
+            self.best = bytearray(sel_comb)
+        if solved:
+            # The leftover blocks go to 'o' positions no lazor reaches
+            free = [i for i in self.o_l
+                    if i not in touched and sel_comb[i] == BLOCK_O]
+            # Spare positions even if touched; wall cells are popped last
+            free += self.spare[::-1]
+            free.sort(key=lambda i: i not in self.walls)
+            if len(free) >= sum(remaining):
+                layout = bytearray(sel_comb)
+                for code, number in zip((BLOCK_A, BLOCK_B, BLOCK_C),
+                                        remaining):
+                    for _ in range(number):
+                        layout[free.pop()] = code
+                # The fillers must not wall a POI in
+                if not self.board.blocked(layout):
+                    return layout, []
+        children = []
+        for cell in self.o_l:
+            if cell not in touched or sel_comb[cell] != BLOCK_O:
+                continue
+            for j, code in enumerate((BLOCK_A, BLOCK_B, BLOCK_C)):
+                if remaining[j]:
+                    children.append(placed + ((cell, code),))
+        return None, children
+
+    def partial(self):
+        '''
+        This function gives the best candidate tested so far, the one
+        intersecting the most POIs: a complete placement in the 'brute'
+        mode, the blocks placed so far in the other modes
+
+        **Input Parameters**
+            None
+        **Returns**
+            sel_comb: *dict, tuple, str*
+                The blocks of the candidate (see Board.sel_comb), None
+                before the first candidate
+            hits: *int*
+                The number of POIs it intersects
+        '''
+        best, hits = self.best, self.best_hits
+        search = self.constraint
+        if search is not None and search.best_hits > hits:
+            best, hits = search.best, search.best_hits
+        if best is None:
+            return None, 0
+        if not isinstance(best, bytearray):
+            best = self.set_abc(list(best), ['A', 'B', 'C'])
+        return self.board.sel_comb(best), hits
+
+    def set_abc(self, block_positions, name):
+        '''
+        This function will place the A, B, C combinations
+        on a copy of the board
+
+        **Input Parameters**
+            block_positions: *list, int*
+                The list with cell ids of a specific block
+            name: *list, int*
+                The name of the specific block
+        **Returns**
+            sel_comb: *bytearray*
+                The block codes indexed by cell id
+        '''
+        sel_comb = bytearray(self.board.blocks)
+        for j in range(len(block_positions)):
+            # Accessing each position
+            block_position = block_positions[j]
+            code = CODES[name[j]]
+            for i in block_position:
+                sel_comb[i] = code
+        return sel_comb
+
+
+# State of a solver process of Lazor.parallel_search
+_worker = {}
+
+
+def _init_worker(lazor, best, spent=None, limit=None, progress=None):
+    '''
+    This function initializes a solver process with the Lazor object
+    and the lowest solved shard shared by all processes
+
+    **Input Parameters**
+        lazor: *Lazor*
+            The brute-force search with its board
+        best: *multiprocessing.Value, int*
+            The lowest shard solved so far
+        spent: *multiprocessing.Value, int, optional*
+            The candidates tested by all processes
+        limit: *int, optional*
+            The candidate budget of the search, None for no limit
+        progress: *multiprocessing.Array, int, optional*
+            The rank reached in every shard, from its start, for the
+            checkpoint written by the main process
+    **Returns**
+        None
+    '''
+    # The candidates are charged to the shared count (_cancel_shard)
+    if lazor.budget is not None:
+        lazor.budget = lazor.budget.deadline_only()
+    lazor.checkpoint = None
+    _worker['lazor'] = lazor
+    _worker['best'] = best
+    _worker['spent'] = spent
+    _worker['limit'] = limit
+    _worker['progress'] = progress
+
+
+def _cancel_shard(shard, rank):
+    '''
+    This function is called by Lazor.search_range every 1024
+    combinations of a shard: it charges the ones tested since its last
+    call to the candidate budget shared by the processes, follows the
+    rank reached and tells if a lower shard is solved
+
+    **Input Parameters**
+        shard: *int*
+            The index of the shard
+        rank: *int*
+            The rank of the next combination of the shard
+    **Returns**
+        True/False *bool*
+            True if the shard is not needed any more
+    '''
+    if _worker['progress'] is not None:
+        _worker['progress'][shard] = rank - _worker['start']
+    used = _charge(rank - _worker['rank'])
+    _worker['rank'] = rank
+    limit = _worker['limit']
+    if used is not None and used > limit:
+        raise BudgetExhausted("Candidate budget of %d used up" % limit)
+    return _worker['best'].value < shard
+
+
+def _charge(candidates):
+    '''
+    This function adds the candidates tested by a solver process to the
+    candidate count shared by the processes
+
+    **Input Parameters**
+        candidates: *int*
+            The number of candidates tested
+    **Returns**
+        used: *int*
+            The candidates tested by all processes, None without a
+            candidate budget
+    '''
+    spent = _worker['spent']
+    if spent is None:
+        return None
+    with spent.get_lock():
+        spent.value += candidates
+        return spent.value
+
+
+def _shard_done(start, candidates):
+    '''
+    This function charges the candidates of a shard tested after the
+    last call of _cancel_shard, once the shard stops
+
+    **Input Parameters**
+        start: *int*
+            The first rank of the shard
+        candidates: *int*
+            The number of candidates tested in the shard
+    **Returns**
+        None
+    '''
+    _charge(max(start + candidates - _worker['rank'], 0))
+
+
+def _solutions_shard(shard, start, stop, limit=None):
+    '''
+    This function enumerates the solutions of one shard of ranks in a
+    solver process
+
+    **Input Parameters**
+        shard: *int*
+            The index of the shard
+        start, stop: *int*
+            The range of ranks of the shard
+        limit: *int, optional*
+            Stop after this number of solutions
+    **Returns**
+        shard: *int*
+            The index of the shard
+        layouts: *list, bytearray*
+            The layouts solving the puzzle, in order
+        candidates: *int*
+            The number of combinations tested
+        error: *str*
+            The message of an exhausted budget, None otherwise
+    '''
+    lazor = _worker['lazor']
+    lazor.stats['candidates'] = 0
+    _worker['start'] = _worker['rank'] = start
+    layouts, error = [], None
+    try:
+        for sel_comb in lazor.iter_solutions(start, stop,
+                                             partial(_cancel_shard, shard)):
+            layouts.append(sel_comb)
+            if limit is not None and len(layouts) >= limit:
+                break
+    except BudgetExhausted as exhausted:
+        error = str(exhausted)
+    _shard_done(start, lazor.stats['candidates'])
+    return shard, layouts, lazor.stats['candidates'], error
+
+
+def _search_shard(shard, start, stop):
+    '''
+    This function searches one shard of ranks in a solver process,
+    giving up when a lower shard is solved
+
+    **Input Parameters**
+        shard: *int*
+            The index of the shard
+        start, stop: *int*
+            The range of ranks of the shard
+    **Returns**
+        shard: *int*
+            The index of the shard
+        sel_comb: *bytearray*
+            The first layout solving the puzzle, None otherwise
+        candidates: *int*
+            The number of combinations tested
+        error: *str*
+            The message of an exhausted budget, None otherwise
+        partial: *tuple*
+            The number of POIs intersected by the best combination of
+            the shard and its block positions (see Lazor.partial)
+    '''
+    lazor = _worker['lazor']
+    best = _worker['best']
+    lazor.stats['candidates'] = 0
+    _worker['start'] = _worker['rank'] = start
+    lazor.best, lazor.best_hits = None, -1
+    error = None
+    try:
+        sel_comb = lazor.search_range(start, stop,
+                                      partial(_cancel_shard, shard))
+    except BudgetExhausted as exhausted:
+        sel_comb, error = None, str(exhausted)
+        if _worker['progress'] is not None:
+            # The combination being tested is left to the next run
+            _worker['progress'][shard] = lazor.position - start
+    _shard_done(start, lazor.stats['candidates'])
+    if sel_comb is not None:
+        with best.get_lock():
+            best.value = min(best.value, shard)
+    return (shard, sel_comb, lazor.stats['candidates'], error,
+            (lazor.best_hits, lazor.best))
+
+
+class Solution:
+    '''
+        This class has functions to solve the lazor puzzle
+        - Criteria: Lazer intersection with given points
+        - Input: Possble combinations of blocks on the lattice board
+        - Handles the functions for refract, reflect, hitting the block,
+          moving lazor, position and lazor encounters
+        - Set of points of intersection is empty
+        - Tracing stops at the last POI, and a combination is rejected
+          without tracing when a POI is walled in (see Board.blocked)
+        - With a TraceMemo, lazors are only traced when they run into
+          blocks not met before
+        - Optionally the beam paths are recorded for class
+          Visualisation (see record_lazor)
+
+    '''
+
+    def __init__(self, sel_comb, board, early_stop=True, memo=None,
+                 record=False):
+        '''
+
+        The __init__ method will initialize the selected combination of
+        blocks and the lattice board with lazors and points of intersection
+
+        **Input Parameters**
+            sel_comb: *bytearray*
+                The block codes indexed by cell id, fixed blocks included
+                (see Board.layout)
+            board: *Board*
+                The lattice model of the grid
+            early_stop: *bool, optional*
+                Stop as soon as every POI is intersected, False to trace
+                the lazors completely (see touched)
+            memo: *TraceMemo, optional*
+                The POIs intersected by the lazors of the previous
+                combinations, touched() is empty with a memo
+            record: *bool, optional*
+                Record the path of every lazor in beams, without memo;
+                with early_stop=False for the complete paths
+        **Returns**
+            None
+
+        '''
+        self.board = board
+        self.sel_comb = sel_comb
+        self.early_stop = early_stop
+        self.memo = memo
+        # Path of every lazor traced, None unless recording
+        self.beams = [] if record else None
+        # Positions of the POIs not intersected yet
+        self.points = set(board.points)
+        # Lazor states traced so far
+        self.visited = bytearray(len(board.moves))
+        if PROFILER is not None:
+            PROFILER.counters['solutions'] += 1
+
+    def __call__(self):
+        '''
+        The __call__ method will test if all POIs are intersected
+        by the lazors
+
+        **Input Parameters**
+            None
+        **Returns**
+            True/False *bool*
+                True if set of points of intersection (POI) is empty
+        '''
+        # No lazor can reach a POI walled in by blocks
+        if self.board.blocked(self.sel_comb):
+            return False
+        # Iterating over every lazer
+        for li in self.board.lazers:
+            # Every POI is already intersected
+            if self.early_stop and not self.points:
+                break
+            if self.beams is not None:
+                self.beams.append(self.record_lazor(li))
+                continue
+            if self.memo is None:
+                # Run the function
+                self.move_lazor(li)
+                continue
+            # Trace the lazor only when its path is not known
+            hits = self.memo.lookup(li, self.sel_comb)
+            if hits is None:
+                hits, reads = self.trace(li)
+                self.memo.store(li, reads, hits)
+            self.points -= hits
+
+        if PROFILER is not None:
+            PROFILER.trace(self.board, self.visited, self.sel_comb)
+        # if set of POI is empty
+        return not self.points
+
+    def move_lazor(self, lazer):
+        '''
+        This function represents the movement of lazor along its direction
+        The beam is followed with an explicit stack of states instead of
+        recursion, and every state is traced only once.
+        A lazor looping between blocks therefore stops, and the memory
+        is bounded by the number of states on the grid.
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state with lazor position and direction
+        **Returns**
+            None
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        blocks = self.sel_comb
+        visited = self.visited
+        points = self.points
+        # Worklist of beam states that still have to be traced
+        stack = [lazer]
+        while stack:
+            state = stack.pop()
+            # Skip states already traced (loops, merging beams)
+            if visited[state]:
+                continue
+            visited[state] = 1
+            # If lazer position interesects one of POIs, remove the POI
+            pos = state >> 2
+            if pos in points:
+                points.discard(pos)
+                # Stop at the last POI
+                if not points and self.early_stop:
+                    return
+            cell = neighbours[state]
+            # If lazor position is outside the grid
+            if cell < 0:
+                continue
+            name = blocks[cell]
+            # Run reflect() function
+            if name == BLOCK_A:
+                self.reflect(state, stack)
+            # Run refract() function
+            elif name == BLOCK_C:
+                self.refract(state, stack)
+            # Moving on through empty positions, stopping at Block B
+            elif name != BLOCK_B and moves[state] >= 0:
+                stack.append(moves[state])
+
+    def record_lazor(self, lazer):
+        '''
+        This function moves the lazor as move_lazor and records its path
+        as one line for ImageDraw.line: the beam is walked depth first
+        and the pen goes back along the beam to every split (C block),
+        so the branches need no separate lines.
+        The tracing of the search (move_lazor) records nothing.
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state of the lazor source
+        **Returns**
+            beam: *array, int*
+                The .bff coordinates X0, Y0, X1, Y1, ... of the path
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        bounces = self.board.bounces
+        span = self.board.span
+        blocks = self.sel_comb
+        visited = self.visited
+        points = self.points
+        beam = array('h')
+        # End of the last step, the way back after it is not drawn
+        end = 0
+        # States to trace and, as ~position, the steps to go back along
+        stack = [lazer]
+        while stack:
+            state = stack.pop()
+            if state < 0:
+                # One step back, towards the last split
+                beam.extend(divmod(~state, span)[::-1])
+                continue
+            pos = state >> 2
+            # The step to this state is drawn even if it was traced
+            # before (loops, merging beams)
+            beam.extend(divmod(pos, span)[::-1])
+            end = len(beam)
+            if visited[state]:
+                continue
+            visited[state] = 1
+            if pos in points:
+                points.discard(pos)
+                if not points and self.early_stop:
+                    break
+            cell = neighbours[state]
+            if cell < 0:
+                continue
+            name = blocks[cell]
+            # Same moves as move_lazor
+            nexts = []
+            if name == BLOCK_A or name == BLOCK_C:
+                nexts.append(bounces[state])
+                if name == BLOCK_C:
+                    nexts.append(moves[state])
+            elif name != BLOCK_B:
+                nexts.append(moves[state])
+            for i in nexts:
+                if i >= 0:
+                    stack.append(~pos)
+                    stack.append(i)
+        del beam[end:]
+        return beam
+
+    def trace(self, lazer):
+        '''
+        This function traces one lazor completely, on its own, and
+        records the 'o' positions it runs into for class TraceMemo
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state of the lazor source
+        **Returns**
+            hits: *frozenset, int*
+                The positions of the POIs intersected
+            reads: *list, tuple*
+                The (cell, block) of every 'o' position, in the order
+                the beam first ran into them
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        bounces = self.board.bounces
+        blocks = self.sel_comb
+        variable = self.memo.open
+        targets = self.memo.targets
+        visited = bytearray(len(moves))
+        hits = set()
+        reads = []
+        seen = set()
+        stack = [lazer]
+        while stack:
+            state = stack.pop()
+            if visited[state]:
+                continue
+            visited[state] = 1
+            if state >> 2 in targets:
+                hits.add(state >> 2)
+            cell = neighbours[state]
+            if cell < 0:
+                continue
+            name = blocks[cell]
+            # The path depends on this cell
+            if variable[cell] and cell not in seen:
+                seen.add(cell)
+                reads.append((cell, name))
+            # Same moves as move_lazor
+            if name == BLOCK_A or name == BLOCK_C:
+                if bounces[state] >= 0:
+                    stack.append(bounces[state])
+                if name == BLOCK_C and moves[state] >= 0:
+                    stack.append(moves[state])
+            elif name != BLOCK_B and moves[state] >= 0:
+                stack.append(moves[state])
+        return frozenset(hits), reads
+
+    def touched(self):
+        '''
+        This function lists the cells the traced lazors ran into
+
+        **Input Parameters**
+            None
+        **Returns**
+            touched: *set, int*
+                The cell ids in front of every traced state
+        '''
+        return set(compress(self.board.neighbours, self.visited))
+
+    def reflect(self, lazer, stack):
+        '''
+        This function is executed if it encounters the A block
+        The reflected state on the sides or on top or bottom of the block
+        is taken from the precomputed lookup of the board
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state with lazor position and direction
+            stack: *list, int*
+                The states still to be traced
+        **Returns**
+            None
+        '''
+        state = self.board.bounces[lazer]
+        if state >= 0:
+            stack.append(state)
+
+    def refract(self, lazer, stack):
+        '''
+        This function is executed if it encounters the C block
+        Refract section
+        Step 1: Lazor passes through the block in the same direction
+        Reflect section
+        Step 2: Lazor is reflected as for the A block
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state with lazor position and direction
+            stack: *list, int*
+                The states still to be traced
+        **Returns**
+            None
+        '''
+        state = self.board.moves[lazer]
+        if state >= 0:
+            stack.append(state)
+        self.reflect(lazer, stack)
+
+
+class BitSolution:
+    '''
+        This class tests a combination like class Solution, with Python
+        integers as bitmasks
+        - Blocks are one bitmask of the cells per block type, fixed
+          blocks included, so a combination is placed with a few ORs
+        - Traced lazor states and intersected POIs are bitmasks of the
+          lattice, and the goal is a single AND and compare
+        - A POI walled in is also found with one AND per POI
+    '''
+
+    def __init__(self, masks, board, early_stop=True):
+        '''
+        The __init__ method will initialize the bitmasks of the blocks
+        and the lattice board with lazors and points of intersection
+
+        **Input Parameters**
+            masks: *tuple, int*
+                The bitmasks of the cells of the A, B and C blocks
+                (see Board.masks)
+            board: *Board*
+                The lattice model of the grid
+            early_stop: *bool, optional*
+                Stop as soon as every POI is intersected
+        **Returns**
+            None
+        '''
+        self.board = board
+        self.masks = masks
+        self.early_stop = early_stop
+        # Bitmasks of the POIs intersected and lazor states traced
+        self.hits = 0
+        self.visited = 0
+        if PROFILER is not None:
+            PROFILER.counters['solutions'] += 1
+
+    def __call__(self):
+        '''
+        The __call__ method will test if all POIs are intersected
+        by the lazors
+
+        **Input Parameters**
+            None
+        **Returns**
+            True/False *bool*
+                True if every POI is intersected
+        '''
+        a, b, c = self.masks
+        opaque = a | b
+        # No lazor can reach a POI walled in by blocks
+        for wall in self.board.wall_masks:
+            if opaque & wall == wall:
+                return False
+        targets = self.board.point_mask
+        for li in self.board.lazers:
+            if self.early_stop and self.hits == targets:
+                break
+            self.move_lazor(li)
+        if PROFILER is not None:
+            PROFILER.trace(self.board, self.visited, self.masks)
+        return self.hits == targets
+
+    def move_lazor(self, lazer):
+        '''
+        This function follows the beam of a lazor with a stack of states,
+        as Solution.move_lazor
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state with lazor position and direction
+        **Returns**
+            None
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        bounces = self.board.bounces
+        targets = self.board.point_mask
+        a, b, c = self.masks
+        # Cells reflecting the beam
+        mirrors = a | c
+        early_stop = self.early_stop
+        visited = self.visited
+        hits = self.hits
+        stack = [lazer]
+        while stack:
+            state = stack.pop()
+            if visited >> state & 1:
+                continue
+            visited |= 1 << state
+            pos = state >> 2
+            if targets >> pos & 1:
+                hits |= 1 << pos
+                # Stop at the last POI
+                if early_stop and hits == targets:
+                    break
+            cell = neighbours[state]
+            if cell < 0:
+                continue
+            # Reflection on A and C blocks, passing through C blocks and
+            # empty cells, stopping at B blocks
+            if mirrors >> cell & 1:
+                if bounces[state] >= 0:
+                    stack.append(bounces[state])
+                if c >> cell & 1 and moves[state] >= 0:
+                    stack.append(moves[state])
+            elif not b >> cell & 1 and moves[state] >= 0:
+                stack.append(moves[state])
+        self.visited = visited
+        self.hits = hits
+
+
+class IncrementalSolution:
+    '''
+        This class tests a sequence of block combinations, reusing the
+        lazor paths traced for the previous ones
+        - Lazor paths are cut into straight segments, from a state to the
+          first block or the edge of the grid
+        - A segment only depends on the cells it runs into, so it stays
+          valid until one of these cells changes
+        - For every combination only the segments running into a changed
+          cell are traced again, and a lazor none of whose segments
+          changed keeps its previous POIs
+    '''
+
+    def __init__(self, board):
+        '''
+        The __init__ method will initialize the lattice board and the
+        empty segment cache
+
+        **Input Parameters**
+            board: *Board*
+                The lattice model of the grid
+        **Returns**
+            None
+        '''
+        self.board = board
+        # Positions of the POIs, and a flag per lattice position
+        self.targets = set(board.points)
+        self.is_target = bytearray(board.span * board.rows)
+        for i in self.targets:
+            if i >= 0:
+                self.is_target[i] = 1
+        # Layout of the previous combination
+        self.blocks = bytearray(board.blocks)
+        # Segments by starting state: (POIs hit, cells, next states)
+        self.segments = {}
+        # Starting states of the segments running into every cell
+        self.starts = {}
+        # Segments and POIs hit of every lazor
+        self.paths = {}
+        self.points = list(board.points)
+
+    def __call__(self, sel_comb, changed=None):
+        '''
+        The __call__ method will test if all POIs are intersected
+        by the lazors for the given combination
+
+        **Input Parameters**
+            sel_comb: *bytearray*
+                The block codes indexed by cell id (see Board.layout)
+            changed: *list, int, optional*
+                The cells that differ from the previous combination,
+                found by comparing all 'o' positions by default
+        **Returns**
+            True/False *bool*
+                True if list of points of intersection (POI) is empty
+        '''
+        blocks = self.blocks
+        if changed is None:
+            changed = [i for i in self.board.open_cells
+                       if sel_comb[i] != blocks[i]]
+        # Drop the segments running into the cells that changed
+        dropped = set()
+        for cell in changed:
+            blocks[cell] = sel_comb[cell]
+            for state in self.starts.pop(cell, ()):
+                if self.segments.pop(state, None) is not None:
+                    dropped.add(state)
+        # Lazors following a dropped segment are traced again
+        if dropped:
+            for lazer, path in list(self.paths.items()):
+                if not path[0].isdisjoint(dropped):
+                    del self.paths[lazer]
+        # No lazor can reach a POI walled in by blocks
+        if self.board.blocked(sel_comb):
+            self.points = list(self.board.points)
+            return False
+        remaining = set(self.targets)
+        for lazer in self.board.lazers:
+            path = self.paths.get(lazer)
+            if path is None:
+                path = self.move_lazor(lazer)
+            remaining.difference_update(path[1])
+        self.points = [i for i in self.board.points if i in remaining]
+        return not remaining
+
+    def move_lazor(self, lazer):
+        '''
+        This function follows a lazor segment by segment, tracing
+        only the segments missing from the cache
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state with lazor position and direction
+        **Returns**
+            path: *tuple, set*
+                The starting states of the segments and the POIs hit
+        '''
+        visited = set()
+        hits = set()
+        stack = [lazer]
+        while stack:
+            state = stack.pop()
+            # Skip segments already followed (loops, merging beams)
+            if state in visited:
+                continue
+            visited.add(state)
+            segment = self.segments.get(state)
+            if segment is None:
+                segment = self.segment(state)
+            hits.update(segment[0])
+            stack.extend(segment[2])
+        self.paths[lazer] = visited, hits
+        return visited, hits
+
+    def segment(self, state):
+        '''
+        This function traces a lazor straight from the given state up to
+        the first block or the edge of the grid, and caches the segment
+
+        **Input Parameters**
+            state: *int*
+                The lattice state the segment starts from
+        **Returns**
+            segment: *tuple*
+                The POIs hit, the cells run into and the next states
+        '''
+        board = self.board
+        blocks = self.blocks
+        is_target = self.is_target
+        start = state
+        hits, cells, states = [], [], []
+        while True:
+            if is_target[state >> 2]:
+                hits.append(state >> 2)
+            cell = board.neighbours[state]
+            # If lazor position is outside the grid
+            if cell < 0:
+                break
+            cells.append(cell)
+            name = blocks[cell]
+            if name == BLOCK_A:
+                states.append(board.bounces[state])
+                break
+            elif name == BLOCK_C:
+                states.append(board.moves[state])
+                states.append(board.bounces[state])
+                break
+            elif name == BLOCK_B or board.moves[state] < 0:
+                break
+            state = board.moves[state]
+        segment = (hits, cells, [i for i in states if i >= 0])
+        self.segments[start] = segment
+        for cell in cells:
+            self.starts.setdefault(cell, set()).add(start)
+        return segment
+
+
+class TraceMemo:
+    '''
+        This class remembers the POIs intersected by every lazor
+        - The path of a lazor only depends on the blocks in the 'o'
+          positions it runs into, the other cells never change
+        - For every lazor, the traced paths form a tree: a node asks for
+          the block in one cell, in the order the beam runs into the
+          cells, and a leaf holds the POIs intersected
+        - A combination only walks the tree, the lazor is traced again
+          when it runs into a cell with a block never met before
+        - The number of leaves is bounded, the least recently used ones
+          are dropped
+    '''
+
+    def __init__(self, board, max_entries=1 << 16):
+        '''
+        The __init__ method will initialize the empty trees
+
+        **Input Parameters**
+            board: *Board*
+                The lattice model of the grid
+            max_entries: *int, optional*
+                The number of paths remembered
+        **Returns**
+            None
+        '''
+        self.board = board
+        self.max_entries = max_entries
+        # Positions of the POIs
+        self.targets = frozenset(board.points)
+        # 1 for the cells of the 'o' positions
+        self.open = bytearray(len(board.blocks))
+        for cell in board.open_cells:
+            self.open[cell] = 1
+        # Root node of every lazor, nodes are [cell, children, parent,
+        # block] and leaves [None, POIs, parent, block], a root keeps the
+        # lazor in place of the block
+        self.roots = {}
+        # Leaves from the least to the most recently used
+        self.leaves = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def lookup(self, lazer, blocks):
+        '''
+        This function finds the POIs intersected by a lazor
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state of the lazor source
+            blocks: *bytearray*
+                The block codes indexed by cell id (see Board.layout)
+        **Returns**
+            points: *frozenset, int*
+                The positions of the POIs, None if the path is unknown
+        '''
+        node = self.roots.get(lazer)
+        while node is not None and node[0] is not None:
+            node = node[1].get(blocks[node[0]])
+        if node is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        self.leaves.move_to_end(id(node))
+        return node[1]
+
+    def store(self, lazer, reads, points):
+        '''
+        This function adds a traced path to the tree of the lazor
+
+        **Input Parameters**
+            lazer: *int*
+                The lattice state of the lazor source
+            reads: *list, tuple*
+                The (cell, block) of the 'o' positions in the order the
+                beam ran into them (see Solution.trace)
+            points: *frozenset, int*
+                The positions of the POIs intersected
+        **Returns**
+            None
+        '''
+        leaf = [None, points, None, None]
+        if lazer not in self.roots:
+            if reads:
+                self.roots[lazer] = [reads[0][0], {}, None, lazer]
+            else:
+                # A path running into no 'o' position
+                leaf[3] = lazer
+                self.roots[lazer] = leaf
+        node = self.roots[lazer]
+        for i, (cell, code) in enumerate(reads):
+            child = node[1].get(code)
+            if child is None:
+                if i + 1 < len(reads):
+                    child = [reads[i + 1][0], {}, node, code]
+                else:
+                    child = leaf
+                    leaf[2:] = node, code
+                node[1][code] = child
+            node = child
+        self.leaves[id(leaf)] = leaf
+        while len(self.leaves) > self.max_entries:
+            self.evict(self.leaves.popitem(last=False)[1])
+
+    def evict(self, node):
+        '''
+        This function removes a leaf, and the nodes left without children
+
+        **Input Parameters**
+            node: *list*
+                The leaf
+        **Returns**
+            None
+        '''
+        self.stats['evictions'] += 1
+        while node[2] is not None:
+            parent = node[2]
+            del parent[1][node[3]]
+            if parent[1]:
+                return
+            node = parent
+        # The root keeps the lazor in place of the block
+        del self.roots[node[3]]
+
+    def hit_rate(self):
+        '''
+        This function computes the share of lazors not traced again
+
+        **Input Parameters**
+            None
+        **Returns**
+            rate: *float*
+                The hits divided by the lookups
+        '''
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+
+class ConstraintSearch:
+    '''
+        This class solves a puzzle by constraint propagation
+        - Every 'o' position is a variable: empty, A, B or C block
+        - The lazors are traced through the decided cells, and the beam
+          segments stop at the first undecided cell they run into
+        - The cell of the beam closest to a missing POI is decided next,
+          every value allowed by the blocks left is tried (empty first)
+          and the search backtracks
+        - Every node first tries its undecided cells empty, as class
+          Lazor does in the 'prune' mode (see probe)
+        - Propagation: with no block left every undecided cell is empty,
+          with as many blocks as undecided cells none of them is empty,
+          a POI walled in fails, and a POI no beam can reach through
+          the undecided cells fails (see reach)
+        - Conflict learning: the states the beams may reach are closed,
+          the cells keeping a POI out of them are learnt as a nogood
+          and every branch repeating them is skipped (see explain)
+        - The values tried down to the current node and the nogoods
+          are the progress of a checkpoint; the search resumes by
+          going down the same values again (see progress)
+    '''
+
+    # Beams may go straight or be reflected by the undecided cells
+    PASS, REFLECT = 1, 2
+    # Code of the cells of a nogood that were not decided yet
+    UNDECIDED = 255
+
+    def __init__(self, board, stats=None, budget=None, tick=None):
+        '''
+        The __init__ method will initialize the variables of the board
+
+        **Input Parameters**
+            board: *Board*
+                The lattice model of the grid
+            stats: *dict, optional*
+                The statistics of class Lazor, 'nodes' is updated
+            budget: *Budget, optional*
+                The limits of the search, charged once per node
+            tick: *function, optional*
+                Called once per node, to write a checkpoint when due
+        **Returns**
+            None
+        '''
+        self.board = board
+        self.budget = budget
+        self.tick = tick
+        self.stats = stats if stats is not None else {'nodes': 0}
+        for key in ('conflicts', 'learnt', 'pruned'):
+            self.stats.setdefault(key, 0)
+        self.targets = set(board.points)
+        # 1 for the 'o' positions, and for the ones not decided yet
+        self.variable = bytearray(len(board.blocks))
+        for cell in board.open_cells:
+            self.variable[cell] = 1
+        self.free = bytearray(self.variable)
+        self.blocks = bytearray(board.blocks)
+        # Layout found, the decisions are undone on the way back
+        self.solution = None
+        # Decided cells intersecting the most POIs, for Lazor.partial
+        self.best = None
+        self.best_hits = -1
+        # Nogoods, (cells, moves allowed), by each of their decided
+        # (cell, code); an empty nogood means there is no solution
+        self.nogoods = {}
+        self.impossible = False
+        # Index of the value tried at every node down to the current
+        # one, and the ones to go down again when resuming
+        self.path = []
+        self.replay = []
+        self.stopped = None
+
+    def __call__(self):
+        '''
+        The __call__ method will search a layout solving the puzzle
+
+        **Input Parameters**
+            None
+        **Returns**
+            sel_comb: *bytearray*
+                The block codes indexed by cell id, None if the puzzle
+                has no solution
+        '''
+        remaining = [self.board.counts[i] for i in ('A', 'B', 'C')]
+        if self.search(remaining, len(self.board.open_cells)):
+            return self.solution
+        return None
+
+    def allowed(self, remaining, undecided):
+        '''
+        This function finds the moves the undecided cells still allow
+
+        **Input Parameters**
+            remaining: *list, int*
+                The number of A, B, C blocks still to be placed
+            undecided: *int*
+                The number of 'o' positions not decided yet
+        **Returns**
+            allowed: *int*
+                PASS if a beam can go through, REFLECT if it can be
+                reflected, or both
+        '''
+        allowed = 0
+        # Empty cells or C blocks let the beam through
+        if remaining[2] or undecided > sum(remaining):
+            allowed |= self.PASS
+        if remaining[0] or remaining[2]:
+            allowed |= self.REFLECT
+        return allowed
+
+    def trace(self):
+        '''
+        This function traces the lazors through the decided cells
+
+        **Input Parameters**
+            None
+        **Returns**
+            hits: *set, int*
+                The positions of the POIs intersected
+            frontier: *list, int*
+                The states running into an undecided cell, in the order
+                they were traced
+            visited: *bytearray*
+                1 for the states traced
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        bounces = self.board.bounces
+        blocks = self.blocks
+        free = self.free
+        visited = bytearray(len(moves))
+        hits = set()
+        frontier = []
+        for lazer in self.board.lazers:
+            stack = [lazer]
+            while stack:
+                state = stack.pop()
+                if visited[state]:
+                    continue
+                visited[state] = 1
+                if state >> 2 in self.targets:
+                    hits.add(state >> 2)
+                cell = neighbours[state]
+                if cell < 0:
+                    continue
+                if free[cell]:
+                    frontier.append(state)
+                    continue
+                name = blocks[cell]
+                if name == BLOCK_A or name == BLOCK_C:
+                    if bounces[state] >= 0:
+                        stack.append(bounces[state])
+                    if name == BLOCK_C and moves[state] >= 0:
+                        stack.append(moves[state])
+                elif name != BLOCK_B and moves[state] >= 0:
+                    stack.append(moves[state])
+        return hits, frontier, visited
+
+    def exits(self, cell, allowed):
+        '''
+        This function finds how a beam running into a cell goes on
+
+        **Input Parameters**
+            cell: *int*
+                The cell id
+            allowed: *int*
+                The moves allowed by the undecided cells
+        **Returns**
+            passes, reflects: *bool*
+                True if the beam may go through, or be reflected
+        '''
+        if self.free[cell]:
+            return allowed & self.PASS, allowed & self.REFLECT
+        name = self.blocks[cell]
+        return (name != BLOCK_A and name != BLOCK_B,
+                name == BLOCK_A or name == BLOCK_C)
+
+    def reach(self, frontier, visited, allowed, missing):
+        '''
+        This function floods the lattice from the frontier, taking every
+        move an undecided cell may allow: a POI out of reach cannot be
+        intersected whatever the undecided cells hold
+
+        **Input Parameters**
+            frontier: *list, int*
+                The states running into an undecided cell
+            visited: *bytearray*
+                1 for the states traced, updated in place
+            allowed: *int*
+                The moves allowed by the undecided cells
+            missing: *set, int*
+                The positions of the POIs not intersected
+        **Returns**
+            True/False *bool*
+                True if every missing POI may still be reached, the
+                flood stops early then
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        bounces = self.board.bounces
+        missing = set(missing)
+        # The frontier states are already visited, go on from them
+        stack = []
+        for state in frontier:
+            passes, reflects = self.exits(neighbours[state], allowed)
+            if passes and moves[state] >= 0:
+                stack.append(moves[state])
+            if reflects and bounces[state] >= 0:
+                stack.append(bounces[state])
+        while stack:
+            state = stack.pop()
+            if visited[state]:
+                continue
+            visited[state] = 1
+            if state >> 2 in missing:
+                missing.discard(state >> 2)
+                if not missing:
+                    return True
+            cell = neighbours[state]
+            if cell < 0:
+                continue
+            passes, reflects = self.exits(cell, allowed)
+            if passes and moves[state] >= 0:
+                stack.append(moves[state])
+            if reflects and bounces[state] >= 0:
+                stack.append(bounces[state])
+        return False
+
+    def explain(self, visited, allowed):
+        '''
+        This function finds the cells keeping the beams in the visited
+        states: the 'o' positions where another block would lead out of
+        them. Any other cell may hold anything, the beams still cannot
+        leave the visited states to reach the missing POIs.
+
+        **Input Parameters**
+            visited: *bytearray*
+                1 for the states the beams may reach, closed
+            allowed: *int*
+                The moves allowed by the undecided cells
+        **Returns**
+            nogood: *tuple, tuple*
+                The (cell, code) of these cells, UNDECIDED for the
+                cells not decided yet
+        '''
+        neighbours = self.board.neighbours
+        moves = self.board.moves
+        bounces = self.board.bounces
+        cells = set()
+        for state in compress(range(len(visited)), visited):
+            cell = neighbours[state]
+            if cell < 0 or not self.variable[cell] or cell in cells:
+                continue
+            passes, reflects = self.exits(cell, allowed)
+            if not passes and moves[state] >= 0 and not visited[moves[state]]:
+                cells.add(cell)
+            elif (not reflects and bounces[state] >= 0
+                    and not visited[bounces[state]]):
+                cells.add(cell)
+        return tuple(sorted((i, self.UNDECIDED if self.free[i]
+                             else self.blocks[i]) for i in cells))
+
+    def search(self, remaining, undecided):
+        '''
+        This function propagates and decides one node of the search
+
+        **Input Parameters**
+            remaining: *list, int*
+                The number of A, B, C blocks still to be placed
+            undecided: *int*
+                The number of 'o' positions not decided yet
+        **Returns**
+            True/False *bool*
+                True if self.solution holds a solution
+        '''
+        if self.tick is not None:
+            self.tick()
+        # Nodes down the path of a checkpoint were charged before it
+        if not self.replay:
+            if self.budget is not None:
+                self.budget()
+            self.stats['nodes'] += 1
+        forced = ()
+        if not sum(remaining):
+            # Propagation: no block left, every cell is empty
+            forced = [i for i in self.board.open_cells if self.free[i]]
+            for i in forced:
+                self.free[i] = 0
+            undecided = 0
+        try:
+            return self.propagate(remaining, undecided)
+        finally:
+            for i in forced:
+                self.free[i] = 1
+
+    def propagate(self, remaining, undecided):
+        '''
+        This function traces the lazors of a node, checks that every POI
+        can still be intersected and branches on the next cell
+
+        **Input Parameters**
+            remaining: *list, int*
+                The number of A, B, C blocks still to be placed
+            undecided: *int*
+                The number of 'o' positions not decided yet
+        **Returns**
+            True/False *bool*
+                True if self.solution holds a solution
+        '''
+        # Propagation: a POI walled in by the decided cells
+        if self.board.blocked(self.blocks):
+            self.stats['conflicts'] += 1
+            return False
+        hits, frontier, visited = self.trace()
+        if len(hits) > self.best_hits:
+            self.best_hits = len(hits)
+            self.best = bytearray(self.blocks)
+        missing = self.targets - hits
+        if not missing:
+            return self.complete(remaining)
+        if self.probe(remaining):
+            return True
+        allowed = self.allowed(remaining, undecided)
+        if not self.reach(frontier, visited, allowed, missing):
+            self.learn(self.explain(visited, allowed), allowed)
+            return False
+        cell = self.board.neighbours[self.choose(frontier, missing)]
+        self.free[cell] = 0
+        # Values tried before the checkpoint, down the same path
+        first = self.replay.pop(0) if self.replay else 0
+        self.path.append(0)
+        try:
+            for k, code in enumerate((BLOCK_O, BLOCK_A, BLOCK_C, BLOCK_B)):
+                if k < first:
+                    continue
+                self.path[-1] = k
+                # Codes of the blocks are their index in remaining + 1
+                if code != BLOCK_O and not remaining[code - 1]:
+                    continue
+                # An empty cell needs enough cells for the blocks left
+                if code == BLOCK_O and undecided - 1 < sum(remaining):
+                    continue
+                self.blocks[cell] = code
+                if self.excluded(cell, code, remaining, undecided - 1):
+                    continue
+                if k != first:
+                    # Off the path of the checkpoint, if it was skipped
+                    self.replay = []
+                if code != BLOCK_O:
+                    remaining[code - 1] -= 1
+                solved = self.search(remaining, undecided - 1)
+                if code != BLOCK_O:
+                    remaining[code - 1] += 1
+                if solved or self.impossible:
+                    return solved
+            return False
+        except (BudgetExhausted, KeyboardInterrupt):
+            # The values down to the node that stopped, for a checkpoint
+            if self.stopped is None:
+                self.stopped = list(self.path)
+            raise
+        finally:
+            self.path.pop()
+            self.free[cell] = 1
+            self.blocks[cell] = BLOCK_O
+
+    def progress(self):
+        '''
+        This function gives the progress of the search for a checkpoint
+
+        **Input Parameters**
+            None
+        **Returns**
+            state: *dict*
+                The values tried down to the current node, the nogoods
+                learnt as [[cell, code, ...], allowed] and the best
+                decided cells
+        '''
+        nogoods = {item for items in self.nogoods.values()
+                   for item in items}
+        path = self.path if self.stopped is None else self.stopped
+        return {'path': list(path),
+                'nogoods': [[[i for pair in nogood for i in pair], allowed]
+                            for nogood, allowed in nogoods],
+                'impossible': self.impossible,
+                'best': None if self.best is None else list(self.best),
+                'best_hits': self.best_hits}
+
+    def restore(self, state):
+        '''
+        This function takes back the progress of a checkpoint: the next
+        search goes down the same values and skips the ones tried
+
+        **Input Parameters**
+            state: *dict*
+                The progress, see progress
+        **Returns**
+            None
+        '''
+        self.replay = list(state['path'])
+        for flat, allowed in state['nogoods']:
+            nogood = tuple(zip(flat[::2], flat[1::2]))
+            for literal in nogood:
+                if literal[1] != self.UNDECIDED:
+                    self.nogoods.setdefault(literal, []).append(
+                        (nogood, allowed))
+        self.impossible = state['impossible']
+        if state['best'] is not None:
+            self.best = bytearray(state['best'])
+        self.best_hits = state['best_hits']
+
+    def choose(self, frontier, missing):
+        '''
+        This function picks the frontier state to decide next: the one
+        closest to a missing POI, as its cell is most likely to matter
+
+        **Input Parameters**
+            frontier: *list, int*
+                The states running into an undecided cell
+            missing: *set, int*
+                The positions of the POIs not intersected
+        **Returns**
+            state: *int*
+                The first closest state of the frontier
+        '''
+        points = [divmod(i, self.board.span) for i in missing]
+
+        def distance(state):
+            Y, X = divmod(state >> 2, self.board.span)
+            return min(abs(X - x) + abs(Y - y) for y, x in points)
+        return min(frontier, key=distance)
+
+    def probe(self, remaining):
+        '''
+        This function tries the undecided cells empty, with the blocks
+        left on cells no lazor runs into: many nodes are solved this way
+        long before their cells are all decided
+
+        **Input Parameters**
+            remaining: *list, int*
+                The number of A, B, C blocks still to be placed
+        **Returns**
+            True/False *bool*
+                True if self.solution holds a solution
+        '''
+        test_comb = Solution(self.blocks, self.board, early_stop=False)
+        if not test_comb():
+            return False
+        touched = test_comb.touched()
+        free = [i for i in self.board.open_cells
+                if self.free[i] and i not in touched]
+        if len(free) < sum(remaining):
+            return False
+        layout = bytearray(self.blocks)
+        for code, number in zip((BLOCK_A, BLOCK_B, BLOCK_C), remaining):
+            for _ in range(number):
+                layout[free.pop()] = code
+        # The blocks left must not wall a POI in
+        if self.board.blocked(layout):
+            return False
+        self.solution = layout
+        return True
+
+    def complete(self, remaining):
+        '''
+        This function places the blocks left on the undecided cells once
+        every POI is intersected: the beams may only hit more POIs after
+        them, but the A and B blocks must not wall a POI in, as class
+        Solution rejects such layouts (see Board.blocked)
+
+        **Input Parameters**
+            remaining: *list, int*
+                The number of A, B, C blocks still to be placed
+        **Returns**
+            True/False *bool*
+                True if self.solution holds a solution
+        '''
+        free = [i for i in self.board.open_cells if self.free[i]]
+        opaque = remaining[0] + remaining[1]
+        for cells in combinations(free, opaque):
+            layout = bytearray(self.blocks)
+            for k, cell in enumerate(cells):
+                layout[cell] = BLOCK_A if k < remaining[0] else BLOCK_B
+            if self.board.blocked(layout):
+                continue
+            # C blocks never wall a POI in
+            others = [i for i in free if i not in cells]
+            for cell in others[:remaining[2]]:
+                layout[cell] = BLOCK_C
+            self.solution = layout
+            return True
+        self.stats['conflicts'] += 1
+        return False
+
+    def learn(self, nogood, allowed):
+        '''
+        This function records the cells that caused a failure
+
+        **Input Parameters**
+            nogood: *tuple, tuple*
+                The (cell, code) of the cells (see explain)
+            allowed: *int*
+                The moves the undecided cells allowed
+        **Returns**
+            None
+        '''
+        self.stats['conflicts'] += 1
+        decided = [i for i in nogood if i[1] != self.UNDECIDED]
+        if len(decided) == len(nogood):
+            # The failure holds whatever the undecided cells allow
+            allowed = self.PASS | self.REFLECT
+            if not nogood:
+                self.impossible = True
+                return
+        self.stats['learnt'] += 1
+        # Only decisions can complete a nogood
+        for literal in decided:
+            self.nogoods.setdefault(literal, []).append((nogood, allowed))
+
+    def excluded(self, cell, code, remaining, undecided):
+        '''
+        This function tests if a decision completes a learnt nogood
+
+        **Input Parameters**
+            cell, code: *int*
+                The decided cell and its block code
+            remaining: *list, int*
+                The number of A, B, C blocks left before the decision
+            undecided: *int*
+                The number of 'o' positions not decided after it
+        **Returns**
+            True/False *bool*
+                True if the decision leads to a known failure
+        '''
+        nogoods = self.nogoods.get((cell, code))
+        if not nogoods:
+            return False
+        remaining = list(remaining)
+        if code != BLOCK_O:
+            remaining[code - 1] -= 1
+        allowed = self.allowed(remaining, undecided)
+        for nogood, learnt in nogoods:
+            # The failure holds while fewer moves are allowed
+            if allowed & ~learnt:
+                continue
+            for i, value in nogood:
+                if value == self.UNDECIDED:
+                    if not self.free[i]:
+                        break
+                elif self.free[i] or self.blocks[i] != value:
+                    break
+            else:
+                self.stats['pruned'] += 1
+                return True
+        return False
+
+
+class Visualisation:
+    '''
+        This class defines various operations for plotting the final solution
+        for a given lazor test case
+
+        Step 1: Creating a grid with blocks
+        Step 2: Assigning the colors as per the above color scheme
+        Step 3: Retracing the lazor path
+        Step 4: Draw the grid lines, lazor beams, intersection points
+                and lazer points
+        Step 5: Save the solution as an image file (.png by default)
+                next to the test file
+    '''
+
+    def __init__(self, filename, info, sel_comb, block_size=100,
+                 image_format='png', beams=None):
+        '''
+        The __init__ method will initialize the filename, block info
+        and the dictionary with A, B, C combinations
+
+        **Input Parameters**
+            file: *str*
+                The filename to save the output
+            info: *dict*
+                The dictionary dataset2 of class Input
+            sel_comb: *dict, list, int*
+                An updated dictionary with A, B, C combinations
+            block_size: *int, optional*
+                The size of a block in pixels
+            image_format: *str, optional*
+                The image format (png, jpeg, gif, bmp, webp ...),
+                also used as file extension
+            beams: *list, array, int, optional*
+                The lazor paths recorded by class Solution (record),
+                drawn as lines
+
+        **Returns**
+            None
+
+        '''
+        self.filename = filename
+        self.info = info
+        self.sel_comb = sel_comb
+        self.lazers = info["Lazers"]
+        self.points = info["Points"]
+        self.block_size = block_size
+        self.image_format = image_format.lower()
+        self.beams = beams
+
+    def __call__(self):
+        '''
+        The __call__ method will plot the lazor solution in a grid
+        and save it as .png file
+
+        **Input Parameters**
+            None
+        **Returns**
+            filename: *str*
+                The image file
+        '''
+        # Intializing the grid size
+        if not self.sel_comb:
+            raise NoSolutionError("No solution is found for the given file")
+        else:
+            size = self.info['Size']
+            blockSize = self.block_size
+            # Grid dimensions
+            nBlocks1 = size[0]
+            nBlocks2 = size[1]
+            # Creating the grid
+            figure = self.grid()
+            dims1 = nBlocks1 * blockSize
+            dims2 = nBlocks2 * blockSize
+            # Storing the defined colors
+            colors = self.get_colors()
+
+            # Error if out of bounds
+            ERR_MSG = "Error, invalid grid value found!"
+            assert all([a in colors.keys()
                         for row in figure for a in row]), ERR_MSG
 
             # Initializing an image with grid dimensions
             img = Image.new("RGBA", (dims1, dims2), color=0)
 
-            # Marking the blocks accordingly
+            # Marking the blocks accordingly, one filled rectangle each
+            draw = ImageDraw.Draw(img)
             for jx in range(nBlocks1):
                 for jy in range(nBlocks2):
                     x = jx * blockSize
                     y = jy * blockSize
-                    for i in range(blockSize):
-                        for j in range(blockSize):
-                            img.putpixel((x + i, y + j),
-                                         colors[figure[jy][jx]])
+                    draw.rectangle(
+                        (x, y, x + blockSize - 1, y + blockSize - 1),
+                        fill=colors[figure[jy][jx]])
 
             # Drawing grid lines to distinguish the output blocks
-            draw = ImageDraw.Draw(img)
             step_size1 = int(dims1 / size[0])
             step_size2 = int(dims2 / size[1])
             y_start = 0
@@ -744,30 +3991,128 @@ class Visualisation:
             line = ((dims1 - 1, y_start), (dims1 - 1, y_end))
             draw.line(line, fill=(0, 0, 0, 255))
 
-            # Creating Lazers and POIs
+            # Creating Lazers and POIs, sized for 100 px blocks
+            scale = blockSize / 100
+            # One line per lazor, from the .bff coordinates in half
+            # blocks
+            half = blockSize / 2
+            for beam in self.beams or ():
+                if len(beam) >= 4:
+                    draw.line([i * half for i in beam],
+                              fill=(255, 0, 0, 255),
+                              width=max(int(4 * scale), 1), joint='curve')
             for i in self.lazers:
                 xp = i[0] * step_size1
                 yp = (size[1] - i[1]) * step_size2
-                shape = [(xp - 5, yp - 5), (xp + 5, yp + 5)]
-                img1 = ImageDraw.Draw(img)
-                img1.ellipse(shape, fill=(255, 0, 0, 255))
+                r = max(5 * scale, 1)
+                shape = [(xp - r, yp - r), (xp + r, yp + r)]
+                draw.ellipse(shape, fill=(255, 0, 0, 255))
 
             for i in self.points:
                 xp = i[0] * step_size1
                 yp = (size[1] - i[1]) * step_size2
-                shape = [(xp - 10, yp - 10), (xp + 10, yp + 10)]
-                img1 = ImageDraw.Draw(img)
-                img1.ellipse(shape, fill=(0, 0, 0, 255))
+                r = max(10 * scale, 2)
+                shape = [(xp - r, yp - r), (xp + r, yp + r)]
+                draw.ellipse(shape, fill=(0, 0, 0, 255))
 
             # Removing the draw tool
             del draw
             # Saving the file
-            if ".bff" in self.filename:
-                self.filename = self.filename.split(".bff")[0]
-
-            if not self.filename.endswith(".png"):
-                self.filename += ".png"
+            self.filename = self.path(self.filename, "." + self.image_format)
+            # JPEG has no transparency
+            if self.image_format in ('jpg', 'jpeg'):
+                img = img.convert("RGB")
             img.save("%s" % self.filename)
+            return self.filename
+
+    def grid(self):
+        '''
+        This function lays the solution out as color keys, one row of
+        the grid per list, top row first
+
+        **Input Parameters**
+            None
+        **Returns**
+            figure: *list, list, int*
+                The color key (see get_colors) of every block
+        '''
+        size = self.info['Size']
+        figure = [[0 for i in range(size[0])] for j in range(size[1])]
+        # For a given solution, plotting specific color blocks
+        for i in self.sel_comb:
+            # Transforming the coordinate system
+            x = int(i[0])
+            y = int(size[1] - i[1] - 1)
+            figure[y][x] = COLOR_KEYS.get(self.sel_comb[i], 0)
+        # Highlighting 'x' positions
+        for i in self.info['x_l']:
+            x = int(i[0])
+            y = int(size[1] - i[1] - 1)
+            figure[y][x] = 4
+        return figure
+
+    @staticmethod
+    def path(filename, extension):
+        '''
+        This function names an output file after the test file
+
+        **Input Parameters**
+            filename: *str*
+                The test file
+            extension: *str*
+                The end of the name, '.png' or '.txt' for instance
+        **Returns**
+            filename: *str*
+                The test file name with extension instead of .bff
+        '''
+        if ".bff" in filename:
+            filename = filename.split(".bff")[0]
+        if not filename.endswith(extension):
+            filename += extension
+        return filename
+
+    def text(self):
+        '''
+        This function draws the solution as a text grid in the .bff
+        layout: o, x, A, B and C per block, lazors and POIs below, so
+        that it reads as a solved puzzle
+
+        **Input Parameters**
+            None
+        **Returns**
+            text: *str*
+                The grid, one line per row
+        '''
+        if not self.sel_comb:
+            raise NoSolutionError("No solution is found for the given file")
+        symbols = 'oABCx'
+        lines = ["GRID START"]
+        lines += ["   ".join(symbols[key] for key in row)
+                  for row in self.grid()]
+        lines += ["GRID STOP"]
+        # Back from the plotting coordinates to the .bff ones
+        height = 2 * self.info['Size'][1]
+        lines += ["L %d %d %d %d" % (2 * x, height - 2 * y, 2 * vx, -2 * vy)
+                  for x, y, vx, vy in self.lazers]
+        lines += ["P %d %d" % (2 * x, height - 2 * y)
+                  for x, y in self.points]
+        return "\n".join(lines) + "\n"
+
+    def save_text(self):
+        '''
+        This function saves the text grid (see text) as .txt file next
+        to the test file
+
+        **Input Parameters**
+            None
+        **Returns**
+            filename: *str*
+                The text file
+        '''
+        filename = self.path(self.filename, ".txt")
+        with open(filename, 'w') as file:
+            file.write(self.text())
+        return filename
 
     def get_colors(self):
         '''
@@ -795,24 +4140,917 @@ class Visualisation:
         }
 
 
+class Profiler:
+    '''
+    This class counts the work of the solver for one puzzle
+    - Counters: candidates tested, search nodes, Solution objects
+      created in this process, lazor states traced
+      (move_lazor steps) and reflect/refract events
+    - Timers: parse, search and render, in seconds
+    - The solver only looks the profiler up once per Solution when it
+      is disabled (see PROFILER); steps and events are counted from the
+      traced states after each test
+    '''
+
+    def __init__(self):
+        '''
+        The __init__ method will initialize the counters and timers
+
+        **Input Parameters**
+            None
+        **Returns**
+            None
+        '''
+        self.counters = dict.fromkeys(
+            ('candidates', 'nodes', 'solutions', 'steps', 'reflects',
+             'refracts'), 0)
+        self.timers = dict.fromkeys(('parse', 'search', 'render'), 0.0)
+
+    @contextmanager
+    def timer(self, name):
+        '''
+        This function adds the time spent in a with block to a timer
+
+        **Input Parameters**
+            name: *str*
+                The timer (parse, search or render)
+        **Returns**
+            None
+        '''
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - t0
+
+    def trace(self, board, visited, blocks):
+        '''
+        This function counts the states traced by a Solution or
+        BitSolution, and the reflect and refract events among them
+
+        **Input Parameters**
+            board: *Board*
+                The lattice model of the grid
+            visited: *bytearray or int*
+                The traced states, as flags or as a bitmask
+            blocks: *bytearray or list, int*
+                The block codes indexed by cell id, or the bitmasks of
+                the A, B and C blocks
+        **Returns**
+            None
+        '''
+        if isinstance(visited, int):
+            # BitSolution: states and blocks as bitmasks
+            bits = bin(visited)[:1:-1]
+            visited = compress(range(len(bits)), map(int, bits))
+            a, _, c = blocks
+            codes = lambda cell: (BLOCK_A if a >> cell & 1 else
+                                  BLOCK_C if c >> cell & 1 else BLOCK_O)
+        else:
+            visited = compress(range(len(visited)), visited)
+            codes = blocks.__getitem__
+        counters = self.counters
+        for state in visited:
+            counters['steps'] += 1
+            cell = board.neighbours[state]
+            if cell < 0:
+                continue
+            code = codes(cell)
+            if code == BLOCK_A:
+                counters['reflects'] += 1
+            elif code == BLOCK_C:
+                counters['refracts'] += 1
+
+    def stats(self):
+        '''
+        This function summarizes the counters and timers
+
+        **Input Parameters**
+            None
+        **Returns**
+            stats: *dict*
+                The counters, and the timers rounded to microseconds
+        '''
+        stats = dict(self.counters)
+        for name, seconds in self.timers.items():
+            stats[name + '_time'] = round(seconds, 6)
+        return stats
+
+
+class SolveResult:
+    '''
+    This class holds the result of function solve
+    - status: 'solved', 'unsolvable' when every candidate failed, or
+      'exhausted' when the budget ran out first
+    - sel_comb: the blocks as in Board.sel_comb, None unless solved
+    - placement: the [column, row] of every A, B and C block of the
+      grid, fixed ones included, None unless solved
+    - finished: False when the budget ran out before the search ended
+    - partial, hits, targets: unless solved, the placement of the
+      candidate intersecting the most POIs (see Lazor.partial), the
+      number of POIs it intersects and the number of POIs
+    - stats: the search statistics of class Lazor
+    - candidates: the candidates traced or search nodes expanded
+    - memo: the lookups of the TraceMemo, None without it
+    - time: the solve time in seconds
+    - error: the message of an exhausted budget
+    - beams: the lazor paths of the solution recorded by class Solution,
+      for class Visualisation, None unless asked for
+    '''
+
+    def __init__(self, status, sel_comb, height, stats, time, memo=None,
+                 error=None, partial=None, hits=0, targets=0, beams=None):
+        '''
+        The __init__ method will initialize the result
+
+        **Input Parameters**
+            status: *str*
+                solved, unsolvable or exhausted
+            sel_comb: *dict, tuple, str*
+                The blocks of the solution, None otherwise
+            height: *int*
+                The number of rows of the grid
+            stats: *dict*
+                The statistics of class Lazor
+            time: *float*
+                The solve time in seconds
+            memo: *dict, optional*
+                The statistics of class TraceMemo
+            error: *str, optional*
+                The reason of an exhausted budget
+            partial: *dict, tuple, str, optional*
+                The blocks of the best candidate, unless solved
+            hits, targets: *int, optional*
+                The POIs it intersects, and the number of POIs
+            beams: *list, array, int, optional*
+                The lazor paths of the solution
+        **Returns**
+            None
+        '''
+        self.status = status
+        self.finished = status != 'exhausted'
+        self.sel_comb = sel_comb
+        self.stats = stats
+        self.time = time
+        self.memo = memo
+        self.error = error
+        # Candidates traced by the brute force or nodes of the search
+        self.candidates = stats['candidates'] + stats['nodes']
+        self.placement = self.grid_placement(sel_comb, height)
+        self.partial = self.grid_placement(partial, height)
+        self.hits = hits
+        self.targets = targets
+        self.beams = beams
+
+    @staticmethod
+    def grid_placement(sel_comb, height):
+        '''
+        This function converts the blocks of class Board.sel_comb into
+        the [column, row] of the grid, rows counted from the top
+
+        **Input Parameters**
+            sel_comb: *dict, tuple, str*
+                The blocks, or None
+            height: *int*
+                The number of rows of the grid
+        **Returns**
+            placement: *dict, list*
+                The [column, row] of the A, B and C blocks, or None
+        '''
+        if sel_comb is None:
+            return None
+        placement = {'A': [], 'B': [], 'C': []}
+        for (x, y), name in sorted(sel_comb.items()):
+            placement[name].append([x, height - 1 - y])
+        return placement
+
+    def record(self):
+        '''
+        This function summarizes the result as a JSON-ready dict
+
+        **Input Parameters**
+            None
+        **Returns**
+            record: *dict*
+                status, time, candidates, and the memo, placement,
+                error and partial placement when present
+        '''
+        record = {'status': self.status, 'time': self.time,
+                  'candidates': self.candidates}
+        for key in ('memo', 'placement', 'error'):
+            if getattr(self, key) is not None:
+                record[key] = getattr(self, key)
+        if self.partial is not None:
+            record.update(partial=self.partial, hits=self.hits,
+                          targets=self.targets)
+        return record
+
+
+def solve(puzzle, timeout=None, max_candidates=None, mode='brute',
+          workers=1, incremental=False, cache=None, memo=0, bits=False,
+          reachability=True, budget=None, beams=False, checkpoint=None):
+    '''
+    This function is the library entry point of the solver: it solves
+    one puzzle within a budget and returns a result instead of exiting,
+    so that one process can solve many puzzles
+
+    **Input Parameters**
+        puzzle: *str or tuple, dict*
+            The .bff file, or the datasets of class Input
+        timeout: *float, optional*
+            The time of the search in seconds, None for no limit
+        max_candidates: *int, optional*
+            The candidates or search nodes tested, None for no limit
+        mode, workers, incremental, cache, memo, bits, reachability:
+            The options of class Lazor
+        budget: *Budget, optional*
+            A budget to cancel the search from another thread, used
+            instead of timeout and max_candidates
+        beams: *bool, optional*
+            Record the lazor paths of the solution (SolveResult.beams)
+        checkpoint: *Checkpoint, optional*
+            Save the progress of the search, and resume it from there
+            after a stop (see class Checkpoint)
+    **Returns**
+        result: *SolveResult*
+            The status, placement and statistics of the search
+    **Raises**
+        PuzzleFormatError: the file or puzzle is malformed
+        OSError: the file cannot be read
+    '''
+    t0 = time.time()
+    if isinstance(puzzle, (str, os.PathLike)):
+        puzzle = Input(os.fspath(puzzle))()
+    dataset1, dataset2 = puzzle
+    if budget is None and (timeout is not None or
+                           max_candidates is not None):
+        budget = Budget(timeout, max_candidates)
+    lazor = Lazor(dataset1, dataset2, mode, workers, incremental, cache,
+                  memo, bits, reachability, budget, checkpoint)
+    status, error = 'solved', None
+    try:
+        sel_comb = lazor()
+    except BudgetExhausted as exhausted:
+        sel_comb, status, error = None, 'exhausted', str(exhausted)
+    if sel_comb is None and error is None:
+        status = 'unsolvable'
+    memo_stats = None
+    if lazor.memo is not None:
+        # Lookups of the lazor paths, to tune the size of the memo
+        memo_stats = dict(lazor.memo.stats,
+                          hit_rate=round(lazor.memo.hit_rate(), 4))
+    # Best candidate so far, when there is no solution to give
+    partial, hits = None, 0
+    if sel_comb is None:
+        partial, hits = lazor.partial()
+    paths = None
+    if beams and sel_comb is not None:
+        # One more trace of the solution, complete and recorded
+        board = lazor.board
+        solution = Solution(board.layout(sel_comb), board, early_stop=False,
+                            record=True)
+        solution()
+        paths = solution.beams
+    return SolveResult(status, sel_comb, dataset1['Size'][1], lazor.stats,
+                       time.time() - t0, memo_stats, error, partial, hits,
+                       lazor.targets, paths)
+
+
+def all_solutions(puzzle, limit=None, timeout=None, max_candidates=None,
+                  workers=1, incremental=False, memo=0, bits=False,
+                  reachability=False, budget=None, stats=None):
+    '''
+    This function streams every placement solving a puzzle, for level
+    validation (see Lazor.all_solutions). Every placement is tested, so
+    that solutions differing only in 'o' positions no lazor can reach
+    are counted apart, unless reachability is set.
+
+    **Input Parameters**
+        puzzle: *str or tuple, dict*
+            The .bff file, or the datasets of class Input
+        limit: *int, optional*
+            Stop after this number of solutions, None for all
+        timeout, max_candidates, budget:
+            The budget of the enumeration, see function solve
+        workers, incremental, memo, bits:
+            The options of class Lazor; there is no search mode, the
+            candidates of class Placements are all tested
+        reachability: *bool, optional*
+            Enumerate the 'o' positions no lazor can reach once, with
+            fillers, as the searches do (see Board.relevant)
+        stats: *dict, optional*
+            Updated with the search statistics of class Lazor
+    **Returns**
+        placements: *generator, dict*
+            The [column, row] of the A, B and C blocks of every solution
+    **Raises**
+        PuzzleFormatError: the file or puzzle is malformed
+        BudgetExhausted: the budget ran out before the end
+    '''
+    if isinstance(puzzle, (str, os.PathLike)):
+        puzzle = Input(os.fspath(puzzle))()
+    dataset1, dataset2 = puzzle
+    if budget is None and (timeout is not None or
+                           max_candidates is not None):
+        budget = Budget(timeout, max_candidates)
+    lazor = Lazor(dataset1, dataset2, 'brute', workers, incremental, None,
+                  memo, bits, reachability, budget)
+    try:
+        for sel_comb in lazor.all_solutions(limit):
+            yield SolveResult.grid_placement(sel_comb, dataset1['Size'][1])
+    finally:
+        if stats is not None:
+            stats.update(lazor.stats)
+
+
+def count_solutions(puzzle, limit=None, **options):
+    '''
+    This function counts the placements solving a puzzle
+
+    **Input Parameters**
+        puzzle: *str or tuple, dict*
+            The .bff file, or the datasets of class Input
+        limit: *int, optional*
+            Stop counting at this number, 2 tells if the solution is
+            unique, None for all
+        options: *dict*
+            The other keyword arguments of function all_solutions
+    **Returns**
+        count: *int*
+            The number of solutions
+    '''
+    return sum(1 for _ in all_solutions(puzzle, limit, **options))
+
+
+def _solutions_record(puzzle, limit, timeout, max_candidates, workers,
+                      incremental, memo, bits, reachability):
+    '''
+    This function enumerates the solutions of a puzzle for solve_file
+
+    **Input Parameters**
+        See solve_file
+    **Returns**
+        record: *dict*
+            The status, number of candidates, number of solutions
+            (count) and their placements, and the error of an exhausted
+            budget
+    '''
+    stats = {'candidates': 0, 'nodes': 0}
+    placements = []
+    status, error = 'solved', None
+    try:
+        for placement in all_solutions(puzzle, limit, timeout,
+                                       max_candidates, workers,
+                                       incremental, memo, bits,
+                                       reachability, stats=stats):
+            placements.append(placement)
+    except BudgetExhausted as exhausted:
+        status, error = 'exhausted', str(exhausted)
+    if not placements and error is None:
+        status = 'unsolvable'
+    record = {'status': status, 'time': 0.0,
+              'candidates': stats['candidates'], 'count': len(placements),
+              'placements': placements}
+    if error is not None:
+        record['error'] = error
+    if PROFILER is not None:
+        PROFILER.counters['candidates'] = stats['candidates']
+    return record
+
+
+@contextmanager
+def _no_timer(name):
+    '''
+    This function stands for Profiler.timer when profiling is disabled
+
+    **Input Parameters**
+        name: *str*
+            The timer, ignored
+    **Returns**
+        None
+    '''
+    yield
+
+
+# Board and solution caches of the process, used by solve_file
+_board_caches = {}
+_solution_caches = {}
+
+
+def find_files(paths):
+    '''
+    This function collects the .bff files to solve
+
+    **Input Parameters**
+        paths: *list, str*
+            Directories (all their .bff files), glob patterns or files
+    **Returns**
+        files: *list, str*
+            The filenames in the given order, sorted within a directory
+            or a pattern
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.bff')) +
+                                glob.glob(os.path.join(path, '*.bff.gz'))))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path)))
+        else:
+            files.append(path)
+    return files
+
+
+def render_files(filename, kinds=('image',), image_format='png'):
+    '''
+    This function names the files of the render stage, known before
+    they are rendered
+
+    **Input Parameters**
+        filename: *str*
+            The test file
+        kinds: *list, str, optional*
+            The outputs (see RENDER_KINDS): full-size image, thumbnail
+            (<file>_thumb.png) or text grid (<file>.txt)
+        image_format: *str, optional*
+            The image format (png, jpeg, ...)
+    **Returns**
+        files: *list, str*
+            The file of every output
+    '''
+    for kind in kinds:
+        if kind not in RENDER_KINDS:
+            raise ValueError("Unknown render output %r, expected one of %s"
+                             % (kind, ", ".join(RENDER_KINDS)))
+    image_format = image_format.lower()
+    extensions = {'image': "." + image_format,
+                  'thumbnail': "_thumb." + image_format, 'text': ".txt"}
+    return [Visualisation.path(filename, extensions[kind]) for kind in kinds]
+
+
+def render_solution(filename, info, sel_comb, kinds=('image',),
+                    block_size=100, image_format='png', beams=None):
+    '''
+    This function is the render stage: it draws a solution found
+    before, in any process, so that a batch can render the last
+    puzzle while solving the next one (see main)
+
+    **Input Parameters**
+        filename: *str*
+            The test file, the outputs are saved next to it
+        info: *dict*
+            The dataset2 of class Input, at least Size, x_l, Lazers
+            and Points
+        sel_comb: *dict, tuple, str*
+            The solution of class Lazor
+        kinds, image_format:
+            See function render_files
+        block_size: *int, optional*
+            The size of a block in pixels of the full-size image
+        beams: *list, array, int, optional*
+            The lazor paths drawn on the images (SolveResult.beams)
+    **Returns**
+        files: *list, str*
+            The file of every output
+    '''
+    files = render_files(filename, kinds, image_format)
+    for kind, name in zip(kinds, files):
+        if kind == 'text':
+            Visualisation(name, info, sel_comb).save_text()
+        else:
+            size = THUMBNAIL_SIZE if kind == 'thumbnail' else block_size
+            Visualisation(name, info, sel_comb, size, image_format,
+                          beams)()
+    return files
+
+
+def solve_file(filename, mode='brute', workers=1, incremental=False,
+               render=False, block_size=100, image_format='png', cache=None,
+               solutions=None, memo=0, bits=False, profile=False,
+               profile_dump=None, datasets=None, timeout=None,
+               max_candidates=None, enumerate_all=False, limit=None,
+               defer_render=False, checkpoint=None, resume=False,
+               checkpoint_interval=5.0, reachability=False):
+    '''
+    This function solves one .bff file and summarizes the result
+
+    **Input Parameters**
+        filename: *str*
+            The lazor test file
+        mode: *str, optional*
+            The search mode of class Lazor
+        workers: *int, optional*
+            The number of processes of class Lazor
+        incremental: *bool, optional*
+            Use class IncrementalSolution in class Lazor
+        render: *bool or list, str, optional*
+            Save the solution next to the test file, as image (True)
+            or as the outputs of function render_solution
+        block_size: *int, optional*
+            The size of a block in pixels of the image
+        image_format: *str, optional*
+            The image format (png, jpeg, ...)
+        cache: *str, optional*
+            The directory of a BoardCache for the parsed files
+        solutions: *str, optional*
+            The SQLite file of a SolutionCache, kept in memory otherwise
+        memo: *int, optional*
+            The number of lazor paths remembered by class Lazor
+        bits: *bool, optional*
+            Use class BitSolution in class Lazor
+        profile: *bool, optional*
+            Add the counters and timers of class Profiler to the record
+        profile_dump: *str, optional*
+            The directory of a cProfile dump (<file>.pstats) per puzzle
+        datasets: *tuple, dict, optional*
+            The datasets of class Input, already parsed from a level
+            pack; filename then only names the puzzle
+        timeout, max_candidates: *optional*
+            The budget of function solve
+        enumerate_all: *bool, optional*
+            Record every solution (function all_solutions) instead of
+            the first one; the search mode is then not used
+        limit: *int, optional*
+            Stop the enumeration after this number of solutions
+        defer_render: *bool, optional*
+            Leave the rendering to the caller: the record gets the
+            arguments of function render_solution under 'render'
+        checkpoint: *str, optional*
+            The directory of the checkpoints of the searches (see class
+            Checkpoint)
+        resume: *bool, optional*
+            Resume the search saved in the checkpoint directory
+        checkpoint_interval: *float, optional*
+            The time between two checkpoints in seconds
+        reachability: *bool, optional*
+            With enumerate_all, enumerate the 'o' positions no lazor can
+            reach once (see function all_solutions)
+    **Returns**
+        record: *dict*
+            The file, status (solved, unsolvable, exhausted, invalid,
+            or error when the solver fails), placement of all blocks
+            (fixed ones included) as [column, row] of the grid, solve
+            time in seconds, number of candidates tried (see
+            SolveResult.record) and the rendered files (images)
+    '''
+    global PROFILER
+    if not (profile or profile_dump):
+        return _solve_file(filename, mode, workers, incremental, render,
+                           block_size, image_format, cache, solutions, memo,
+                           bits, datasets, timeout, max_candidates,
+                           enumerate_all, limit, defer_render, checkpoint,
+                           resume, checkpoint_interval, reachability)
+    PROFILER = Profiler()
+    profiler = cProfile.Profile() if profile_dump else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        record = _solve_file(filename, mode, workers, incremental, render,
+                             block_size, image_format, cache, solutions,
+                             memo, bits, datasets, timeout, max_candidates,
+                             enumerate_all, limit, defer_render, checkpoint,
+                             resume, checkpoint_interval, reachability)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        stats, PROFILER = PROFILER.stats(), None
+    if profile:
+        record['profile'] = stats
+    if profiler is not None:
+        os.makedirs(profile_dump, exist_ok=True)
+        name = os.path.splitext(os.path.basename(filename))[0]
+        # Read with pstats.Stats(path).sort_stats('cumulative')
+        profiler.dump_stats(os.path.join(profile_dump, name + '.pstats'))
+    return record
+
+
+def _solve_file(filename, mode, workers, incremental, render, block_size,
+                image_format, cache, solutions, memo, bits, datasets,
+                timeout, max_candidates, enumerate_all, limit,
+                defer_render, checkpoint, resume, checkpoint_interval,
+                reachability):
+    '''
+    This function is solve_file without profiling, timing the parse,
+    search and render steps when PROFILER is set
+
+    **Input Parameters**
+        See solve_file
+    **Returns**
+        record: *dict*
+            See solve_file
+    '''
+    timer = PROFILER.timer if PROFILER is not None else _no_timer
+    t0 = time.time()
+    record = {'file': filename, 'status': 'invalid'}
+    try:
+        with timer('parse'):
+            if datasets is not None:
+                dataset1, dataset2 = datasets
+            elif cache is None:
+                dataset1, dataset2 = Input(filename)()
+            else:
+                # One cache object per process and directory
+                if cache not in _board_caches:
+                    _board_caches[cache] = BoardCache(cache)
+                dataset1, dataset2 = _board_caches[cache].load(filename)
+    except (OSError, ValueError) as error:
+        # PuzzleFormatError or unreadable file
+        record.update(error=str(error), time=time.time() - t0)
+        return record
+    try:
+        if enumerate_all:
+            with timer('search'):
+                record.update(_solutions_record(
+                    (dataset1, dataset2), limit, timeout, max_candidates,
+                    workers, incremental, memo, bits, reachability))
+            record['time'] = time.time() - t0
+            return record
+        # Repeated puzzles of the batch are solved once per process
+        if solutions not in _solution_caches:
+            _solution_caches[solutions] = SolutionCache(solutions)
+        if checkpoint is not None:
+            checkpoint = Checkpoint(checkpoint, checkpoint_interval, resume)
+        with timer('search'):
+            result = solve((dataset1, dataset2), timeout, max_candidates,
+                           mode, workers, incremental,
+                           _solution_caches[solutions], memo, bits,
+                           beams=bool(render), checkpoint=checkpoint)
+    except Exception as error:
+        # A puzzle the solver fails on is reported, the batch goes on
+        logger.exception("Failed to solve %s", filename)
+        record.update(status='error', error=repr(error),
+                      time=time.time() - t0)
+        return record
+    record.update(result.record())
+    record['time'] = time.time() - t0
+    if PROFILER is not None:
+        PROFILER.counters['candidates'] = result.stats['candidates']
+        PROFILER.counters['nodes'] = result.stats['nodes']
+    if render and result.sel_comb is not None:
+        kinds = ('image',) if render is True else tuple(render)
+        info = {key: dataset2[key] for key in ('Size', 'x_l', 'Lazers',
+                                                'Points')}
+        job = (filename, info, result.sel_comb, kinds, block_size,
+               image_format, result.beams)
+        record['images'] = render_files(filename, kinds, image_format)
+        if defer_render:
+            record['render'] = job
+        else:
+            with timer('render'):
+                render_solution(*job)
+    return record
+
+
+def find_puzzles(files, pack=False):
+    '''
+    This function lists the puzzles to solve, streaming the level packs
+    one puzzle at a time
+
+    **Input Parameters**
+        files: *list, str*
+            The files of function find_files
+        pack: *bool, optional*
+            Read every file as a level pack (see Input.puzzles); gzip
+            files always are
+    **Returns**
+        puzzles: *generator, tuple*
+            The filename, and the puzzle number, datasets and error of
+            Input.puzzles, or None for a single puzzle file
+    '''
+    for filename in files:
+        if pack or filename.lower().endswith('.gz'):
+            for puzzle in Input(filename).puzzles():
+                yield (filename,) + puzzle
+        else:
+            yield filename, None, None, None
+
+
+def solve_puzzle(puzzle, **options):
+    '''
+    This function solves one puzzle of function find_puzzles
+
+    **Input Parameters**
+        puzzle: *tuple*
+            The filename, puzzle number, datasets and error
+        options: *dict*
+            The keyword arguments of function solve_file
+    **Returns**
+        record: *dict*
+            The record of function solve_file, with the puzzle number
+            of a level pack
+    '''
+    filename, index, datasets, error = puzzle
+    if index is None:
+        return solve_file(filename, **options)
+    if error is not None:
+        return {'file': filename, 'puzzle': index, 'status': 'invalid',
+                'error': error}
+    # Name of the images and profile dumps of the puzzle
+    stem = filename[:-3] if filename.lower().endswith('.gz') else filename
+    stem = os.path.splitext(stem)[0]
+    record = {'file': filename, 'puzzle': index}
+    result = solve_file("%s_%d.bff" % (stem, index), datasets=datasets,
+                        **options)
+    del result['file']
+    record.update(result)
+    return record
+
+
+def _imap_unordered(pool, function, items, limit):
+    '''
+    This function maps a function over items in a process pool, with
+    at most limit items submitted at once, so that a level pack is not
+    read ahead of the workers
+
+    **Input Parameters**
+        pool: *ProcessPoolExecutor*
+            The process pool
+        function: *callable*
+            The function to run, picklable
+        items: *iterable*
+            The arguments of function
+        limit: *int*
+            The number of items running or waiting
+    **Returns**
+        results: *generator*
+            The results in order of completion
+    '''
+    pending = set()
+    for item in items:
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(pool.submit(function, item))
+    for future in as_completed(pending):
+        yield future.result()
+
+
+def _render_done(future):
+    '''
+    This function reports the failures of the render stage of main
+
+    **Input Parameters**
+        future: *Future*
+            The render_solution call
+    **Returns**
+        None
+    '''
+    if future.exception() is not None:
+        logger.warning("Rendering failed: %s", future.exception())
+
+
+def main(argv=None):
+    '''
+    This function is the command line interface solving a batch of
+    .bff files and level packs, one puzzle per process, and writing one
+    JSON line per puzzle
+
+    **Input Parameters**
+        argv: *list, str, optional*
+            The command line arguments, sys.argv by default
+    **Returns**
+        None
+    '''
+    parser = argparse.ArgumentParser(
+        description="Solve lazor puzzles given as .bff files")
+    parser.add_argument('paths', nargs='*', default=['.'],
+                        help="directories, glob patterns or .bff files")
+    parser.add_argument('-o', '--output',
+                        help="JSON lines file, stdout by default")
+    parser.add_argument('--pack', action='store_true',
+                        help="read every file as a level pack of several "
+                             "puzzles (.gz files always are)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="puzzles solved at once, one per CPU core "
+                             "by default")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="processes sharing one brute-force search")
+    parser.add_argument('-m', '--mode',
+                        choices=('brute', 'prune', 'constraint'),
+                        default='brute', help="search mode")
+    parser.add_argument('--incremental', action='store_true',
+                        help="reuse lazor paths between brute-force "
+                             "candidates, about twice as fast from 11x11 "
+                             "grids up")
+    parser.add_argument('--cache', metavar='DIR',
+                        help="keep compiled boards in DIR to skip parsing "
+                             "the same files again")
+    parser.add_argument('--solutions', metavar='FILE',
+                        help="keep the solutions in the SQLite database FILE "
+                             "to answer the same puzzles again")
+    parser.add_argument('--memo', type=int, default=0, metavar='N',
+                        help="remember N lazor paths between brute-force "
+                             "candidates and report the hit rate")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="log the 'o' positions left out of the search")
+    parser.add_argument('--bits', action='store_true',
+                        help="test the brute-force candidates with integer "
+                             "bitmasks instead of block arrays")
+    parser.add_argument('--profile', action='store_true',
+                        help="add counters (candidates, lazor steps, "
+                             "reflections) and parse/search/render times "
+                             "to every record")
+    parser.add_argument('--profile-dump', metavar='DIR',
+                        help="save a cProfile dump DIR/<file>.pstats per "
+                             "puzzle")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help="give up a puzzle after SECONDS of search "
+                             "(status exhausted)")
+    parser.add_argument('--max-candidates', type=int, metavar='N',
+                        help="give up a puzzle after N candidates or "
+                             "search nodes (status exhausted)")
+    parser.add_argument('--checkpoint', metavar='DIR',
+                        help="save the progress of every search to DIR "
+                             "now and then, to resume it after a stop")
+    parser.add_argument('--checkpoint-interval', type=float, default=5.0,
+                        metavar='SECONDS',
+                        help="time between two checkpoints")
+    parser.add_argument('--resume', action='store_true',
+                        help="go on with the searches saved in the "
+                             "--checkpoint DIR instead of starting over")
+    parser.add_argument('--all', action='store_true', dest='enumerate_all',
+                        help="record every solution and their count, to "
+                             "check that a level has exactly one")
+    parser.add_argument('--limit', type=int, metavar='N',
+                        help="with --all, stop after N solutions (2 is "
+                             "enough to tell a unique solution)")
+    parser.add_argument('--merge-fillers', action='store_true',
+                        dest='reachability',
+                        help="with --all, count the solutions differing "
+                             "only in 'o' positions no lazor can reach "
+                             "once")
+    parser.add_argument('--render', action='append_const', const='image',
+                        help="save every solution as image file")
+    parser.add_argument('--thumbnail', action='append_const',
+                        const='thumbnail', dest='render',
+                        help="save every solution as small image "
+                             "<file>_thumb.png")
+    parser.add_argument('--text', action='append_const', const='text',
+                        dest='render',
+                        help="save every solution as text grid <file>.txt")
+    parser.add_argument('--render-jobs', type=int, default=1, metavar='N',
+                        help="processes rendering the solutions while the "
+                             "next puzzles are solved, 0 to render in the "
+                             "solving process")
+    parser.add_argument('--block-size', type=int, default=100,
+                        help="size of a block in pixels of the images")
+    parser.add_argument('--format', default='png', dest='image_format',
+                        help="image format (png, jpeg, gif, bmp, webp)")
+    args = parser.parse_args(argv)
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint DIR")
+    logging.basicConfig(format="%(message)s", level=logging.INFO
+                        if args.verbose else logging.WARNING)
+
+    puzzles = find_puzzles(find_files(args.paths), args.pack)
+    jobs = args.jobs or os.cpu_count() or 1
+    output = open(args.output, 'w') if args.output else sys.stdout
+    # Kinds of output asked for, once each, None to skip rendering
+    render = list(dict.fromkeys(args.render)) if args.render else None
+    renderer = None
+    if render and args.render_jobs > 0:
+        renderer = ProcessPoolExecutor(args.render_jobs)
+    solve = partial(solve_puzzle, mode=args.mode, workers=args.workers,
+                    incremental=args.incremental, render=render,
+                    block_size=args.block_size,
+                    image_format=args.image_format, cache=args.cache,
+                    solutions=args.solutions, memo=args.memo,
+                    bits=args.bits, profile=args.profile,
+                    profile_dump=args.profile_dump, timeout=args.timeout,
+                    max_candidates=args.max_candidates,
+                    enumerate_all=args.enumerate_all, limit=args.limit,
+                    defer_render=renderer is not None,
+                    checkpoint=args.checkpoint, resume=args.resume,
+                    checkpoint_interval=args.checkpoint_interval,
+                    reachability=args.reachability)
+    # Bound before the try: the finally must not fail on a pool that
+    # could not be started
+    pool = None
+    try:
+        if jobs == 1:
+            records = map(solve, puzzles)
+        else:
+            pool = ProcessPoolExecutor(jobs)
+            records = _imap_unordered(pool, solve, puzzles, 2 * jobs)
+        for record in records:
+            job = record.pop('render', None)
+            if job is not None:
+                # Rendered off the critical path, while the next
+                # puzzles are solved
+                future = renderer.submit(render_solution, *job)
+                future.add_done_callback(_render_done)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if renderer is not None:
+            # Waits for the last images
+            renderer.shutdown()
+        if output is not sys.stdout:
+            output.close()
+
+
 if __name__ == "__main__":
-    filename = ["yarn_5.bff", "tiny_5.bff", "numbered_6.bff",
-                "mad_1.bff", "mad_7.bff", "mad_4.bff", "dark_1.bff"]
-    times = []
-    # For loop for to run all the files at once
-    for item in filename:
-        # filename = "mad_7.bff"
-        # initializing times
-        t0 = time.time()
-        file = Input(item)
-        dataset1, dataset2 = file()
-        comb = Lazor(dataset1, dataset2)
-        sel_comb = comb()
-        result = Visualisation(item, dataset2, sel_comb)
-        result()
-        # Time for each case
-        t1 = time.time()
-        time1 = t1 - t0
-        times.append(time1)
-    # crosschecking time
-    print(times)
+    main()
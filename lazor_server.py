@@ -0,0 +1,613 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Solve service keeping a warm pool of solver processes.
+Puzzles are posted as .bff text over localhost HTTP or a Unix socket
+(the same HTTP protocol on both), and one JSON line per puzzle is
+streamed back as soon as it is solved:
+
+    python3 lazor_server.py serve --port 8765 --unix /tmp/lazor.sock
+    python3 lazor_server.py client testfiles/*.bff --port 8765
+    curl --data-binary @testfiles/mad_1.bff 'localhost:8765/solve?timeout=5'
+
+- POST /solve?mode=prune&timeout=5 takes one or several puzzles (a
+  level pack) and answers with chunked application/x-ndjson
+- GET /stats gives the counters of the server
+- Identical puzzles asked at the same time are solved once
+- Puzzles wait in a bounded queue; when it is full they are answered
+  with the status 'busy' (HTTP 503 if no puzzle of the request fits)
+'''
+# Import packages
+from lazer_final import Input, PuzzleFormatError, SolutionCache, solve
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import sys
+
+# Options of function solve a request may set, with their types
+OPTIONS = {'mode': str, 'timeout': float, 'max_candidates': int,
+           'memo': int}
+MODES = ('brute', 'prune', 'constraint')
+# Largest request body in bytes
+MAX_BODY = 16 * 2 ** 20
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 411: 'Length Required',
+           413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+# Solution cache of a solver process, for puzzles asked again later
+_cache = None
+
+
+def _warm():
+    '''
+    This function starts a solver process of the pool, importing the
+    solver before the first request
+
+    **Input Parameters**
+        None
+    **Returns**
+        pid: *int*
+            The process id
+    '''
+    return os.getpid()
+
+
+def _solve_lines(lines, options):
+    '''
+    This function solves one puzzle in a solver process
+
+    **Input Parameters**
+        lines: *list, str*
+            The lines of the .bff puzzle
+        options: *dict*
+            The keyword arguments of function solve
+    **Returns**
+        record: *dict*
+            The record of SolveResult.record, or the status 'invalid'
+            and the error of a malformed puzzle
+    '''
+    global _cache
+    if _cache is None:
+        _cache = SolutionCache()
+    try:
+        datasets = Input('request.bff').parse(lines)
+    except PuzzleFormatError as error:
+        return {'status': 'invalid', 'error': str(error)}
+    return solve(datasets, cache=_cache, **options).record()
+
+
+class HTTPError(Exception):
+    '''
+    This class is an HTTP error answered to the client
+    '''
+
+    def __init__(self, status, message):
+        '''
+        The __init__ method will initialize the status and message
+
+        **Input Parameters**
+            status: *int*
+                The HTTP status code
+            message: *str*
+                The error sent back as JSON
+        **Returns**
+            None
+        '''
+        super().__init__(message)
+        self.status = status
+
+
+class SolveServer:
+    '''
+    This class is the asyncio solve service
+    - A pool of solver processes is started and warmed up once
+    - Every puzzle goes through a bounded queue to one consumer task per
+      process, which runs it in the pool
+    - A puzzle already queued or running is not queued again: later
+      requests wait for the same result (request coalescing)
+    '''
+
+    def __init__(self, workers=None, queue_size=64, timeout=None):
+        '''
+        The __init__ method will initialize the settings of the server
+
+        **Input Parameters**
+            workers: *int, optional*
+                The number of solver processes, one per CPU core by
+                default
+            queue_size: *int, optional*
+                The number of puzzles waiting for a process
+            timeout: *float, optional*
+                The default time budget of a puzzle in seconds
+        **Returns**
+            None
+        '''
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.pool = None
+        self.queue = None
+        self.consumers = []
+        self.servers = []
+        self.unix = None
+        # Future of every puzzle queued or running, by key
+        self.running = {}
+        self.stats = dict.fromkeys(
+            ('requests', 'puzzles', 'solved', 'coalesced', 'rejected'), 0)
+
+    async def start(self, host='127.0.0.1', port=None, unix=None):
+        '''
+        This function starts the pool, the consumers and the listeners
+
+        **Input Parameters**
+            host: *str, optional*
+                The address of the HTTP listener
+            port: *int, optional*
+                The port of the HTTP listener, None for none
+            unix: *str, optional*
+                The path of the Unix socket, None for none
+        **Returns**
+            None
+        '''
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(self.workers)
+        # Start every process now rather than on the first requests
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm)
+                               for _ in range(self.workers)))
+        self.queue = asyncio.Queue(self.queue_size)
+        self.consumers = [asyncio.create_task(self.consume())
+                          for _ in range(self.workers)]
+        if port is not None:
+            self.servers.append(
+                await asyncio.start_server(self.handle, host, port))
+        if unix is not None:
+            self.servers.append(
+                await asyncio.start_unix_server(self.handle, unix))
+            self.unix = unix
+
+    async def close(self):
+        '''
+        This function stops the listeners, the consumers and the pool
+
+        **Input Parameters**
+            None
+        **Returns**
+            None
+        '''
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        for task in self.consumers:
+            task.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.unix is not None and os.path.exists(self.unix):
+            os.unlink(self.unix)
+
+    def key(self, lines, options):
+        '''
+        This function gives the key of a puzzle for request coalescing,
+        ignoring comments and blank lines
+
+        **Input Parameters**
+            lines: *list, str*
+                The lines of the puzzle
+            options: *dict*
+                The options of function solve
+        **Returns**
+            key: *str*
+                The SHA-256 hash of the puzzle and options
+        '''
+        content = [line.split() for line in lines
+                   if line.strip() and not line.startswith('#')]
+        text = json.dumps([content, sorted(options.items())])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def submit(self, lines, options):
+        '''
+        This function queues a puzzle, or joins the same puzzle already
+        queued or running
+
+        **Input Parameters**
+            lines: *list, str*
+                The lines of the puzzle
+            options: *dict*
+                The options of function solve
+        **Returns**
+            future: *asyncio.Future*
+                The record of the puzzle, None when the queue is full
+        '''
+        self.stats['puzzles'] += 1
+        key = self.key(lines, options)
+        future = self.running.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return future
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((key, lines, options, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            return None
+        self.running[key] = future
+        return future
+
+    async def consume(self):
+        '''
+        This function runs the queued puzzles in the pool, one at a time
+
+        **Input Parameters**
+            None
+        **Returns**
+            None
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            key, lines, options, future = await self.queue.get()
+            try:
+                record = await loop.run_in_executor(
+                    self.pool, _solve_lines, lines, options)
+                self.stats['solved'] += 1
+            except Exception as error:
+                # A crashed process, answered like any other result
+                record = {'status': 'error', 'error': repr(error)}
+            finally:
+                del self.running[key]
+                self.queue.task_done()
+            future.set_result(record)
+
+    def options(self, query):
+        '''
+        This function converts the query string of a request into the
+        options of function solve
+
+        **Input Parameters**
+            query: *str*
+                The query string, as mode=prune&timeout=5
+        **Returns**
+            options: *dict*
+                The keyword arguments of function solve
+        '''
+        options = {'timeout': self.timeout}
+        for name, value in parse_qsl(query):
+            if name not in OPTIONS:
+                raise HTTPError(400, "Unknown option %r" % name)
+            try:
+                options[name] = OPTIONS[name](value)
+            except ValueError:
+                raise HTTPError(400, "Invalid value of %s" % name)
+        if options.get('mode', 'brute') not in MODES:
+            raise HTTPError(400, "Unknown search mode %r" % options['mode'])
+        return options
+
+    async def handle(self, reader, writer):
+        '''
+        This function answers one HTTP request, on TCP or Unix socket
+
+        **Input Parameters**
+            reader, writer: *asyncio.StreamReader, StreamWriter*
+                The connection of the client
+        **Returns**
+            None
+        '''
+        self.stats['requests'] += 1
+        try:
+            method, path, query, body = await read_request(reader)
+            if path == '/stats':
+                stats = dict(self.stats, queued=self.queue.qsize(),
+                             running=len(self.running),
+                             workers=self.workers)
+                await respond(writer, 200, stats)
+            elif path != '/solve':
+                raise HTTPError(404, "Unknown path %s" % path)
+            elif method != 'POST':
+                raise HTTPError(405, "POST the .bff text to /solve")
+            else:
+                await self.solve(writer, self.options(query), body)
+        except HTTPError as error:
+            await respond(writer, error.status, {'error': str(error)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The client went away
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def solve(self, writer, options, body):
+        '''
+        This function queues the puzzles of a request and streams their
+        records back in the order they are solved
+
+        **Input Parameters**
+            writer: *asyncio.StreamWriter*
+                The connection of the client
+            options: *dict*
+                The options of function solve
+            body: *bytes*
+                The .bff text, one or several puzzles
+        **Returns**
+            None
+        '''
+        puzzles = list(Input.split(body.decode('utf-8', 'replace')
+                                   .splitlines()))
+        if not puzzles:
+            raise HTTPError(400, "No grid start or stop indicated")
+        futures = {}
+        records = []
+        for index, (start, lines) in enumerate(puzzles, 1):
+            future = self.submit(lines, options)
+            if future is None:
+                records.append({'puzzle': index, 'status': 'busy'})
+            else:
+                futures[index] = future
+        if not futures:
+            raise HTTPError(503, "Queue full, retry later")
+
+        async def tagged(index, future):
+            # Shielded: a client leaving must not cancel the result
+            # other requests wait for
+            return index, await asyncio.shield(future)
+
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n"
+                     b"Connection: close\r\n\r\n")
+        for record in records:
+            await write_chunk(writer, record)
+        for task in asyncio.as_completed([tagged(*i)
+                                          for i in futures.items()]):
+            index, record = await task
+            await write_chunk(writer, dict({'puzzle': index}, **record))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def read_request(reader):
+    '''
+    This function reads an HTTP request
+
+    **Input Parameters**
+        reader: *asyncio.StreamReader*
+            The connection of the client
+    **Returns**
+        method, path, query: *str*
+            The method, path and query string of the request
+        body: *bytes*
+            The body of the request
+    '''
+    try:
+        method, target, _ = (await reader.readline()).decode(
+            'latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "Invalid request line")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    body = b''
+    if method == 'POST':
+        if 'content-length' not in headers:
+            raise HTTPError(411, "Content-Length required")
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413, "Body above %d bytes" % MAX_BODY)
+        body = await reader.readexactly(length)
+    return method, url.path, url.query, body
+
+
+async def respond(writer, status, content):
+    '''
+    This function sends a complete JSON response
+
+    **Input Parameters**
+        writer: *asyncio.StreamWriter*
+            The connection of the client
+        status: *int*
+            The HTTP status code
+        content: *dict*
+            The JSON content
+    **Returns**
+        None
+    '''
+    data = json.dumps(content).encode() + b"\n"
+    head = ("HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n"
+            "Content-Length: %d\r\nConnection: close\r\n"
+            % (status, REASONS[status], len(data)))
+    if status == 503:
+        head += "Retry-After: 1\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    await writer.drain()
+
+
+async def write_chunk(writer, record):
+    '''
+    This function sends one JSON line as a chunk of the response
+
+    **Input Parameters**
+        writer: *asyncio.StreamWriter*
+            The connection of the client
+        record: *dict*
+            The record of a puzzle
+    **Returns**
+        None
+    '''
+    data = json.dumps(record).encode() + b"\n"
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+    await writer.drain()
+
+
+async def request(text, host='127.0.0.1', port=None, unix=None,
+                  **options):
+    '''
+    This function is the local client: it posts .bff text to the
+    server and yields the records as they arrive
+
+    **Input Parameters**
+        text: *str*
+            One or several .bff puzzles
+        host, port: *optional*
+            The HTTP listener of the server
+        unix: *str, optional*
+            The Unix socket of the server, used instead of host and port
+        options: *dict*
+            The options of the request (mode, timeout, max_candidates,
+            memo)
+    **Returns**
+        records: *async generator, dict*
+            The record of every puzzle, in the order they are solved
+    '''
+    if unix is not None:
+        reader, writer = await asyncio.open_unix_connection(unix)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = text.encode()
+        query = '&'.join('%s=%s' % i for i in sorted(options.items())
+                         if i[1] is not None)
+        writer.write(("POST /solve%s HTTP/1.1\r\nHost: %s\r\n"
+                      "Content-Length: %d\r\nConnection: close\r\n\r\n"
+                      % ('?' + query if query else '', host, len(body))
+                      ).encode() + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding') != 'chunked':
+            content = json.loads(await reader.read())
+            yield dict(content, status='busy' if status == 503 else
+                       'error', http_status=status)
+            return
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if not size:
+                break
+            data = await reader.readexactly(size + 2)
+            yield json.loads(data)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def solve_remote(text, **options):
+    '''
+    This function is the blocking form of function request
+
+    **Input Parameters**
+        text: *str*
+            One or several .bff puzzles
+        options: *dict*
+            The keyword arguments of function request
+    **Returns**
+        records: *list, dict*
+            The record of every puzzle, in the order they are solved
+    '''
+    async def collect():
+        return [record async for record in request(text, **options)]
+    return asyncio.run(collect())
+
+
+async def serve(host, port, unix, workers, queue_size, timeout):
+    '''
+    This function runs the server until it is interrupted
+
+    **Input Parameters**
+        See SolveServer and SolveServer.start
+    **Returns**
+        None
+    '''
+    server = SolveServer(workers, queue_size, timeout)
+    await server.start(host, port, unix)
+    print("Serving %d solver processes on %s" % (
+        server.workers, ', '.join(filter(None, (
+            port is not None and "http://%s:%d" % (host, port),
+            unix)))), file=sys.stderr)
+    # Stop cleanly on Ctrl-C and on kill
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    '''
+    This function is the command line interface of the server and of
+    the local client
+
+    **Input Parameters**
+        argv: *list, str, optional*
+            The command line arguments, sys.argv by default
+    **Returns**
+        None
+    '''
+    parser = argparse.ArgumentParser(
+        description="Lazor solve service and its local client")
+    commands = parser.add_subparsers(dest='command', required=True)
+    server = commands.add_parser('serve', help="run the server")
+    client = commands.add_parser('client', help="solve .bff files")
+    for command in (server, client):
+        command.add_argument('--host', default='127.0.0.1',
+                             help="address of the HTTP listener")
+        command.add_argument('--port', type=int,
+                             help="port of the HTTP listener")
+        command.add_argument('--unix', metavar='PATH',
+                             help="path of the Unix socket")
+    server.add_argument('-w', '--workers', type=int, default=None,
+                        help="solver processes, one per CPU core by "
+                             "default")
+    server.add_argument('--queue-size', type=int, default=64,
+                        help="puzzles waiting for a solver process")
+    server.add_argument('--timeout', type=float,
+                        help="default time budget of a puzzle in seconds")
+    client.add_argument('files', nargs='+',
+                        help=".bff files, one or several puzzles each")
+    client.add_argument('-m', '--mode', choices=MODES)
+    client.add_argument('--timeout', type=float)
+    client.add_argument('--max-candidates', type=int)
+    args = parser.parse_args(argv)
+    if args.port is None and args.unix is None:
+        parser.error("give --port, --unix or both")
+
+    if args.command == 'serve':
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers,
+                          args.queue_size, args.timeout))
+        return
+    for filename in args.files:
+        with open(filename) as file:
+            text = file.read()
+        for record in solve_remote(
+                text, host=args.host, port=args.port, unix=args.unix,
+                mode=args.mode, timeout=args.timeout,
+                max_candidates=args.max_candidates):
+            print(json.dumps(dict({'file': filename}, **record)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+The tests import the solver from the repository root.
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
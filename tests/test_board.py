@@ -0,0 +1,140 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of class Board: the POI walls used to reject candidates early
+must never reject a layout the lazor trace solves.
+'''
+from itertools import product
+import random
+
+from lazer_final import (Input, Board, Placements, Solution, BitSolution,
+                         count_solutions, solve, BLOCK_A, BLOCK_B, BLOCK_C)
+
+# A lazor starting next to the A block reflects into the cell behind it
+BEHIND = '''
+GRID START
+o o
+o o
+GRID STOP
+A 1
+B 2
+L 2 1 1 1
+P 1 2
+'''
+# The reflected lazor bounces twice within the B block behind it
+BOUNCES = '''
+GRID START
+o x
+o o
+GRID STOP
+A 1
+B 1
+C 1
+L 2 3 1 -1
+L 4 3 -1 -1
+P 0 3
+P 2 1
+'''
+
+
+def _puzzle(text):
+    return Input('test.bff').parse(text.strip().splitlines())
+
+
+def _layouts(board):
+    for a_comb, b_comb, c_comb in Placements(
+            board.open_cells, board.counts['A'], board.counts['B'],
+            board.counts['C']):
+        layout = bytearray(board.blocks)
+        for cells, code in ((a_comb, BLOCK_A), (b_comb, BLOCK_B),
+                            (c_comb, BLOCK_C)):
+            for cell in cells:
+                layout[cell] = code
+        yield layout
+
+
+def _oracle(puzzle):
+    '''The number of layouts solved by the trace alone'''
+    board = Board(*puzzle)
+    board.walls = []
+    return sum(1 for layout in _layouts(board) if Solution(layout, board)())
+
+
+def _random_puzzle(rng):
+    width, height = rng.randint(2, 3), rng.randint(2, 3)
+    grid = [[rng.choice('ooooox') for _ in range(width)]
+            for _ in range(height)]
+    grid[0][0] = 'o'
+    n = sum(row.count('o') for row in grid)
+    A = rng.randint(1, min(2, n))
+    B = rng.randint(0, min(2, n - A))
+    C = rng.randint(0, min(1, n - A - B))
+    lines = ['GRID START'] + [' '.join(row) for row in grid]
+    lines += ['GRID STOP', 'A %d' % A, 'B %d' % B, 'C %d' % C]
+    for _ in range(rng.randint(1, 2)):
+        # On the side of a block, pointing anywhere
+        if rng.random() < 0.5:
+            X = 2 * rng.randint(0, width)
+            Y = 2 * rng.randint(0, height - 1) + 1
+        else:
+            X = 2 * rng.randint(0, width - 1) + 1
+            Y = 2 * rng.randint(0, height)
+        lines.append('L %d %d %d %d' % (X, Y, rng.choice((1, -1)),
+                                        rng.choice((1, -1))))
+    for _ in range(rng.randint(1, 2)):
+        if rng.random() < 0.5:
+            X = 2 * rng.randint(0, width)
+            Y = 2 * rng.randint(0, height - 1) + 1
+        else:
+            X = 2 * rng.randint(0, width - 1) + 1
+            Y = 2 * rng.randint(0, height)
+        lines.append('P %d %d' % (X, Y))
+    return Input('random.bff').parse(lines)
+
+
+def test_lazor_behind_block():
+    puzzle = _puzzle(BEHIND)
+    assert _oracle(puzzle) == 3
+    assert count_solutions(puzzle, reachability=False) == 3
+    board = Board(*puzzle)
+    for layout in _layouts(board):
+        masks = board.masks(layout)
+        assert Solution(layout, board)() == BitSolution(masks, board)()
+
+
+def test_reflections_behind_block():
+    puzzle = _puzzle(BOUNCES)
+    assert _oracle(puzzle) == 1
+    for mode, bits, incremental in product(('brute', 'prune', 'constraint'),
+                                           (False, True), (False, True)):
+        result = solve(puzzle, mode=mode, bits=bits, incremental=incremental)
+        assert result.status == 'solved'
+
+
+def test_random_boards():
+    rng = random.Random(0)
+    for _ in range(150):
+        puzzle = _random_puzzle(rng)
+        expected = _oracle(puzzle)
+        assert count_solutions(puzzle, reachability=False) == expected
+        for mode in ('brute', 'prune', 'constraint'):
+            status = solve(puzzle, mode=mode).status
+            assert (status == 'solved') == (expected > 0)
+
+
+def test_point_outside_lattice():
+    puzzle = _puzzle('''
+GRID START
+o o
+o o
+GRID STOP
+A 1
+L 0 1 1 1
+P 9 9
+''')
+    board = Board(*puzzle)
+    assert board.walls == [()]
+    for mode, bits in product(('brute', 'prune', 'constraint'),
+                              (False, True)):
+        assert solve(puzzle, mode=mode, bits=bits).status == 'unsolvable'
@@ -0,0 +1,97 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of the budget of a search, serial and parallel.
+'''
+from itertools import islice
+import glob
+import os
+
+import pytest
+
+from lazer_final import (Input, Board, Lazor, Placements, Solution,
+                         SolveResult, count_solutions, solve, BLOCK_A,
+                         BLOCK_B, BLOCK_C)
+
+TESTFILES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles', '*.bff')))
+# The largest testfiles, with a few thousand candidates
+LARGE = [i for i in TESTFILES if os.path.basename(i) in
+         ('mad_4.bff', 'numbered_6.bff', 'dark_1.bff')]
+
+
+@pytest.mark.parametrize('filename', LARGE,
+                         ids=[os.path.basename(i) for i in LARGE])
+@pytest.mark.parametrize('workers', (1, 3, 8))
+def test_budget_above_space(filename, workers):
+    puzzle = Input(filename)()
+    # A budget of the whole space is never used up
+    space = Lazor(*puzzle).stats['brute_force']
+    result = solve(puzzle, workers=workers, max_candidates=space)
+    assert result.status == 'solved'
+    space = Lazor(*puzzle, reachability=False).stats['brute_force']
+    stats = {}
+    assert count_solutions(puzzle, workers=workers, max_candidates=space,
+                           stats=stats) >= 1
+    assert stats['candidates'] == space
+
+
+@pytest.mark.parametrize('workers', (1, 3))
+def test_budget_used_up(workers):
+    filename = [i for i in LARGE if i.endswith('numbered_6.bff')][0]
+    result = solve(filename, workers=workers, max_candidates=2000)
+    assert result.status == 'exhausted'
+    # Candidates are charged as they are tested, 1024 at a time
+    assert 2000 - 1024 * workers < result.stats['candidates']
+    assert result.stats['candidates'] <= 2000 + 1024 * workers
+
+
+def _best(filename, candidates):
+    '''The first of the candidates intersecting the most POIs'''
+    puzzle = Input(filename)()
+    board = Board(*puzzle)
+    counts = board.counts
+    best, best_hits = None, -1
+    for combs in islice(Placements(board.open_cells, counts['A'],
+                                   counts['B'], counts['C']), candidates):
+        layout = bytearray(board.blocks)
+        for cells, code in zip(combs, (BLOCK_A, BLOCK_B, BLOCK_C)):
+            for cell in cells:
+                layout[cell] = code
+        solution = Solution(layout, board)
+        solution()
+        hits = len(set(board.points)) - len(solution.points)
+        if hits > best_hits:
+            best, best_hits = layout, hits
+    return (SolveResult.grid_placement(board.sel_comb(best),
+                                       puzzle[0]['Size'][1]), best_hits)
+
+
+@pytest.mark.parametrize('options', ({}, {'bits': True},
+                                     {'incremental': True}, {'memo': 100}),
+                         ids=('layout', 'bits', 'incremental', 'memo'))
+def test_best_partial(options):
+    filename = [i for i in TESTFILES if i.endswith('mad_7.bff')][0]
+    result = solve(filename, max_candidates=500, reachability=False,
+                   **options)
+    assert result.status == 'exhausted'
+    record = result.record()
+    assert (record['partial'], record['hits']) == _best(
+        filename, result.stats['candidates'])
+    assert 0 < record['hits'] < record['targets'] == 5
+
+
+@pytest.mark.parametrize('mode', ('brute', 'prune', 'constraint'))
+@pytest.mark.parametrize('workers', (1, 3))
+def test_partial_modes(mode, workers):
+    # The blocks placed so far outside the brute force
+    filename = [i for i in TESTFILES if i.endswith('mad_7.bff')][0]
+    counts = Input(filename)()[0]
+    result = solve(filename, mode=mode, workers=workers,
+                   max_candidates=20)
+    assert result.status == 'exhausted'
+    assert result.placement is None
+    assert 0 < result.hits < result.targets
+    for name in 'ABC':
+        assert len(result.partial[name]) <= counts[name]
@@ -0,0 +1,165 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of the caches of compiled boards and of solutions.
+'''
+import os
+import shutil
+from collections import OrderedDict
+
+import pytest
+
+import lazer_final
+from lazer_final import Input, Board, BoardCache, Lazor, SolutionCache
+
+TESTFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles')
+NAMES = sorted(os.listdir(TESTFILES))
+
+
+def _entries(directory, suffix='.lzb'):
+    return [name for name in os.listdir(directory) if name.endswith(suffix)]
+
+
+@pytest.mark.parametrize('name', NAMES)
+def test_board_round_trip(tmp_path, name):
+    filename = os.path.join(TESTFILES, name)
+    cache = BoardCache(str(tmp_path))
+    assert cache.load(filename) == Input(filename)()
+    assert cache.stats == {'hits': 0, 'misses': 1}
+    # A new process reads the entry back
+    cache = BoardCache(str(tmp_path))
+    assert cache.load(filename) == Input(filename)()
+    assert cache.stats == {'hits': 1, 'misses': 0}
+
+
+def test_board_changed_file(tmp_path):
+    filename = str(tmp_path / 'level.bff')
+    shutil.copy(os.path.join(TESTFILES, 'mad_1.bff'), filename)
+    cache = BoardCache(str(tmp_path / 'cache'))
+    cache.load(filename)
+    with open(filename, 'a') as file:
+        file.write('\n# Edited\n')
+    cache.load(filename)
+    assert cache.stats == {'hits': 0, 'misses': 2}
+    assert len(_entries(cache.directory)) == 2
+
+
+def test_board_damaged_entry(tmp_path):
+    filename = os.path.join(TESTFILES, 'dark_1.bff')
+    cache = BoardCache(str(tmp_path))
+    cache.load(filename)
+    path = os.path.join(cache.directory, _entries(cache.directory)[0])
+    with open(path, 'rb') as file:
+        data = file.read()
+    # Truncated, then written by another version
+    for damaged in (data[:len(data) // 2],
+                    data[:3] + bytes([BoardCache.VERSION + 1]) + data[4:]):
+        with open(path, 'wb') as file:
+            file.write(damaged)
+        assert cache.load(filename) == Input(filename)()
+    assert cache.stats == {'hits': 0, 'misses': 3}
+
+
+def test_board_tables(tmp_path, monkeypatch):
+    filename = os.path.join(TESTFILES, 'mad_7.bff')
+    datasets = Input(filename)()
+    key = tuple(datasets[0]['Size'])
+    monkeypatch.setattr(lazer_final, 'LOOKUPS', OrderedDict())
+    BoardCache(str(tmp_path)).load(filename)
+    assert _entries(str(tmp_path), '.lzt') == ['lookup-%dx%d.lzt' % key]
+    # Tables read from the disk, as the board computes them
+    monkeypatch.setattr(lazer_final, 'LOOKUPS', OrderedDict())
+    with monkeypatch.context() as patch:
+        patch.setattr(Board, 'lookup', None)
+        BoardCache(str(tmp_path)).load(filename)
+    tables = lazer_final.LOOKUPS[key]
+    assert tables == Board(*datasets).lookup()
+
+
+def test_board_eviction(tmp_path):
+    cache = BoardCache(str(tmp_path), max_bytes=400)
+    for name in NAMES:
+        cache.load(os.path.join(TESTFILES, name))
+    sizes = [entry.stat().st_size for entry in os.scandir(str(tmp_path))]
+    assert sum(sizes) <= 400
+    assert len(sizes) < 2 * len(NAMES)
+
+
+def _board(name, reverse=False):
+    with open(os.path.join(TESTFILES, name)) as file:
+        lines = file.read().splitlines()
+    if reverse:
+        # The lazors and POIs listed the other way round
+        fixed = [line for line in lines if line[:2] not in ('L ', 'P ')]
+        lines = fixed + [line for line in reversed(lines)
+                         if line[:2] in ('L ', 'P ')]
+    return Board(*Input(name).parse(lines))
+
+
+def test_solution_key():
+    cache = SolutionCache()
+    board = _board('numbered_6.bff')
+    assert cache.key(board) == cache.key(_board('numbered_6.bff', True))
+    assert cache.key(board) != cache.key(_board('yarn_5.bff'))
+
+
+def test_solution_round_trip():
+    filename = os.path.join(TESTFILES, 'mad_1.bff')
+    cache = SolutionCache()
+    first = Lazor(*Input(filename)(), cache=cache)()
+    assert cache.stats == {'hits': 0, 'misses': 1, 'rejected': 0}
+    assert Lazor(*Input(filename)(), cache=cache)() == first
+    assert cache.stats == {'hits': 1, 'misses': 1, 'rejected': 0}
+
+
+def test_solution_unsolvable():
+    cache = SolutionCache()
+    cache.put('key', None)
+    assert cache.get('key', None) == (True, None)
+
+
+def test_solution_eviction():
+    cache = SolutionCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, None)
+    # 'a' used last, 'b' is dropped for 'c'
+    cache.get('a', None)
+    cache.put('c', None)
+    assert list(cache.memory) == ['a', 'c']
+    assert cache.get('b', None) == (False, None)
+
+
+def test_solution_database_eviction(tmp_path):
+    path = str(tmp_path / 'solutions.db')
+    cache = SolutionCache(path, max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, None)
+    # Read back from the database by another process
+    cache = SolutionCache(path, max_entries=2)
+    assert cache.get('a', None) == (True, None)
+    cache.put('c', None)
+    cache = SolutionCache(path, max_entries=2)
+    found = [key for key in 'abc' if cache.get(key, None)[0]]
+    assert found == ['a', 'c']
+
+
+def test_solution_stale(tmp_path):
+    filename = os.path.join(TESTFILES, 'mad_1.bff')
+    board = Board(*Input(filename)())
+    sel_comb = Lazor(*Input(filename)())()
+    path = str(tmp_path / 'solutions.db')
+    cache = SolutionCache(path)
+    key = cache.key(board)
+    # The A and C blocks swapped no longer solve the puzzle
+    swapped = {cell: 'A' if name == 'C' else 'C'
+               for cell, name in sel_comb.items()}
+    cache.put(key, swapped)
+    assert cache.get(key, board) == (False, None)
+    assert cache.stats == {'hits': 0, 'misses': 1, 'rejected': 1}
+    # Forgotten in memory and in the database
+    assert key not in cache.memory
+    assert SolutionCache(path).get(key, board) == (False, None)
+    cache.put(key, sel_comb)
+    assert cache.get(key, board) == (True, sel_comb)
@@ -0,0 +1,82 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of class Checkpoint: searches stopped by a small budget are
+resumed until solved, and give the answer of an uninterrupted search.
+'''
+import json
+import os
+
+import pytest
+
+from lazer_final import Checkpoint, solve
+
+TESTFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles')
+PUZZLE = os.path.join(TESTFILES, 'numbered_6.bff')
+
+
+def _saved(directory):
+    names = os.listdir(directory)
+    assert len(names) <= 1
+    if not names:
+        return None
+    with open(os.path.join(directory, names[0])) as file:
+        return json.load(file)
+
+
+def _resume(directory, budget, **options):
+    '''Runs the search until solved, giving the saved state of every stop'''
+    states = []
+    while len(states) < 100:
+        result = solve(PUZZLE, max_candidates=budget,
+                       checkpoint=Checkpoint(str(directory)), **options)
+        if result.status != 'exhausted':
+            return result, states
+        states.append(_saved(directory))
+    raise AssertionError("The search does not end")
+
+
+@pytest.mark.parametrize('workers', (1, 3))
+def test_brute_force(tmp_path, workers):
+    expected = solve(PUZZLE)
+    result, states = _resume(tmp_path, 500, workers=workers)
+    assert result.status == 'solved'
+    assert result.placement == expected.placement
+    assert len(states) > 2
+    # Every resume advances the ranks left to test
+    left = [sum(stop - start for start, stop in state['ranges'])
+            for state in states]
+    assert all(a > b for a, b in zip(left, left[1:]))
+    if workers == 1:
+        assert result.stats['candidates'] == expected.stats['candidates']
+    # The file of a finished search is removed
+    assert _saved(tmp_path) is None
+
+
+@pytest.mark.parametrize('mode', ('prune', 'constraint'))
+def test_search_modes(tmp_path, mode):
+    expected = solve(PUZZLE, mode=mode)
+    budget = max(expected.stats['nodes'] // 5, 1)
+    result, states = _resume(tmp_path, budget, mode=mode)
+    assert result.status == 'solved'
+    assert result.placement == expected.placement
+    assert len(states) > 2
+    nodes = [state['stats']['nodes'] for state in states]
+    assert all(a < b for a, b in zip(nodes, nodes[1:]))
+    # Nodes replayed down the path of a checkpoint are not counted again
+    assert result.stats['nodes'] == expected.stats['nodes']
+    assert _saved(tmp_path) is None
+
+
+def test_start_over(tmp_path):
+    result = solve(PUZZLE, max_candidates=500,
+                   checkpoint=Checkpoint(str(tmp_path)))
+    assert result.status == 'exhausted'
+    assert _saved(tmp_path) is not None
+    # Not resumed: the search starts from the first rank again, a
+    # resumed one would count the candidates of the first run too
+    result = solve(PUZZLE, max_candidates=500,
+                   checkpoint=Checkpoint(str(tmp_path), resume=False))
+    assert result.stats['candidates'] == 500
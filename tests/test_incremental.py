@@ -0,0 +1,72 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Differential tests of class IncrementalSolution against the full trace
+of class Solution on the testfiles.
+'''
+from itertools import islice
+import glob
+import os
+import random
+
+import pytest
+
+from lazer_final import (Input, Board, Placements, Solution,
+                         IncrementalSolution, BLOCK_A, BLOCK_B, BLOCK_C)
+
+TESTFILES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles', '*.bff')))
+# Candidates tested per file
+CANDIDATES = 2000
+
+
+def _layout(board, a_comb, b_comb, c_comb):
+    layout = bytearray(board.blocks)
+    for cells, code in ((a_comb, BLOCK_A), (b_comb, BLOCK_B),
+                        (c_comb, BLOCK_C)):
+        for cell in cells:
+            layout[cell] = code
+    return layout
+
+
+def _check(board, tracer, layout, changed=None):
+    full = Solution(layout, board, early_stop=False)
+    assert tracer(layout, changed) == full()
+    assert set(tracer.points) == full.points
+
+
+@pytest.mark.parametrize('filename', TESTFILES,
+                         ids=[os.path.basename(i) for i in TESTFILES])
+def test_consecutive(filename):
+    board = Board(*Input(filename)())
+    counts = board.counts
+    placements = Placements(board.open_cells, counts['A'], counts['B'],
+                            counts['C'])
+    tracer = IncrementalSolution(board)
+    previous = bytearray(board.blocks)
+    # The first candidates, then a range in the middle of the ranks
+    middle = Placements(board.open_cells, counts['A'], counts['B'],
+                        counts['C'], len(placements) // 2)
+    for candidate in (list(islice(placements, CANDIDATES)) +
+                      list(islice(middle, CANDIDATES))):
+        layout = _layout(board, *candidate)
+        changed = [i for i in board.open_cells if layout[i] != previous[i]]
+        _check(board, tracer, layout, changed)
+        previous = layout
+
+
+@pytest.mark.parametrize('filename', TESTFILES,
+                         ids=[os.path.basename(i) for i in TESTFILES])
+def test_random(filename):
+    board = Board(*Input(filename)())
+    counts = board.counts
+    rng = random.Random(filename)
+    tracer = IncrementalSolution(board)
+    n = counts['A'] + counts['B'] + counts['C']
+    for _ in range(CANDIDATES // 4):
+        cells = rng.sample(board.open_cells, n)
+        candidate = (cells[:counts['A']],
+                     cells[counts['A']:counts['A'] + counts['B']],
+                     cells[counts['A'] + counts['B']:])
+        _check(board, tracer, _layout(board, *candidate))
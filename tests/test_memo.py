@@ -0,0 +1,74 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of class TraceMemo: tracing with the memo must give the verdict
+of plain tracing, whatever paths the memo keeps.
+'''
+from itertools import islice
+import glob
+import os
+
+import pytest
+
+from lazer_final import (Input, Board, Placements, Solution, TraceMemo,
+                         Lazor, BLOCK_A, BLOCK_B, BLOCK_C)
+
+TESTFILES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles', '*.bff')))
+IDS = [os.path.basename(i) for i in TESTFILES]
+# Candidates tested per file
+CANDIDATES = 2000
+
+
+def _layouts(board):
+    counts = board.counts
+    placements = Placements(board.open_cells, counts['A'], counts['B'],
+                            counts['C'])
+    middle = Placements(board.open_cells, counts['A'], counts['B'],
+                        counts['C'], placements.total // 2)
+    for combs in (list(islice(placements, CANDIDATES)) +
+                  list(islice(middle, CANDIDATES))):
+        layout = bytearray(board.blocks)
+        for cells, code in zip(combs, (BLOCK_A, BLOCK_B, BLOCK_C)):
+            for cell in cells:
+                layout[cell] = code
+        yield layout
+
+
+@pytest.mark.parametrize('max_entries', (1 << 16, 4))
+@pytest.mark.parametrize('filename', TESTFILES, ids=IDS)
+def test_same_verdict(filename, max_entries):
+    board = Board(*Input(filename)())
+    memo = TraceMemo(board, max_entries)
+    for layout in _layouts(board):
+        assert (Solution(layout, board, memo=memo)() ==
+                Solution(layout, board)())
+    assert memo.stats['hits'] > 0
+    assert len(memo.leaves) <= max_entries
+    if max_entries == 4:
+        assert memo.stats['evictions'] > 0
+
+
+def test_hits():
+    board = Board(*Input(TESTFILES[IDS.index('mad_1.bff')])())
+    # Walled in POIs are rejected before any lazor is looked up
+    layout = next(i for i in _layouts(board) if not board.blocked(i))
+    memo = TraceMemo(board)
+    Solution(layout, board, memo=memo)()
+    lookups = memo.stats['misses']
+    assert lookups > 0
+    assert memo.stats['hits'] == 0
+    # The same blocks again: every lazor is found in the memo
+    Solution(layout, board, memo=memo)()
+    assert memo.stats == {'hits': lookups, 'misses': lookups,
+                          'evictions': 0}
+    assert memo.hit_rate() == 0.5
+
+
+@pytest.mark.parametrize('filename', TESTFILES, ids=IDS)
+def test_solve(filename):
+    datasets = Input(filename)()
+    lazor = Lazor(*datasets, memo=1000)
+    assert lazor() == Lazor(*datasets)()
+    assert lazor.memo.stats['hits'] + lazor.memo.stats['misses'] > 0
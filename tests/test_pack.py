@@ -0,0 +1,74 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of the level packs: several puzzles in one plain or gzip file,
+a malformed puzzle giving an error without stopping the pack.
+'''
+import gzip
+import os
+
+import pytest
+
+from lazer_final import Input, find_puzzles, solve_puzzle
+
+TESTFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles')
+# A puzzle without lazors
+MALFORMED = '''GRID START
+o o
+GRID STOP
+A 1
+P 1 0
+'''
+
+
+def _text(name):
+    with open(os.path.join(TESTFILES, name)) as file:
+        return file.read()
+
+
+def _pack(path, compressed):
+    header = '# Level pack\n\n'
+    # Trailing spaces on the GRID START of the last puzzle
+    last = _text('dark_1.bff').replace('GRID START', 'GRID START  ')
+    first = header + _text('mad_1.bff') + '\n'
+    opener = gzip.open if compressed else open
+    with opener(path, 'wt') as file:
+        file.write(first + MALFORMED + last)
+    # Line of the GRID START of the malformed puzzle
+    return first.count('\n') + 1
+
+
+@pytest.mark.parametrize('compressed', (False, True))
+def test_puzzles(tmp_path, compressed):
+    # Compressed packs are found by their first bytes, whatever the name
+    path = str(tmp_path / 'pack.bff')
+    line = _pack(path, compressed)
+    puzzles = list(Input(path).puzzles())
+    assert [i[0] for i in puzzles] == [1, 2, 3]
+    assert puzzles[0][1:] == (Input(os.path.join(TESTFILES,
+                                                 'mad_1.bff'))(), None)
+    assert puzzles[1][1] is None
+    assert puzzles[1][2] == ("line %d: No lazors info is provided in "
+                             "test file" % line)
+    assert puzzles[2][1:] == (Input(os.path.join(TESTFILES,
+                                                 'dark_1.bff'))(), None)
+
+
+def test_empty_pack(tmp_path):
+    path = tmp_path / 'empty.bff'
+    path.write_text('# No puzzle yet\n')
+    assert list(Input(str(path)).puzzles()) == [
+        (1, None, "No grid start or stop indicated in test file")]
+
+
+def test_solve_pack(tmp_path):
+    path = str(tmp_path / 'pack.bff.gz')
+    _pack(path, True)
+    # A .gz file is a pack without --pack
+    records = [solve_puzzle(i) for i in find_puzzles([path])]
+    assert [(r['puzzle'], r['status']) for r in records] == [
+        (1, 'solved'), (2, 'invalid'), (3, 'solved')]
+    assert all(r['file'] == path for r in records)
+    assert 'No lazors' in records[1]['error']
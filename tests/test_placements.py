@@ -0,0 +1,99 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of class Placements, the enumeration of the candidates of the
+brute force.
+'''
+from itertools import islice
+from math import factorial
+
+import pytest
+
+from lazer_final import Input, Lazor, Placements, solve
+
+# 'o' positions and A, B, C blocks
+SIZES = [(4, 1, 1, 1), (6, 2, 1, 0), (7, 3, 2, 1), (8, 0, 3, 2),
+         (5, 5, 0, 0), (9, 2, 2, 2)]
+
+
+def multinomial(n, A, B, C):
+    return factorial(n) // (factorial(A) * factorial(B) * factorial(C) *
+                            factorial(n - A - B - C))
+
+
+@pytest.mark.parametrize('n, A, B, C', SIZES)
+def test_count(n, A, B, C):
+    placements = Placements(range(n), A, B, C)
+    candidates = list(placements)
+    assert len(placements) == multinomial(n, A, B, C)
+    assert len(candidates) == multinomial(n, A, B, C)
+    # Every candidate is a distinct assignment of the blocks
+    assignments = set()
+    for a_comb, b_comb, c_comb in candidates:
+        assert (len(a_comb), len(b_comb), len(c_comb)) == (A, B, C)
+        assert len(set(a_comb + b_comb + c_comb)) == A + B + C
+        assignments.add((frozenset(a_comb), frozenset(b_comb),
+                         frozenset(c_comb)))
+    assert len(assignments) == len(candidates)
+
+
+@pytest.mark.parametrize('n, A, B, C', SIZES)
+def test_ranges(n, A, B, C):
+    full = list(Placements(range(n), A, B, C))
+    total = len(full)
+    # Consecutive ranges give the full sequence
+    bounds = sorted({0, total, total // 3, total // 2, 2 * total // 3})
+    parts = []
+    for start, stop in zip(bounds, bounds[1:]):
+        part = Placements(range(n), A, B, C, start, stop)
+        assert len(part) == stop - start
+        parts += list(part)
+    assert parts == full
+
+
+@pytest.mark.parametrize('n, A, B, C', SIZES)
+def test_resume(n, A, B, C):
+    full = list(Placements(range(n), A, B, C))
+    placements = Placements(range(n), A, B, C)
+    # Stop after a third of the candidates, resume from the index
+    candidates = []
+    for candidate in placements:
+        candidates.append(candidate)
+        if len(candidates) == len(full) // 3:
+            break
+    assert placements.index == len(candidates)
+    candidates += list(Placements(range(n), A, B, C, placements.index))
+    assert candidates == full
+
+
+def test_spare():
+    # Fillers on the spare positions: every split of the blocks
+    placements = Placements(range(4), 2, 1, 0, spare=(10, 11, 12))
+    candidates = list(placements)
+    assert len(placements) == len(candidates)
+    assert len(set(candidates)) == len(candidates)
+    for a_comb, b_comb, c_comb in candidates:
+        assert (len(a_comb), len(b_comb), len(c_comb)) == (2, 1, 0)
+
+
+def test_beyond_maxsize():
+    # 17x17 'o' positions, far more candidates than sys.maxsize
+    lines = ['GRID START'] + [' '.join('o' * 17)] * 17 + ['GRID STOP',
+             'A 10', 'B 5', 'C 3', 'L 0 1 1 1', 'P 3 2']
+    puzzle = Input('big.bff').parse(lines)
+    placements = Placements(range(289), 10, 5, 3)
+    assert placements.total == multinomial(289, 10, 5, 3) > 2 ** 63
+    with pytest.raises(OverflowError):
+        len(placements)
+    lazor = Lazor(*puzzle, reachability=False)
+    assert lazor.stats['brute_force'] == placements.total
+    # Starting far into the ranks is immediate, and consistent
+    start = placements.total // 3
+    first = list(islice(Placements(range(289), 10, 5, 3, start), 3))
+    assert first[1:] == list(islice(Placements(range(289), 10, 5, 3,
+                                               start + 1), 2))
+    for mode, workers in (('brute', 1), ('prune', 1), ('constraint', 1),
+                          ('brute', 2)):
+        result = solve(puzzle, mode=mode, workers=workers, timeout=1)
+        assert result.status in ('solved', 'exhausted')
@@ -0,0 +1,117 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of the solve service, driven by its local client on an
+ephemeral port.
+'''
+import asyncio
+import os
+
+from lazor_server import SolveServer, request
+
+TESTFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles')
+
+
+def _text(name):
+    with open(os.path.join(TESTFILES, name)) as file:
+        return file.read()
+
+
+def _serve(scenario, **settings):
+    # Runs scenario(server, port) against a one-process server
+    async def main():
+        server = SolveServer(workers=1, **settings)
+        await server.start(port=0)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+async def _records(text, port, **options):
+    return [record async for record in request(text, port=port,
+                                               **options)]
+
+
+def test_solve():
+    async def scenario(server, port):
+        return await _records(_text('mad_1.bff'), port), server.stats
+    records, stats = _serve(scenario)
+    assert [r['status'] for r in records] == ['solved']
+    assert records[0]['puzzle'] == 1
+    assert stats['solved'] == 1
+
+
+def test_coalesced():
+    # The four copies are queued in one go: the first one is solved
+    # and the three others wait for its result
+    async def scenario(server, port):
+        return (await _records(_text('dark_1.bff') * 4, port),
+                server.stats)
+    records, stats = _serve(scenario)
+    assert sorted(r['puzzle'] for r in records) == [1, 2, 3, 4]
+    assert {r['status'] for r in records} == {'solved'}
+    assert len({str(r['placement']) for r in records}) == 1
+    assert stats['coalesced'] == 3
+    assert stats['solved'] == 1
+
+
+def test_busy_puzzles():
+    # One place in the queue: the first puzzle fits, the others are
+    # answered busy in the same response
+    async def scenario(server, port):
+        text = _text('mad_1.bff') + _text('dark_1.bff') + _text(
+            'tiny_5.bff')
+        return await _records(text, port), server.stats
+    records, stats = _serve(scenario, queue_size=1)
+    status = {r['puzzle']: r['status'] for r in records}
+    assert status == {1: 'solved', 2: 'busy', 3: 'busy'}
+    assert stats['rejected'] == 2
+
+
+def test_busy_request():
+    # With the consumers stopped, a full queue stays full and a request
+    # none of whose puzzles fits gets HTTP 503
+    async def scenario(server, port):
+        for task in server.consumers:
+            task.cancel()
+        await asyncio.gather(*server.consumers, return_exceptions=True)
+        server.submit(_text('mad_1.bff').splitlines(), {})
+        return await _records(_text('dark_1.bff'), port)
+    records = _serve(scenario, queue_size=1)
+    assert len(records) == 1
+    assert records[0]['status'] == 'busy'
+    assert records[0]['http_status'] == 503
+
+
+def test_invalid_puzzle():
+    async def scenario(server, port):
+        return await _records('GRID START\no x\nGRID STOP\n', port)
+    records = _serve(scenario)
+    assert len(records) == 1
+    assert records[0]['status'] == 'invalid'
+    assert records[0]['error']
+
+
+def test_malformed_requests():
+    async def scenario(server, port):
+        unknown = await _records(_text('mad_1.bff'), port, speed=2)
+        empty = await _records('no grid here\n', port)
+        # A request line the server cannot read
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"garbage\r\n\r\n")
+        await writer.drain()
+        status = (await reader.readline()).split()[1]
+        writer.close()
+        await writer.wait_closed()
+        return unknown, empty, status
+    unknown, empty, status = _serve(scenario)
+    assert unknown[0]['http_status'] == 400
+    assert unknown[0]['status'] == 'error'
+    assert 'speed' in unknown[0]['error']
+    assert empty[0]['http_status'] == 400
+    assert status == b'400'
@@ -0,0 +1,67 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of the enumeration of all solutions, used to validate levels.
+'''
+import os
+
+from lazer_final import (Input, Board, Placements, Solution, all_solutions,
+                         count_solutions, solve_file, BLOCK_A, BLOCK_B,
+                         BLOCK_C)
+
+TESTFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles')
+# Most positions of the grid never change the POI intersected
+FILLERS = '''
+GRID START
+o o o
+o C o
+o A o
+GRID STOP
+B 1
+C 1
+L 2 5 1 1
+P 1 6
+'''
+
+
+def _puzzle(text):
+    return Input('test.bff').parse(text.strip().splitlines())
+
+
+def _oracle(puzzle):
+    '''The number of placements solved by the trace'''
+    board = Board(*puzzle)
+    count = 0
+    for combs in Placements(board.open_cells, board.counts['A'],
+                            board.counts['B'], board.counts['C']):
+        layout = bytearray(board.blocks)
+        for cells, code in zip(combs, (BLOCK_A, BLOCK_B, BLOCK_C)):
+            for cell in cells:
+                layout[cell] = code
+        count += Solution(layout, board)()
+    return count
+
+
+def test_every_placement():
+    puzzle = _puzzle(FILLERS)
+    assert _oracle(puzzle) == 42
+    assert count_solutions(puzzle) == 42
+    assert count_solutions(puzzle, workers=2) == 42
+    placements = list(all_solutions(puzzle))
+    assert len({repr(i) for i in placements}) == 42
+
+
+def test_merge_fillers():
+    puzzle = _puzzle(FILLERS)
+    assert count_solutions(puzzle, reachability=True) == 1
+
+
+def test_not_unique():
+    filename = os.path.join(TESTFILES, 'tiny_5.bff')
+    assert count_solutions(filename) == _oracle(Input(filename)()) == 4
+    record = solve_file(filename, enumerate_all=True, limit=2)
+    assert record['count'] == 2
+    record = solve_file(filename, enumerate_all=True, reachability=True)
+    assert record['count'] == 1
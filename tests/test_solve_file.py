@@ -0,0 +1,46 @@
+'''
+Software Carpentry, Fall 2020
+Lazors project
+
+Tests of function solve_file, the record of one puzzle of a batch.
+'''
+import os
+
+import pytest
+
+import lazer_final
+from lazer_final import solve_file
+
+TESTFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testfiles')
+
+
+def test_solved():
+    record = solve_file(os.path.join(TESTFILES, 'mad_1.bff'))
+    assert record['status'] == 'solved'
+
+
+def test_invalid(tmp_path):
+    path = tmp_path / 'empty.bff'
+    path.write_text('GRID START\nGRID STOP\n')
+    record = solve_file(str(path))
+    assert record['status'] == 'invalid'
+
+
+def test_solver_error(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('broken board')
+    monkeypatch.setattr(lazer_final, 'solve', fail)
+    record = solve_file(os.path.join(TESTFILES, 'mad_1.bff'))
+    assert record['status'] == 'error'
+    assert 'broken board' in record['error']
+
+
+def test_pool_failure(monkeypatch, tmp_path):
+    # The error of the pool is raised, not a NameError of its shutdown
+    def fail(jobs):
+        raise OSError('no processes')
+    monkeypatch.setattr(lazer_final, 'ProcessPoolExecutor', fail)
+    with pytest.raises(OSError, match='no processes'):
+        lazer_final.main([os.path.join(TESTFILES, 'mad_1.bff'), '-j', '2',
+                          '-o', str(tmp_path / 'records.jsonl')])